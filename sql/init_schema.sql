@@ -43,6 +43,9 @@ CREATE TABLE IF NOT EXISTS orders (
     filled_quantity DECIMAL(20, 8) DEFAULT 0,
     average_price DECIMAL(20, 8),
     time_in_force VARCHAR(10) DEFAULT 'GTC',
+    -- Funds held in balances.locked for this order, released on cancel
+    locked_amount DECIMAL(20, 8) NOT NULL DEFAULT 0,
+    lock_currency VARCHAR(10),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -194,6 +197,23 @@ CREATE TRIGGER update_orders_updated_at BEFORE UPDATE ON orders
 CREATE TRIGGER update_balances_updated_at BEFORE UPDATE ON balances
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Push balance changes to LISTEN 'balances' subscribers instead of polling
+CREATE OR REPLACE FUNCTION notify_balance_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('balances', json_build_object(
+        'user_id', NEW.user_id,
+        'currency', NEW.currency,
+        'available', NEW.available,
+        'locked', NEW.locked
+    )::text);
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_balances_changed AFTER INSERT OR UPDATE ON balances
+    FOR EACH ROW EXECUTE FUNCTION notify_balance_change();
+
 -- Create initial admin user (for testing)
 INSERT INTO users (username, email, api_key, api_secret_hash, kyc_status)
 VALUES ('admin', 'admin@exchange.local', 'test-api-key-admin', 'hashed_secret', 'verified')
@@ -213,13 +233,16 @@ GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA exchange TO exchange_user;
 GRANT ALL PRIVILEGES ON ALL SEQUENCES IN SCHEMA exchange TO exchange_user;
 
 -- Create indexes for performance
+-- Partial covering index for open orders (get_active_orders)
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_active
-    ON orders(symbol, status)
+    ON orders(symbol, created_at DESC)
+    INCLUDE (order_id, user_id, side, price, quantity, filled_quantity)
     WHERE status IN ('new', 'partially_filled');
 
+-- Covering index for the recent trades feed (get_recent_trades)
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_trades_recent
-    ON trades(created_at DESC)
-    WHERE created_at > CURRENT_TIMESTAMP - INTERVAL '1 day';
+    ON trades(symbol, created_at DESC)
+    INCLUDE (trade_id, price, quantity, maker_side);
 
 -- Add comments for documentation
 COMMENT ON TABLE users IS 'Exchange user accounts';
@@ -0,0 +1,19 @@
+-- Migration 001: covering indexes for open orders and recent trades
+-- Apply to databases created before these indexes were added to init_schema.sql.
+-- Run outside a transaction block (CREATE INDEX CONCURRENTLY).
+
+SET search_path TO exchange, public;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_orders_active;
+DROP INDEX CONCURRENTLY IF EXISTS idx_trades_recent;
+
+-- Partial covering index for open orders (get_active_orders)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_active
+    ON orders(symbol, created_at DESC)
+    INCLUDE (order_id, user_id, side, price, quantity, filled_quantity)
+    WHERE status IN ('new', 'partially_filled');
+
+-- Covering index for the recent trades feed (get_recent_trades)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_trades_recent
+    ON trades(symbol, created_at DESC)
+    INCLUDE (trade_id, price, quantity, maker_side);
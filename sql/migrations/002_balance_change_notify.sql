@@ -0,0 +1,23 @@
+-- Migration 002: NOTIFY on balance changes
+-- Lets the exchange push balance updates (LISTEN balances) instead of polling.
+
+SET search_path TO exchange, public;
+
+-- Push balance changes to LISTEN 'balances' subscribers instead of polling
+CREATE OR REPLACE FUNCTION notify_balance_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('balances', json_build_object(
+        'user_id', NEW.user_id,
+        'currency', NEW.currency,
+        'available', NEW.available,
+        'locked', NEW.locked
+    )::text);
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS notify_balances_changed ON balances;
+
+CREATE TRIGGER notify_balances_changed AFTER INSERT OR UPDATE ON balances
+    FOR EACH ROW EXECUTE FUNCTION notify_balance_change();
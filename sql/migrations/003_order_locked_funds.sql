@@ -0,0 +1,10 @@
+-- Migration 003: record each order's locked funds
+-- Apply to databases created before these columns were added to init_schema.sql.
+-- Orders placed with place_order_atomic store the amount and currency they
+-- locked, so cancel_order_atomic releases exactly that amount (market and
+-- NULL-price buys included) instead of recomputing it from price * quantity.
+
+SET search_path TO exchange, public;
+
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS locked_amount DECIMAL(20, 8) NOT NULL DEFAULT 0;
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS lock_currency VARCHAR(10);
@@ -8,7 +8,7 @@ import asyncio
 import os
 import signal
 import sys
-from .websocket_server import WebSocketDataFeed
+from .websocket_server import WebSocketDataFeed, run_workers
 
 class DataFeedService:
     def __init__(self):
@@ -16,17 +16,26 @@ class DataFeedService:
         self.host = "0.0.0.0"
         self.port = int(os.getenv('WEBSOCKET_PORT', 13765))
         self.use_binary = os.getenv('USE_BINARY_PROTOCOL', 'false').lower() == 'true'
-
-        # Initialize WebSocket server
-        self.server = WebSocketDataFeed(
-            host=self.host,
-            port=self.port,
-            use_binary=self.use_binary
-        )
+        self.num_workers = int(os.getenv('DATA_FEED_WORKERS', 1))
+
+        # Initialize WebSocket server; with several workers each process
+        # builds its own (run_workers), so the parent has none
+        self.server = None
+        if self.num_workers == 1:
+            self.server = WebSocketDataFeed(
+                host=self.host,
+                port=self.port,
+                use_binary=self.use_binary
+            )
 
         print(f"WebSocket Data Feed Service initialized")
         print(f"Listening on: ws://{self.host}:{self.port}")
         print(f"Protocol: {'Binary (MessagePack)' if self.use_binary else 'JSON'}")
+        print(f"Workers: {self.num_workers}")
+        if self.num_workers > 1:
+            print(f"WARNING: DATA_FEED_WORKERS > 1 is experimental. Clients must follow "
+                  f"symbol_ports to ports {self.port + 1}-{self.port + self.num_workers}, "
+                  f"which must be published too")
 
     async def run(self):
         """Start the WebSocket server"""
@@ -46,6 +55,9 @@ if __name__ == "__main__":
 
     # Run service
     try:
-        asyncio.run(service.run())
+        if service.num_workers > 1:
+            run_workers(service.host, service.port, service.use_binary, service.num_workers)
+        else:
+            asyncio.run(service.run())
     except KeyboardInterrupt:
         pass
\ No newline at end of file
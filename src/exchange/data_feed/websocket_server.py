@@ -4,23 +4,44 @@ Distributes market data from the matching engine with minimal latency
 """
 
 import asyncio
+import contextlib
 import json
 import time
 import msgpack
 import websockets
 from websockets import WebSocketServerProtocol
-from typing import Dict, Set, List, Any, Optional
+from typing import Dict, Set, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 import uuid
 from collections import defaultdict, deque
+import multiprocessing
+import multiprocessing.connection
+import socket
 import sys
 import os
+import zlib
 
 # Add matching engine to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from matching_engine.ultra_fast_engine import UltraFastMatchingEngine
 
+DEFAULT_SYMBOLS = ["DEC/USD", "BTC/USD", "ETH/USD", "DEC/BTC"]
+
+# Seconds run_workers waits before restarting a worker that exited
+WORKER_RESTART_DELAY = 1.0
+
+
+def symbol_worker(symbol: str, num_workers: int) -> int:
+    """Map a symbol to the worker that owns it (stable across processes)"""
+    return zlib.crc32(symbol.encode()) % num_workers
+
+
+def worker_port(port: int, worker_id: int) -> int:
+    """Dedicated port of a worker; the shared SO_REUSEPORT port is port itself"""
+    return port + 1 + worker_id
+
+
 class MessageType(Enum):
     SUBSCRIBE = "subscribe"
     UNSUBSCRIBE = "unsubscribe"
@@ -69,20 +90,29 @@ class WebSocketDataFeed:
     def __init__(self,
                  host: str = "0.0.0.0",
                  port: int = 13765,
-                 use_binary: bool = True):
+                 use_binary: bool = True,
+                 worker_id: int = 0,
+                 num_workers: int = 1):
 
         self.host = host
         self.port = port
         self.use_binary = use_binary
 
+        # Symbol sharding when running one process per CPU
+        self.worker_id = worker_id
+        self.num_workers = num_workers
+
         # Client management
         self.clients: Dict[str, WebSocketServerProtocol] = {}
         self.subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
         self.client_subscriptions: Dict[str, Set[str]] = defaultdict(set)
+        # Immutable per-key subscriber snapshots, rebuilt on sub/unsub so
+        # broadcasts iterate a stable tuple instead of a mutable set
+        self._sub_snapshots: Dict[str, Tuple[str, ...]] = {}
 
-        # Market data cache
+        # Market data cache (preallocated per known symbol)
         self.orderbook_cache: Dict[str, dict] = {}
-        self.last_trades: Dict[str, deque] = defaultdict(lambda: deque(maxlen=100))
+        self.last_trades: Dict[str, deque] = {}
         self.ticker_cache: Dict[str, dict] = {}
 
         # Sequence numbers for message ordering
@@ -100,11 +130,33 @@ class WebSocketDataFeed:
         self._initialize_symbols()
 
     def _initialize_symbols(self):
-        """Initialize matching engines for default symbols"""
-        symbols = ["DEC/USD", "BTC/USD", "ETH/USD", "DEC/BTC"]
-        for symbol in symbols:
+        """Initialize matching engines for the symbols owned by this worker"""
+        for symbol in DEFAULT_SYMBOLS:
+            if symbol_worker(symbol, self.num_workers) != self.worker_id:
+                continue
             self.engines[symbol] = UltraFastMatchingEngine(symbol)
-            self.orderbook_cache[symbol] = {'bids': [], 'asks': []}
+            self._allocate_symbol_caches(symbol)
+
+    def _allocate_symbol_caches(self, symbol: str):
+        """Preallocate market data caches for a symbol"""
+        self.orderbook_cache[symbol] = {'bids': [], 'asks': []}
+        self.last_trades[symbol] = deque(maxlen=100)
+        self.ticker_cache[symbol] = {}
+
+    def set_engines(self, engines: Dict[str, UltraFastMatchingEngine]):
+        """Replace the matching engines and allocate caches for their symbols"""
+        self.engines = engines
+        for symbol in engines:
+            if symbol not in self.last_trades:
+                self._allocate_symbol_caches(symbol)
+
+    def _refresh_snapshot(self, sub_key: str):
+        """Rebuild the broadcast snapshot for a subscription key"""
+        subscribers = self.subscriptions.get(sub_key)
+        if subscribers:
+            self._sub_snapshots[sub_key] = tuple(subscribers)
+        else:
+            self._sub_snapshots.pop(sub_key, None)
 
     def _json_serializer(self, obj):
         """Custom JSON serializer to handle special values"""
@@ -172,6 +224,15 @@ class WebSocketDataFeed:
             'protocol': 'binary' if self.use_binary else 'json'
         }
 
+        if self.num_workers > 1:
+            # The shared port lands on any worker; tell clients the dedicated
+            # port of the worker that owns each symbol
+            welcome['worker_id'] = self.worker_id
+            welcome['symbol_ports'] = {
+                symbol: worker_port(self.port, symbol_worker(symbol, self.num_workers))
+                for symbol in DEFAULT_SYMBOLS
+            }
+
         print(f"[WebSocket] Preparing welcome message for client {client_id}: {welcome}", flush=True)
         await self.send_to_client(websocket, welcome)
         print(f"[WebSocket] Welcome message delivery completed for client {client_id}", flush=True)
@@ -233,6 +294,12 @@ class WebSocketDataFeed:
         """Handle a single subscription"""
         # Validate symbol
         if symbol not in self.engines:
+            if self.num_workers > 1 and symbol in DEFAULT_SYMBOLS:
+                # Owned by another worker: route the client to its port
+                port = worker_port(self.port, symbol_worker(symbol, self.num_workers))
+                await self.send_error(client_id, f"Symbol {symbol} is served on port {port}",
+                                      symbol=symbol, port=port)
+                return
             await self.send_error(client_id, f"Unknown symbol: {symbol}")
             return
 
@@ -248,6 +315,7 @@ class WebSocketDataFeed:
         sub_key = f"{channel}:{symbol}"
         self.subscriptions[sub_key].add(client_id)
         self.client_subscriptions[client_id].add(sub_key)
+        self._refresh_snapshot(sub_key)
 
         # Send initial snapshot
         await self.send_initial_snapshot(client_id, channel, symbol, depth)
@@ -269,6 +337,7 @@ class WebSocketDataFeed:
 
         if sub_key in self.subscriptions:
             self.subscriptions[sub_key].discard(client_id)
+            self._refresh_snapshot(sub_key)
 
         if client_id in self.client_subscriptions:
             self.client_subscriptions[client_id].discard(sub_key)
@@ -298,6 +367,7 @@ class WebSocketDataFeed:
         for sub_key in list(self.client_subscriptions.get(client_id, [])):
             if sub_key in self.subscriptions:
                 self.subscriptions[sub_key].discard(client_id)
+                self._refresh_snapshot(sub_key)
 
         # Clean up client subscriptions
         if client_id in self.client_subscriptions:
@@ -334,7 +404,7 @@ class WebSocketDataFeed:
 
         elif channel == Channel.TICKER.value:
             # Send ticker data
-            ticker = self.ticker_cache.get(symbol, {})
+            ticker = self.ticker_cache[symbol]
 
             # If no ticker data exists, create initial data with current best bid/ask
             if not ticker:
@@ -377,7 +447,7 @@ class WebSocketDataFeed:
     async def broadcast_orderbook_update(self, symbol: str, update: dict):
         """Broadcast order book update to subscribers"""
         sub_key = f"{Channel.ORDERBOOK.value}:{symbol}"
-        subscribers = self.subscriptions.get(sub_key, set())
+        subscribers = self._sub_snapshots.get(sub_key, ())
 
         if not subscribers:
             return
@@ -399,6 +469,9 @@ class WebSocketDataFeed:
 
     async def broadcast_trade(self, symbol: str, trade: dict):
         """Broadcast trade to subscribers"""
+        if symbol not in self.engines:
+            return
+
         # Enhance trade data with side field for frontend compatibility
         enhanced_trade = trade.copy()
 
@@ -417,7 +490,7 @@ class WebSocketDataFeed:
 
         # Broadcast to trade channel subscribers
         sub_key = f"{Channel.TRADES.value}:{symbol}"
-        subscribers = self.subscriptions.get(sub_key, set())
+        subscribers = self._sub_snapshots.get(sub_key, ())
 
         if subscribers:
             message = {
@@ -438,7 +511,7 @@ class WebSocketDataFeed:
         current_time = time.time()
 
         # Update ticker cache
-        if symbol not in self.ticker_cache:
+        if not self.ticker_cache[symbol]:
             base_price = trade['price']
             self.ticker_cache[symbol] = {
                 'last': base_price,
@@ -508,7 +581,7 @@ class WebSocketDataFeed:
 
         # Broadcast to ticker subscribers
         sub_key = f"{Channel.TICKER.value}:{symbol}"
-        subscribers = self.subscriptions.get(sub_key, set())
+        subscribers = self._sub_snapshots.get(sub_key, ())
 
         if subscribers:
             # Clean ticker data to ensure no Infinity/NaN values
@@ -524,8 +597,8 @@ class WebSocketDataFeed:
 
             await self.broadcast_to_subscribers(subscribers, message)
 
-    async def broadcast_to_subscribers(self, subscribers: Set[str], message: dict):
-        """Broadcast message to a set of subscribers"""
+    async def broadcast_to_subscribers(self, subscribers: Tuple[str, ...], message: dict):
+        """Broadcast message to a snapshot of subscribers"""
         # Prepare message once
         if self.use_binary:
             data = msgpack.packb(message)
@@ -575,13 +648,14 @@ class WebSocketDataFeed:
         except Exception:
             pass  # Client disconnected
 
-    async def send_error(self, client_id: str, error_message: str):
+    async def send_error(self, client_id: str, error_message: str, **details):
         """Send error message to client"""
         if client_id in self.clients:
             await self.send_to_client(self.clients[client_id], {
                 'type': MessageType.ERROR.value,
                 'message': error_message,
-                'timestamp': time.time()
+                'timestamp': time.time(),
+                **details
             })
 
     async def simulate_market_activity(self):
@@ -621,8 +695,8 @@ class WebSocketDataFeed:
             'symbols': list(self.engines.keys())
         }
 
-    async def start(self):
-        """Start the WebSocket server"""
+    async def start(self, socks: Optional[List[socket.socket]] = None):
+        """Start the WebSocket server, optionally on pre-bound sockets"""
         print(f"Starting WebSocket server on {self.host}:{self.port}", flush=True)
         print(f"Protocol: {'Binary (MessagePack)' if self.use_binary else 'JSON'}", flush=True)
 
@@ -630,15 +704,84 @@ class WebSocketDataFeed:
         asyncio.create_task(self.simulate_market_activity())
 
         # Start WebSocket server
-        async with websockets.serve(
-            self.handle_connection,
-            self.host,
-            self.port
-        ):
-            print(f"WebSocket server running on ws://{self.host}:{self.port}", flush=True)
+        async with contextlib.AsyncExitStack() as servers:
+            if socks:
+                for sock in socks:
+                    await servers.enter_async_context(
+                        websockets.serve(self.handle_connection, sock=sock))
+            else:
+                await servers.enter_async_context(
+                    websockets.serve(self.handle_connection, self.host, self.port))
+
+            print(f"WebSocket server running on ws://{self.host}:{self.port} "
+                  f"(worker {self.worker_id + 1}/{self.num_workers})", flush=True)
             await asyncio.Future()  # Run forever
 
 
+def create_listen_socket(host: str, port: int, reuseport: bool = False) -> socket.socket:
+    """Create a listening socket, shareable between processes with reuseport"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuseport:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(socket.SOMAXCONN)
+    sock.setblocking(False)
+    return sock
+
+
+def _run_worker(host: str, port: int, use_binary: bool, worker_id: int, num_workers: int):
+    """Worker process entry point: own a symbol shard, serve the shared and its own port"""
+    server = WebSocketDataFeed(host, port, use_binary,
+                               worker_id=worker_id, num_workers=num_workers)
+    socks = [create_listen_socket(host, port, reuseport=True),
+             create_listen_socket(host, worker_port(port, worker_id))]
+    asyncio.run(server.start(socks=socks))
+
+
+def _start_worker(host: str, port: int, use_binary: bool, worker_id: int,
+                  num_workers: int) -> multiprocessing.Process:
+    process = multiprocessing.Process(
+        target=_run_worker,
+        args=(host, port, use_binary, worker_id, num_workers),
+        name=f"data-feed-{worker_id}",
+        daemon=True  # Exit with the supervising parent
+    )
+    process.start()
+    return process
+
+
+def run_workers(host: str = "0.0.0.0", port: int = 13765,
+                use_binary: bool = True, num_workers: Optional[int] = None):
+    """
+    EXPERIMENTAL. Run one data feed process per CPU, all bound to the same port
+    via SO_REUSEPORT. Symbols are partitioned across workers with symbol_worker(),
+    and each worker also listens on worker_port(port, worker_id). Connections to
+    the shared port land on any worker: the welcome message maps every symbol to
+    its owner's port, and subscribing to a symbol owned elsewhere returns that port.
+
+    Usable only where ports port + 1 .. port + num_workers are reachable and the
+    client reconnects per symbol using symbol_ports. The shipped frontend, the
+    admin nginx proxy and docker-compose publish only the shared port, so keep
+    DATA_FEED_WORKERS=1 there.
+
+    The parent supervises the workers and restarts any that exits.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    processes = [_start_worker(host, port, use_binary, worker_id, num_workers)
+                 for worker_id in range(num_workers)]
+
+    while True:
+        multiprocessing.connection.wait([process.sentinel for process in processes])
+        for worker_id, process in enumerate(processes):
+            if process.is_alive():
+                continue
+            print(f"[WebSocket] Worker {worker_id} exited with code {process.exitcode}, "
+                  f"restarting", flush=True)
+            time.sleep(WORKER_RESTART_DELAY)  # Don't spin on a worker that dies at startup
+            processes[worker_id] = _start_worker(host, port, use_binary, worker_id, num_workers)
+
+
 # Test client for development
 async def test_client():
     """Test WebSocket client"""
@@ -694,6 +837,9 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "client":
         # Run test client
         asyncio.run(test_client())
+    elif len(sys.argv) > 1 and sys.argv[1] == "workers":
+        # Run one server process per CPU
+        run_workers()
     else:
         # Run server
         server = WebSocketDataFeed()
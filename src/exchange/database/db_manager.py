@@ -4,37 +4,370 @@ Handles all PostgreSQL operations for orders, trades, and balances
 """
 
 import os
+import asyncio
+import contextlib
+import functools
+import threading
 import asyncpg
 import json
-from typing import Dict, List, Optional, Any, Tuple
+from cachetools import TTLCache
+from typing import Dict, List, Optional, Any, Tuple, Union, Callable, Awaitable
 from datetime import datetime
-from decimal import Decimal
-from uuid import UUID, uuid4
+from decimal import Decimal, ROUND_HALF_UP
+from uuid import UUID
 import logging
 
+try:
+    import orjson
+
+    def _dumps_json(value: Any) -> str:
+        return orjson.dumps(value).decode()
+except ImportError:
+    _dumps_json = json.dumps  # orjson is optional
+
 logger = logging.getLogger(__name__)
 
 
+class _IDGen:
+    """
+    16-hex-char random IDs served from a preallocated os.urandom pool,
+    so ID generation costs one getrandom syscall per 8192 IDs
+    """
+
+    POOL_BYTES = 1 << 16
+
+    def __init__(self):
+        self._buf = os.urandom(self.POOL_BYTES)
+        self._off = 0
+        self._lock = threading.Lock()
+
+    def next_hex16(self) -> str:
+        with self._lock:
+            if self._off + 8 > self.POOL_BYTES:
+                self._buf = os.urandom(self.POOL_BYTES)
+                self._off = 0
+            off = self._off
+            self._off = off + 8
+            return self._buf[off:off + 8].hex()
+
+
+_IDGEN = _IDGen()
+
+UserId = Union[str, UUID]
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_uuid(value: str) -> UUID:
+    """Parse a user ID string once; repeat lookups hit the cache"""
+    return UUID(value)
+
+
+def _as_uuid(user_id: UserId) -> UUID:
+    """Accept a UUID as-is or a string form of one"""
+    if isinstance(user_id, UUID):
+        return user_id
+    return _parse_uuid(user_id)
+
+
+# Hot-path statements, prepared once per pooled connection
+_PREPARED: Dict[str, str] = {
+    "GET_USER_BY_API_KEY": """
+        SELECT id, username, email, api_secret_hash, decoin_address,
+               kyc_status, is_active, daily_volume_limit
+        FROM exchange.users
+        WHERE api_key = $1 AND is_active = true
+    """,
+    "INSERT_ORDER": """
+        INSERT INTO exchange.orders
+        (order_id, user_id, symbol, side, order_type, status,
+         quantity, price, stop_price, time_in_force)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+        RETURNING id
+    """,
+    "UPDATE_ORDER_STATUS": """
+        UPDATE exchange.orders
+        SET status = $2,
+            filled_quantity = COALESCE($3, filled_quantity),
+            average_price = COALESCE($4, average_price),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE order_id = $1
+    """,
+    "INSERT_TRADE": """
+        INSERT INTO exchange.trades
+        (trade_id, symbol, buyer_order_id, seller_order_id,
+         buyer_user_id, seller_user_id, price, quantity,
+         maker_side, taker_fee, maker_fee)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+        RETURNING id
+    """,
+    "GET_USER_BALANCE": """
+        SELECT available, locked, total
+        FROM exchange.balances
+        WHERE user_id = $1 AND currency = $2
+    """,
+    "UPDATE_BALANCE": """
+        UPDATE exchange.balances
+        SET available = available + $3,
+            locked = locked + $4,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = $1 AND currency = $2
+          AND available + $3 >= 0 AND locked + $4 >= 0
+        RETURNING available, locked
+    """,
+    # Lock funds and insert the order in one round-trip. No row is inserted
+    # when the available balance does not cover the lock; the order records
+    # what it locked so a cancel can release exactly that
+    "PLACE_ORDER_ATOMIC": """
+        WITH bal AS (
+            UPDATE exchange.balances
+            SET available = available - $11::numeric,
+                locked = locked + $11::numeric,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = $2::uuid AND currency = $12::varchar
+              AND available - $11::numeric >= 0
+            RETURNING available, locked
+        ), ins AS (
+            INSERT INTO exchange.orders
+            (order_id, user_id, symbol, side, order_type, status,
+             quantity, price, stop_price, time_in_force, locked_amount, lock_currency)
+            SELECT $1::varchar, $2::uuid, $3::varchar, $4::varchar, $5::varchar,
+                   $6::varchar, $7::numeric, $8::numeric, $9::numeric, $10::varchar,
+                   $11::numeric, $12::varchar
+            FROM bal
+            RETURNING id
+        )
+        SELECT ins.id, bal.available, bal.locked FROM ins, bal
+    """,
+    # Cancel an open order and release its stored lock in one round-trip.
+    # The order is only cancelled if the release fits within balances.locked
+    "CANCEL_ORDER_ATOMIC": """
+        WITH o AS (
+            SELECT order_id, user_id, lock_currency, locked_amount
+            FROM exchange.orders
+            WHERE order_id = $1 AND status IN ('new', 'partially_filled')
+            FOR UPDATE
+        ), b AS (
+            UPDATE exchange.balances
+            SET available = balances.available + o.locked_amount,
+                locked = balances.locked - o.locked_amount,
+                updated_at = CURRENT_TIMESTAMP
+            FROM o
+            WHERE balances.user_id = o.user_id
+              AND balances.currency = o.lock_currency
+              AND o.locked_amount > 0
+              AND balances.locked - o.locked_amount >= 0
+            RETURNING balances.currency, balances.available, balances.locked
+        ), c AS (
+            UPDATE exchange.orders
+            SET status = 'cancelled',
+                locked_amount = 0,
+                updated_at = CURRENT_TIMESTAMP
+            FROM o
+            WHERE orders.order_id = o.order_id
+              AND (o.locked_amount = 0 OR EXISTS (SELECT 1 FROM b))
+            RETURNING orders.order_id
+        )
+        SELECT c.order_id, o.user_id, b.currency, b.available, b.locked
+        FROM c CROSS JOIN o LEFT JOIN b ON true
+    """,
+    # Credit many (user, currency) balances in one round-trip; the arrays
+    # make a single statement serve settlement batches of any size
+    "SETTLE_BALANCES": """
+        UPDATE exchange.balances AS b
+        SET available = b.available + v.delta,
+            updated_at = CURRENT_TIMESTAMP
+        FROM unnest($1::uuid[], $2::varchar[], $3::numeric[]) AS v(user_id, currency, delta)
+        WHERE b.user_id = v.user_id AND b.currency = v.currency
+        RETURNING b.user_id, b.currency, b.available, b.locked
+    """,
+    # Fixed filter variants so every call shape reuses one cached plan;
+    # status filters bind a text[] so single and multiple statuses share it
+    "GET_USER_ORDERS": """
+        SELECT * FROM exchange.orders
+        WHERE user_id = $1
+        ORDER BY created_at DESC LIMIT $2
+    """,
+    "GET_USER_ORDERS_STATUS": """
+        SELECT * FROM exchange.orders
+        WHERE user_id = $1 AND status = ANY($2::text[])
+        ORDER BY created_at DESC LIMIT $3
+    """,
+    "GET_USER_ORDERS_SYMBOL": """
+        SELECT * FROM exchange.orders
+        WHERE user_id = $1 AND symbol = $2
+        ORDER BY created_at DESC LIMIT $3
+    """,
+    "GET_USER_ORDERS_STATUS_SYMBOL": """
+        SELECT * FROM exchange.orders
+        WHERE user_id = $1 AND status = ANY($2::text[]) AND symbol = $3
+        ORDER BY created_at DESC LIMIT $4
+    """,
+    "GET_USER_TRADES": """
+        SELECT * FROM exchange.trades
+        WHERE (buyer_user_id = $1 OR seller_user_id = $1)
+        ORDER BY created_at DESC LIMIT $2
+    """,
+    "GET_USER_TRADES_SYMBOL": """
+        SELECT * FROM exchange.trades
+        WHERE (buyer_user_id = $1 OR seller_user_id = $1) AND symbol = $2
+        ORDER BY created_at DESC LIMIT $3
+    """,
+    "INSERT_AUDIT_EVENT": """
+        INSERT INTO exchange.audit_log
+        (user_id, action, resource_type, resource_id, metadata, ip_address)
+        VALUES ($1, $2, $3, $4, $5, $6)
+    """,
+}
+
+# Order locks are rounded to the DECIMAL(20, 8) scale before they are stored
+_LOCK_QUANTUM = Decimal("0.00000001")
+
+ORDER_COLUMNS = (
+    "order_id", "user_id", "symbol", "side", "order_type", "status",
+    "quantity", "price", "stop_price", "time_in_force"
+)
+TRADE_COLUMNS = (
+    "trade_id", "symbol", "buyer_order_id", "seller_order_id",
+    "buyer_user_id", "seller_user_id", "price", "quantity",
+    "maker_side", "taker_fee", "maker_fee"
+)
+
+# Bulk inserts: batches this large go through COPY, smaller ones are split
+# into power-of-two multi-row VALUES statements so each size is prepared once
+BULK_COPY_THRESHOLD = 32
+
+# Fixed-size pool: min == max so connections (and their prepared statements)
+# are never churned; size for peak concurrent DB calls, below max_connections
+POOL_SIZE = int(os.getenv("PG_POOL_SIZE", "24"))
+
+# Write-through balance cache: short TTL bounds staleness from writers in
+# other processes
+BALANCE_CACHE_SIZE = 1_000_000
+BALANCE_CACHE_TTL = 5
+
+# 24h ticker stats are recomputed at most once per tick per symbol
+STATS_REFRESH_INTERVAL = 1.0
+
+# Audit events are queued and written in batches by a background task
+AUDIT_COLUMNS = ("user_id", "action", "resource_type", "resource_id", "metadata", "ip_address")
+AUDIT_QUEUE_SIZE = 10_000
+AUDIT_BATCH_SIZE = 256
+AUDIT_FLUSH_INTERVAL = 0.1
+# Failed batches are retried with exponential backoff; at shutdown, events
+# that still cannot be written are appended to a JSON-lines spill file
+AUDIT_RETRY_MIN = 0.5
+AUDIT_RETRY_MAX = 30.0
+AUDIT_SPILL_PATH = os.getenv("AUDIT_SPILL_PATH", "audit_spill.jsonl")
+_BULK_VALUES_SIZES = (16, 8, 4, 2, 1)
+
+
+def _multi_values_sql(table: str, columns: Tuple[str, ...], rows: int) -> str:
+    """Build INSERT ... VALUES (...),(...) for a fixed number of rows"""
+    width = len(columns)
+    values = ",\n".join(
+        "(" + ", ".join(f"${row * width + col + 1}" for col in range(width)) + ")"
+        for row in range(rows)
+    )
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n{values}"
+
+
+for _size in _BULK_VALUES_SIZES:
+    _PREPARED[f"INSERT_ORDERS_{_size}"] = _multi_values_sql("exchange.orders", ORDER_COLUMNS, _size)
+    _PREPARED[f"INSERT_TRADES_{_size}"] = _multi_values_sql("exchange.trades", TRADE_COLUMNS, _size)
+
+
+async def _prepare_all(conn: asyncpg.Connection):
+    """
+    Pool init callback: prepare every hot-path statement into the
+    connection's statement cache, which outlives pool acquire/release
+    (PreparedStatement objects do not). executemany with no rows prepares
+    through the cache without executing anything. A statement that fails
+    here is logged and left to be prepared on first use.
+    """
+    for name, sql in _PREPARED.items():
+        try:
+            await conn.executemany(sql, [])
+        except Exception as e:
+            logger.warning(f"Could not prepare {name}: {e}")
+
+
+class _Statement:
+    """
+    A hot-path query bound to an acquired connection. Executing through the
+    connection reuses the statement its cache prepared in _prepare_all, or
+    prepares and caches it on first use for externally supplied pools.
+    """
+
+    __slots__ = ("_conn", "_sql")
+
+    def __init__(self, conn, sql: str):
+        self._conn = conn
+        self._sql = sql
+
+    async def fetch(self, *args) -> List[asyncpg.Record]:
+        return await self._conn.fetch(self._sql, *args)
+
+    async def fetchrow(self, *args) -> Optional[asyncpg.Record]:
+        return await self._conn.fetchrow(self._sql, *args)
+
+    async def fetchval(self, *args) -> Any:
+        return await self._conn.fetchval(self._sql, *args)
+
+
+def _statement(conn, name: str) -> _Statement:
+    """Return the hot-path query name bound to this connection"""
+    return _Statement(conn, _PREPARED[name])
+
+
 class DatabaseManager:
-    """Manages all database operations for the exchange"""
+    """
+    Manages all database operations for the exchange.
+
+    Row-returning reads (get_order, get_user_orders, get_recent_trades, ...)
+    hand back asyncpg.Record objects without copying them into dicts. They
+    support row['col'], .get(), keys() and items() but are immutable and not
+    JSON-serializable; call dict(row) at the boundary where either is needed.
+    """
 
     def __init__(self, pool: Optional[asyncpg.Pool] = None):
         self.pool = pool
         self.connected = False
+        self._balance_cache: TTLCache = TTLCache(BALANCE_CACHE_SIZE, BALANCE_CACHE_TTL)
+        self._stats_cache: TTLCache = TTLCache(1024, STATS_REFRESH_INTERVAL)
+        self._audit_q: asyncio.Queue = asyncio.Queue(maxsize=AUDIT_QUEUE_SIZE)
+        self._audit_task: Optional[asyncio.Task] = None
+        self._audit_batch: List[Tuple] = []
+        self._listen_conn: Optional[asyncpg.Connection] = None
+
+        # Per-symbol write serialization for order/trade/candle writes
+        self._sym_locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def _connection_params() -> Dict[str, Any]:
+        """Connection settings from the environment"""
+        return {
+            "host": os.getenv("POSTGRES_HOST", "postgres"),
+            "port": int(os.getenv("POSTGRES_PORT", 5432)),
+            "database": os.getenv("POSTGRES_DB", "exchange_db"),
+            "user": os.getenv("POSTGRES_USER", "exchange_user"),
+            "password": os.getenv("POSTGRES_PASSWORD", "exchange_pass"),
+        }
 
     async def connect(self):
         """Create database connection pool"""
         if not self.pool:
             try:
                 self.pool = await asyncpg.create_pool(
-                    host=os.getenv("POSTGRES_HOST", "postgres"),
-                    port=int(os.getenv("POSTGRES_PORT", 5432)),
-                    database=os.getenv("POSTGRES_DB", "exchange_db"),
-                    user=os.getenv("POSTGRES_USER", "exchange_user"),
-                    password=os.getenv("POSTGRES_PASSWORD", "exchange_pass"),
-                    min_size=10,
-                    max_size=30,
-                    command_timeout=60
+                    **self._connection_params(),
+                    min_size=POOL_SIZE,
+                    max_size=POOL_SIZE,
+                    max_inactive_connection_lifetime=0,
+                    statement_cache_size=1024,
+                    # Keep cached statements for the connection's lifetime;
+                    # asyncpg's default expiry would drop the warmed set
+                    max_cached_statement_lifetime=0,
+                    command_timeout=60,
+                    init=_prepare_all
                 )
                 self.connected = True
                 logger.info("Database connection pool created")
@@ -42,28 +375,48 @@ class DatabaseManager:
                 logger.error(f"Failed to connect to database: {e}")
                 raise
 
+        self.start_audit_flusher()
+
     async def disconnect(self):
         """Close database connection pool"""
+        await self.stop_audit_flusher()
+        await self.stop_balance_listener()
         if self.pool:
             await self.pool.close()
             self.connected = False
             logger.info("Database connection pool closed")
 
+    @contextlib.asynccontextmanager
+    async def _symbol_conn(self, symbol: str):
+        """
+        Yield a pooled connection for a symbol's writes, one writer per
+        symbol at a time. Serializing a symbol avoids cross-backend
+        contention on the same rows; the connection is borrowed per call,
+        so any number of symbols share the fixed-size pool.
+        """
+        lock = self._sym_locks.get(symbol)
+        if lock is None:
+            lock = self._sym_locks[symbol] = asyncio.Lock()
+
+        async with lock:
+            async with self.pool.acquire() as conn:
+                yield conn
+
+    def get_pool_stats(self) -> Dict[str, int]:
+        """Pool utilization, for sizing PG_POOL_SIZE against peak load"""
+        if not self.pool:
+            return {"size": 0, "idle": 0, "in_use": 0}
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {"size": size, "idle": idle, "in_use": size - idle}
+
     # ==================== User Management ====================
 
-    async def get_user_by_api_key(self, api_key: str) -> Optional[Dict]:
+    async def get_user_by_api_key(self, api_key: str) -> Optional[asyncpg.Record]:
         """Get user by API key"""
-        query = """
-            SELECT id, username, email, api_secret_hash, decoin_address,
-                   kyc_status, is_active, daily_volume_limit
-            FROM exchange.users
-            WHERE api_key = $1 AND is_active = true
-        """
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(query, api_key)
-            if row:
-                return dict(row)
-        return None
+            stmt = _statement(conn, "GET_USER_BY_API_KEY")
+            return await stmt.fetchrow(api_key)
 
     async def create_user(self, username: str, email: str,
                           api_key: str, api_secret_hash: str,
@@ -84,95 +437,147 @@ class DatabaseManager:
 
     # ==================== Order Management ====================
 
+    @staticmethod
+    def _order_record(order_data: Dict) -> Tuple:
+        """Convert order data into a row matching ORDER_COLUMNS"""
+        return (
+            f"ORD_{_IDGEN.next_hex16()}",
+            _as_uuid(order_data["user_id"]) if order_data.get("user_id") else None,
+            order_data["symbol"],
+            order_data["side"],
+            order_data.get("order_type", "limit"),
+            "new",
+            Decimal(str(order_data["quantity"])),
+            Decimal(str(order_data["price"])) if order_data.get("price") else None,
+            Decimal(str(order_data["stop_price"])) if order_data.get("stop_price") else None,
+            order_data.get("time_in_force", "GTC")
+        )
+
     async def insert_order(self, order_data: Dict) -> str:
         """Insert new order into database"""
-        order_id = f"ORD_{uuid4().hex[:16]}"
-
-        query = """
-            INSERT INTO exchange.orders
-            (order_id, user_id, symbol, side, order_type, status,
-             quantity, price, stop_price, time_in_force)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-            RETURNING id
-        """
+        record = self._order_record(order_data)
+        order_id = record[0]
 
-        async with self.pool.acquire() as conn:
-            db_id = await conn.fetchval(
-                query,
-                order_id,
-                UUID(order_data.get("user_id")) if order_data.get("user_id") else None,
-                order_data["symbol"],
-                order_data["side"],
-                order_data.get("order_type", "limit"),
-                "new",
-                Decimal(str(order_data["quantity"])),
-                Decimal(str(order_data["price"])) if order_data.get("price") else None,
-                Decimal(str(order_data["stop_price"])) if order_data.get("stop_price") else None,
-                order_data.get("time_in_force", "GTC")
-            )
+        async with self._symbol_conn(order_data["symbol"]) as conn:
+            stmt = _statement(conn, "INSERT_ORDER")
+            db_id = await stmt.fetchval(*record)
 
             logger.info(f"Inserted order {order_id} with DB ID {db_id}")
             return order_id
 
+    async def insert_orders_bulk(self, orders: List[Dict]) -> List[str]:
+        """Insert many orders in as few round-trips as possible"""
+        records = [self._order_record(order) for order in orders]
+        await self._insert_bulk("orders", ORDER_COLUMNS, "INSERT_ORDERS", records)
+        return [record[0] for record in records]
+
+    async def place_order_atomic(self, order_data: Dict) -> Optional[str]:
+        """
+        Lock the order's funds and insert it in a single statement.
+        Buys lock quote currency (price * quantity unless order_data carries
+        a lock_amount, which market and other priceless buys must); sells
+        lock the base quantity. Returns the order ID, or None if the
+        available balance is insufficient.
+        """
+        record = self._order_record(order_data)
+        order_id = record[0]
+        base_currency, quote_currency = order_data["symbol"].split("/")
+
+        lock_amount = order_data.get("lock_amount")
+        if order_data["side"] == "buy":
+            lock_currency = quote_currency
+            if lock_amount is None:
+                if record[7] is None:
+                    raise ValueError("Buy orders without a price need an explicit lock_amount")
+                lock_amount = record[6] * record[7]
+        else:
+            lock_currency = base_currency
+            if lock_amount is None:
+                lock_amount = record[6]
+
+        lock_amount = Decimal(str(lock_amount)).quantize(_LOCK_QUANTUM, ROUND_HALF_UP)
+        if lock_amount < 0:
+            raise ValueError("lock_amount must not be negative")
+
+        async with self._symbol_conn(order_data["symbol"]) as conn:
+            stmt = _statement(conn, "PLACE_ORDER_ATOMIC")
+            row = await stmt.fetchrow(*record, lock_amount, lock_currency)
+
+        if not row:
+            logger.info(f"Rejected order {order_id}: insufficient {lock_currency}")
+            return None
+
+        self._cache_balance(order_data["user_id"], lock_currency,
+                            row["available"], row["locked"])
+        logger.info(f"Placed order {order_id} with DB ID {row['id']}")
+        return order_id
+
+    async def cancel_order_atomic(self, order_id: str) -> bool:
+        """
+        Cancel an open order and release the funds it locked in a single
+        statement. Returns False if the order is not open, or if releasing
+        its lock would drive balances.locked negative.
+        """
+        async with self.pool.acquire() as conn:
+            stmt = _statement(conn, "CANCEL_ORDER_ATOMIC")
+            row = await stmt.fetchrow(order_id)
+
+        if not row:
+            return False
+
+        if row["currency"] is not None:
+            self._cache_balance(row["user_id"], row["currency"],
+                                row["available"], row["locked"])
+        logger.info(f"Cancelled order {order_id}")
+        return True
+
     async def update_order_status(self, order_id: str, status: str,
                                   filled_quantity: Optional[Decimal] = None,
                                   average_price: Optional[Decimal] = None):
         """Update order status and fill information"""
-        query = """
-            UPDATE exchange.orders
-            SET status = $2,
-                filled_quantity = COALESCE($3, filled_quantity),
-                average_price = COALESCE($4, average_price),
-                updated_at = CURRENT_TIMESTAMP
-            WHERE order_id = $1
-        """
-
         async with self.pool.acquire() as conn:
-            await conn.execute(query, order_id, status, filled_quantity, average_price)
+            stmt = _statement(conn, "UPDATE_ORDER_STATUS")
+            await stmt.fetchval(order_id, status, filled_quantity, average_price)
             logger.debug(f"Updated order {order_id} status to {status}")
 
-    async def get_order(self, order_id: str) -> Optional[Dict]:
+    async def get_order(self, order_id: str) -> Optional[asyncpg.Record]:
         """Get order by ID"""
         query = """
             SELECT * FROM exchange.orders
             WHERE order_id = $1
         """
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(query, order_id)
-            if row:
-                return dict(row)
-        return None
+            return await conn.fetchrow(query, order_id)
 
-    async def get_user_orders(self, user_id: str,
-                              status: Optional[str] = None,
+    async def get_user_orders(self, user_id: UserId,
+                              status: Optional[Union[str, List[str]]] = None,
                               symbol: Optional[str] = None,
-                              limit: int = 100) -> List[Dict]:
-        """Get orders for a user"""
-        query = """
-            SELECT * FROM exchange.orders
-            WHERE user_id = $1
-        """
-        params = [UUID(user_id)]
-
-        if status:
-            query += f" AND status = ${len(params) + 1}"
-            params.append(status)
-
-        if symbol:
-            query += f" AND symbol = ${len(params) + 1}"
-            params.append(symbol)
-
-        query += " ORDER BY created_at DESC LIMIT $" + str(len(params) + 1)
-        params.append(limit)
+                              limit: int = 100) -> List[asyncpg.Record]:
+        """Get orders for a user, optionally filtered by status(es) and symbol"""
+        if isinstance(status, str):
+            status = [status]
+
+        if status and symbol:
+            name, params = "GET_USER_ORDERS_STATUS_SYMBOL", (_as_uuid(user_id), status, symbol, limit)
+        elif status:
+            name, params = "GET_USER_ORDERS_STATUS", (_as_uuid(user_id), status, limit)
+        elif symbol:
+            name, params = "GET_USER_ORDERS_SYMBOL", (_as_uuid(user_id), symbol, limit)
+        else:
+            name, params = "GET_USER_ORDERS", (_as_uuid(user_id), limit)
 
         async with self.pool.acquire() as conn:
-            rows = await conn.fetch(query, *params)
-            return [dict(row) for row in rows]
+            stmt = _statement(conn, name)
+            rows = await stmt.fetch(*params)
+            return rows
 
-    async def get_active_orders(self, symbol: Optional[str] = None) -> List[Dict]:
+    async def get_active_orders(self, symbol: Optional[str] = None) -> List[asyncpg.Record]:
         """Get all active orders"""
+        # Columns limited to idx_orders_active so the scan can be index-only
         query = """
-            SELECT * FROM exchange.orders
+            SELECT order_id, user_id, symbol, side, price, quantity,
+                   filled_quantity, created_at
+            FROM exchange.orders
             WHERE status IN ('new', 'partially_filled')
         """
         params = []
@@ -188,43 +593,80 @@ class DatabaseManager:
                 rows = await conn.fetch(query, *params)
             else:
                 rows = await conn.fetch(query)
-            return [dict(row) for row in rows]
+            return rows
+
+    async def _insert_bulk(self, table: str, columns: Tuple[str, ...],
+                           statement_prefix: str, records: List[Tuple]):
+        """Insert rows with COPY for large batches, multi-row VALUES otherwise"""
+        if not records:
+            return
+
+        # Route each symbol's rows to its dedicated connection
+        symbol_index = columns.index("symbol")
+        by_symbol: Dict[str, List[Tuple]] = {}
+        for record in records:
+            by_symbol.setdefault(record[symbol_index], []).append(record)
+
+        for symbol, symbol_records in by_symbol.items():
+            async with self._symbol_conn(symbol) as conn:
+                if len(symbol_records) >= BULK_COPY_THRESHOLD:
+                    await conn.copy_records_to_table(
+                        table, schema_name="exchange", columns=columns, records=symbol_records
+                    )
+                    continue
+
+                async with conn.transaction():
+                    offset = 0
+                    while offset < len(symbol_records):
+                        remaining = len(symbol_records) - offset
+                        size = next(n for n in _BULK_VALUES_SIZES if n <= remaining)
+                        stmt = _statement(conn, f"{statement_prefix}_{size}")
+                        await stmt.fetchval(
+                            *[value for record in symbol_records[offset:offset + size]
+                              for value in record]
+                        )
+                        offset += size
+
+        logger.info(f"Bulk inserted {len(records)} rows into {table}")
 
     # ==================== Trade Management ====================
 
+    @staticmethod
+    def _trade_record(trade_data: Dict) -> Tuple:
+        """Convert trade data into a row matching TRADE_COLUMNS"""
+        return (
+            f"TRD_{_IDGEN.next_hex16()}",
+            trade_data["symbol"],
+            trade_data.get("buyer_order_id"),
+            trade_data.get("seller_order_id"),
+            _as_uuid(trade_data["buyer_user_id"]) if trade_data.get("buyer_user_id") else None,
+            _as_uuid(trade_data["seller_user_id"]) if trade_data.get("seller_user_id") else None,
+            Decimal(str(trade_data["price"])),
+            Decimal(str(trade_data["quantity"])),
+            trade_data.get("maker_side", "buy"),
+            Decimal(str(trade_data.get("taker_fee", 0))),
+            Decimal(str(trade_data.get("maker_fee", 0)))
+        )
+
     async def insert_trade(self, trade_data: Dict) -> str:
         """Insert executed trade into database"""
-        trade_id = f"TRD_{uuid4().hex[:16]}"
-
-        query = """
-            INSERT INTO exchange.trades
-            (trade_id, symbol, buyer_order_id, seller_order_id,
-             buyer_user_id, seller_user_id, price, quantity,
-             maker_side, taker_fee, maker_fee)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-            RETURNING id
-        """
+        record = self._trade_record(trade_data)
+        trade_id = record[0]
 
-        async with self.pool.acquire() as conn:
-            db_id = await conn.fetchval(
-                query,
-                trade_id,
-                trade_data["symbol"],
-                trade_data.get("buyer_order_id"),
-                trade_data.get("seller_order_id"),
-                UUID(trade_data.get("buyer_user_id")) if trade_data.get("buyer_user_id") else None,
-                UUID(trade_data.get("seller_user_id")) if trade_data.get("seller_user_id") else None,
-                Decimal(str(trade_data["price"])),
-                Decimal(str(trade_data["quantity"])),
-                trade_data.get("maker_side", "buy"),
-                Decimal(str(trade_data.get("taker_fee", 0))),
-                Decimal(str(trade_data.get("maker_fee", 0)))
-            )
+        async with self._symbol_conn(trade_data["symbol"]) as conn:
+            stmt = _statement(conn, "INSERT_TRADE")
+            db_id = await stmt.fetchval(*record)
 
             logger.info(f"Inserted trade {trade_id} with DB ID {db_id}")
             return trade_id
 
-    async def get_recent_trades(self, symbol: str, limit: int = 100) -> List[Dict]:
+    async def insert_trades_bulk(self, trades: List[Dict]) -> List[str]:
+        """Insert a burst of fills in as few round-trips as possible"""
+        records = [self._trade_record(trade) for trade in trades]
+        await self._insert_bulk("trades", TRADE_COLUMNS, "INSERT_TRADES", records)
+        return [record[0] for record in records]
+
+    async def get_recent_trades(self, symbol: str, limit: int = 100) -> List[asyncpg.Record]:
         """Get recent trades for a symbol"""
         query = """
             SELECT trade_id, price, quantity, maker_side, created_at
@@ -236,49 +678,87 @@ class DatabaseManager:
 
         async with self.pool.acquire() as conn:
             rows = await conn.fetch(query, symbol, limit)
-            return [dict(row) for row in rows]
+            return rows
 
-    async def get_user_trades(self, user_id: str,
+    async def get_user_trades(self, user_id: UserId,
                               symbol: Optional[str] = None,
-                              limit: int = 100) -> List[Dict]:
+                              limit: int = 100) -> List[asyncpg.Record]:
         """Get trades for a user"""
-        query = """
-            SELECT * FROM exchange.trades
-            WHERE buyer_user_id = $1 OR seller_user_id = $1
-        """
-        params = [UUID(user_id)]
-
         if symbol:
-            query += f" AND symbol = ${len(params) + 1}"
-            params.append(symbol)
-
-        query += " ORDER BY created_at DESC LIMIT $" + str(len(params) + 1)
-        params.append(limit)
+            name, params = "GET_USER_TRADES_SYMBOL", (_as_uuid(user_id), symbol, limit)
+        else:
+            name, params = "GET_USER_TRADES", (_as_uuid(user_id), limit)
 
         async with self.pool.acquire() as conn:
-            rows = await conn.fetch(query, *params)
-            return [dict(row) for row in rows]
+            stmt = _statement(conn, name)
+            rows = await stmt.fetch(*params)
+            return rows
 
     # ==================== Balance Management ====================
 
-    async def get_user_balance(self, user_id: str, currency: str) -> Dict:
+    async def get_user_balance(self, user_id: UserId, currency: str) -> Dict:
         """Get user balance for a specific currency"""
-        query = """
-            SELECT available, locked, total
-            FROM exchange.balances
-            WHERE user_id = $1 AND currency = $2
-        """
+        uid = _as_uuid(user_id)
+        cached = self._balance_cache.get((uid, currency))
+        if cached is not None:
+            return dict(cached)
 
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(query, UUID(user_id), currency)
+            stmt = _statement(conn, "GET_USER_BALANCE")
+            row = await stmt.fetchrow(uid, currency)
             if row:
-                return dict(row)
+                # Fill only if absent: a write-through that landed while this
+                # read was in flight holds a newer balance than the row
+                balance = self._balance_cache.setdefault((uid, currency), dict(row))
+                return dict(balance)
 
             # Create zero balance if not exists
             await self.create_balance(user_id, currency)
             return {"available": Decimal(0), "locked": Decimal(0), "total": Decimal(0)}
 
-    async def get_all_user_balances(self, user_id: str) -> List[Dict]:
+    def _cache_balance(self, user_id: UserId, currency: str,
+                       available: Decimal, locked: Decimal):
+        """Write a freshly persisted balance through to the cache"""
+        self._balance_cache[(_as_uuid(user_id), currency)] = {
+            "available": available,
+            "locked": locked,
+            "total": available + locked
+        }
+
+    def invalidate_balance(self, user_id: UserId, currency: str):
+        """Drop a cached balance so the next read goes to the database"""
+        self._balance_cache.pop((_as_uuid(user_id), currency), None)
+
+    async def listen_balance_changes(
+            self, callback: Optional[Callable[[Dict], Awaitable[None]]] = None):
+        """
+        Subscribe to the 'balances' NOTIFY channel on a dedicated connection.
+        Each change refreshes the balance cache and is passed to callback
+        (e.g. to push the update to the user's WebSocket).
+        """
+        if self._listen_conn is not None:
+            return
+
+        def on_notify(conn, pid, channel, payload):
+            change = json.loads(payload)
+            change["available"] = Decimal(str(change["available"]))
+            change["locked"] = Decimal(str(change["locked"]))
+            self._cache_balance(change["user_id"], change["currency"],
+                                change["available"], change["locked"])
+            if callback:
+                asyncio.create_task(callback(change))
+
+        self._listen_conn = await asyncpg.connect(**self._connection_params())
+        await self._listen_conn.add_listener("balances", on_notify)
+        logger.info("Listening for balance changes")
+
+    async def stop_balance_listener(self):
+        """Close the LISTEN connection"""
+        if self._listen_conn is not None:
+            await self._listen_conn.close()
+            self._listen_conn = None
+
+    async def get_all_user_balances(self, user_id: UserId) -> List[asyncpg.Record]:
         """Get all balances for a user"""
         query = """
             SELECT currency, available, locked, total
@@ -287,10 +767,10 @@ class DatabaseManager:
         """
 
         async with self.pool.acquire() as conn:
-            rows = await conn.fetch(query, UUID(user_id))
-            return [dict(row) for row in rows]
+            rows = await conn.fetch(query, _as_uuid(user_id))
+            return rows
 
-    async def create_balance(self, user_id: str, currency: str,
+    async def create_balance(self, user_id: UserId, currency: str,
                            available: Decimal = Decimal(0),
                            locked: Decimal = Decimal(0)) -> bool:
         """Create or update user balance"""
@@ -305,45 +785,29 @@ class DatabaseManager:
         """
 
         async with self.pool.acquire() as conn:
-            await conn.execute(query, UUID(user_id), currency, available, locked)
+            await conn.execute(query, _as_uuid(user_id), currency, available, locked)
+            self._cache_balance(user_id, currency, available, locked)
             logger.info(f"Created/updated balance for user {user_id}, currency {currency}")
             return True
 
-    async def update_balance(self, user_id: str, currency: str,
+    async def update_balance(self, user_id: UserId, currency: str,
                             available_delta: Decimal = Decimal(0),
                             locked_delta: Decimal = Decimal(0)) -> bool:
         """Update user balance with deltas"""
-        query = """
-            UPDATE exchange.balances
-            SET available = available + $3,
-                locked = locked + $4,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = $1 AND currency = $2
-            RETURNING available, locked
-        """
-
         async with self.pool.acquire() as conn:
-            result = await conn.fetchrow(
-                query, UUID(user_id), currency, available_delta, locked_delta
+            stmt = _statement(conn, "UPDATE_BALANCE")
+            result = await stmt.fetchrow(
+                _as_uuid(user_id), currency, available_delta, locked_delta
             )
 
+            # No row means the balance is missing or would go negative
             if result:
-                if result['available'] < 0 or result['locked'] < 0:
-                    # Rollback if balance would go negative
-                    await conn.execute(
-                        """
-                        UPDATE exchange.balances
-                        SET available = available - $3,
-                            locked = locked - $4
-                        WHERE user_id = $1 AND currency = $2
-                        """,
-                        UUID(user_id), currency, available_delta, locked_delta
-                    )
-                    return False
+                self._cache_balance(user_id, currency, result['available'], result['locked'])
                 return True
+            self.invalidate_balance(user_id, currency)
             return False
 
-    async def lock_balance_for_order(self, user_id: str, currency: str,
+    async def lock_balance_for_order(self, user_id: UserId, currency: str,
                                     amount: Decimal) -> bool:
         """Lock balance for an order (move from available to locked)"""
         return await self.update_balance(
@@ -352,7 +816,7 @@ class DatabaseManager:
             locked_delta=amount
         )
 
-    async def unlock_balance(self, user_id: str, currency: str,
+    async def unlock_balance(self, user_id: UserId, currency: str,
                            amount: Decimal) -> bool:
         """Unlock balance (move from locked to available)"""
         return await self.update_balance(
@@ -363,36 +827,60 @@ class DatabaseManager:
 
     async def execute_trade_settlement(self, trade_data: Dict) -> bool:
         """Execute balance updates for a trade"""
-        async with self.pool.acquire() as conn:
-            async with conn.transaction():
-                # Update buyer balance (receive base currency)
-                buyer_id = trade_data.get("buyer_user_id")
-                seller_id = trade_data.get("seller_user_id")
+        return await self.execute_trades_settlement([trade_data])
 
-                if not buyer_id or not seller_id:
-                    return False
+    async def execute_trades_settlement(self, trades: List[Dict]) -> bool:
+        """
+        Execute balance updates for a batch of fills with one multi-row UPDATE.
+        Buyers receive the base currency, sellers the quote currency.
+        """
+        deltas: Dict[Tuple[UUID, str], Decimal] = {}
+        for trade_data in trades:
+            buyer_id = trade_data.get("buyer_user_id")
+            seller_id = trade_data.get("seller_user_id")
 
-                base_currency, quote_currency = trade_data["symbol"].split("/")
-                quantity = Decimal(str(trade_data["quantity"]))
-                price = Decimal(str(trade_data["price"]))
-                total = quantity * price
+            if not buyer_id or not seller_id:
+                return False
 
-                # Buyer receives base currency
-                await self.update_balance(buyer_id, base_currency, available_delta=quantity)
+            base_currency, quote_currency = trade_data["symbol"].split("/")
+            quantity = Decimal(str(trade_data["quantity"]))
+            total = quantity * Decimal(str(trade_data["price"]))
 
-                # Seller receives quote currency
-                await self.update_balance(seller_id, quote_currency, available_delta=total)
+            # Fold fills per (user, currency): one VALUES row per balance
+            buyer_key = (_as_uuid(buyer_id), base_currency)
+            seller_key = (_as_uuid(seller_id), quote_currency)
+            deltas[buyer_key] = deltas.get(buyer_key, 0) + quantity
+            deltas[seller_key] = deltas.get(seller_key, 0) + total
 
-                # Unlock any remaining locked balances
-                # This would need order information to be precise
+            logger.info(f"Settled trade: {quantity} {base_currency} for {total} {quote_currency}")
 
-                logger.info(f"Settled trade: {quantity} {base_currency} for {total} {quote_currency}")
-                return True
+        if not deltas:
+            return True
+
+        user_ids = [key[0] for key in deltas]
+        currencies = [key[1] for key in deltas]
+        amounts = list(deltas.values())
+
+        # Unlock any remaining locked balances
+        # This would need order information to be precise
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                stmt = _statement(conn, "SETTLE_BALANCES")
+                rows = await stmt.fetch(user_ids, currencies, amounts)
+
+        for row in rows:
+            self._cache_balance(row["user_id"], row["currency"], row["available"], row["locked"])
+        return True
 
     # ==================== Market Data ====================
 
     async def get_24h_stats(self, symbol: str) -> Dict:
-        """Get 24-hour statistics for a symbol"""
+        """Get 24-hour statistics for a symbol (cached for one refresh tick)"""
+        cached = self._stats_cache.get(symbol)
+        if cached is not None:
+            return dict(cached)
+
+        # Range scan over idx_trades_recent, which covers price and quantity
         query = """
             SELECT
                 COUNT(*) as trade_count,
@@ -408,14 +896,18 @@ class DatabaseManager:
         async with self.pool.acquire() as conn:
             row = await conn.fetchrow(query, symbol)
             if row:
-                return dict(row)
-            return {
-                "trade_count": 0,
-                "volume": Decimal(0),
-                "high": Decimal(0),
-                "low": Decimal(0),
-                "avg_price": Decimal(0)
-            }
+                stats = dict(row)
+            else:
+                stats = {
+                    "trade_count": 0,
+                    "volume": Decimal(0),
+                    "high": Decimal(0),
+                    "low": Decimal(0),
+                    "avg_price": Decimal(0)
+                }
+
+        self._stats_cache[symbol] = stats
+        return dict(stats)
 
     async def save_candle(self, symbol: str, interval: str, candle_data: Dict):
         """Save OHLCV candle data"""
@@ -433,7 +925,7 @@ class DatabaseManager:
                 trades_count = candles.trades_count + $10
         """
 
-        async with self.pool.acquire() as conn:
+        async with self._symbol_conn(symbol) as conn:
             await conn.execute(
                 query,
                 symbol,
@@ -448,30 +940,165 @@ class DatabaseManager:
                 candle_data.get("trades_count", 0)
             )
 
+    async def save_candles_bulk(self, symbol: str, interval: str, candles: List[Dict]):
+        """Upsert many OHLCV candles (historical backfills) via COPY into a staging table"""
+        if not candles:
+            return
+
+        # Fold candles sharing an open_time so the merge touches each row once
+        merged: Dict[Any, List] = {}
+        for candle in candles:
+            row = merged.get(candle["open_time"])
+            if row is None:
+                merged[candle["open_time"]] = [
+                    symbol,
+                    interval,
+                    candle["open_time"],
+                    candle["close_time"],
+                    Decimal(str(candle["open"])),
+                    Decimal(str(candle["high"])),
+                    Decimal(str(candle["low"])),
+                    Decimal(str(candle["close"])),
+                    Decimal(str(candle["volume"])),
+                    candle.get("trades_count", 0)
+                ]
+            else:
+                row[5] = max(row[5], Decimal(str(candle["high"])))
+                row[6] = min(row[6], Decimal(str(candle["low"])))
+                row[7] = Decimal(str(candle["close"]))
+                row[8] += Decimal(str(candle["volume"]))
+                row[9] += candle.get("trades_count", 0)
+
+        columns = ["symbol", "interval", "open_time", "close_time",
+                   "open", "high", "low", "close", "volume", "trades_count"]
+
+        async with self._symbol_conn(symbol) as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    CREATE TEMP TABLE _candles_stage
+                    (LIKE exchange.candles INCLUDING DEFAULTS)
+                    ON COMMIT DROP
+                """)
+                await conn.copy_records_to_table(
+                    "_candles_stage",
+                    columns=columns,
+                    records=[tuple(row) for row in merged.values()]
+                )
+                await conn.execute("""
+                    INSERT INTO exchange.candles
+                    (symbol, interval, open_time, close_time,
+                     open, high, low, close, volume, trades_count)
+                    SELECT symbol, interval, open_time, close_time,
+                           open, high, low, close, volume, trades_count
+                    FROM _candles_stage
+                    ON CONFLICT (symbol, interval, open_time)
+                    DO UPDATE SET
+                        high = GREATEST(candles.high, EXCLUDED.high),
+                        low = LEAST(candles.low, EXCLUDED.low),
+                        close = EXCLUDED.close,
+                        volume = candles.volume + EXCLUDED.volume,
+                        trades_count = candles.trades_count + EXCLUDED.trades_count
+                """)
+
+        logger.info(f"Saved {len(merged)} {interval} candles for {symbol}")
+
     # ==================== Audit & Logging ====================
 
-    async def log_audit_event(self, user_id: Optional[str], action: str,
+    async def log_audit_event(self, user_id: Optional[UserId], action: str,
                              resource_type: Optional[str] = None,
                              resource_id: Optional[str] = None,
                              metadata: Optional[Dict] = None,
                              ip_address: Optional[str] = None):
-        """Log an audit event"""
-        query = """
-            INSERT INTO exchange.audit_log
-            (user_id, action, resource_type, resource_id, metadata, ip_address)
-            VALUES ($1, $2, $3, $4, $5, $6)
-        """
+        """Log an audit event (queued for the background flusher when running)"""
+        record = (
+            _as_uuid(user_id) if user_id else None,
+            action,
+            resource_type,
+            resource_id,
+            _dumps_json(metadata) if metadata else None,
+            ip_address
+        )
+
+        if self._audit_task is not None:
+            try:
+                self._audit_q.put_nowait(record)
+                return
+            except asyncio.QueueFull:
+                logger.warning("Audit queue full, writing event synchronously")
 
         async with self.pool.acquire() as conn:
-            await conn.execute(
-                query,
-                UUID(user_id) if user_id else None,
-                action,
-                resource_type,
-                resource_id,
-                json.dumps(metadata) if metadata else None,
-                ip_address
-            )
+            stmt = _statement(conn, "INSERT_AUDIT_EVENT")
+            await stmt.fetchval(*record)
+
+    def start_audit_flusher(self):
+        """Start the background task that batches audit writes"""
+        if self._audit_task is None:
+            self._audit_task = asyncio.create_task(self._audit_flush_loop())
+
+    async def stop_audit_flusher(self):
+        """Stop the audit flusher and write whatever is still queued"""
+        if self._audit_task is None:
+            return
+        self._audit_task.cancel()
+        try:
+            await self._audit_task
+        except asyncio.CancelledError:
+            pass
+        self._audit_task = None
+
+        # The batch the flusher was writing may or may not have committed;
+        # writing it again risks a duplicate row rather than a lost event
+        batches = [self._audit_batch] if self._audit_batch else []
+        self._audit_batch = []
+        while not self._audit_q.empty():
+            batch = []
+            while len(batch) < AUDIT_BATCH_SIZE and not self._audit_q.empty():
+                batch.append(self._audit_q.get_nowait())
+            batches.append(batch)
+
+        for batch in batches:
+            if not await self._write_audit_batch(batch):
+                self._spill_audit_batch(batch)
+
+    async def _audit_flush_loop(self):
+        """Drain the audit queue every AUDIT_FLUSH_INTERVAL or AUDIT_BATCH_SIZE events"""
+        while True:
+            batch = [await self._audit_q.get()]
+            if self._audit_q.qsize() < AUDIT_BATCH_SIZE - 1:
+                await asyncio.sleep(AUDIT_FLUSH_INTERVAL)
+            while len(batch) < AUDIT_BATCH_SIZE and not self._audit_q.empty():
+                batch.append(self._audit_q.get_nowait())
+
+            # Hold the batch until it is written; meanwhile the queue fills
+            # and log_audit_event falls back to synchronous writes
+            self._audit_batch = batch
+            delay = AUDIT_RETRY_MIN
+            while not await self._write_audit_batch(batch):
+                logger.warning(f"Retrying {len(batch)} audit events in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, AUDIT_RETRY_MAX)
+            self._audit_batch = []
+
+    async def _write_audit_batch(self, batch: List[Tuple]) -> bool:
+        """Write a batch of audit records with COPY"""
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.copy_records_to_table(
+                    "audit_log", schema_name="exchange",
+                    columns=AUDIT_COLUMNS, records=batch
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} audit events: {e}")
+            return False
+
+    @staticmethod
+    def _spill_audit_batch(batch: List[Tuple]):
+        """Append audit records that could not be written to AUDIT_SPILL_PATH"""
+        with open(AUDIT_SPILL_PATH, "a") as spill:
+            for record in batch:
+                spill.write(json.dumps(dict(zip(AUDIT_COLUMNS, record)), default=str) + "\n")
+        logger.error(f"Spilled {len(batch)} audit events to {AUDIT_SPILL_PATH}")
 
 
 # Singleton instance
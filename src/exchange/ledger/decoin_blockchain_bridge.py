@@ -5,29 +5,142 @@ Handles deposits and withdrawals with the live DeCoin blockchain
 
 import aiohttp
 import asyncio
+import functools
 import hashlib
+import json
+import ssl
+from cachetools import TTLCache
 from typing import Dict, Optional, List
 from decimal import Decimal
 from datetime import datetime
 import logging
 
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None  # Redis backing is optional
+
 logger = logging.getLogger(__name__)
 
+# Pending transaction tracking: bounded in memory, durable in Redis
+PENDING_CACHE_SIZE = 100_000
+PENDING_TTL_SECONDS = 3600
+
+# Node HTTP client: bulk submissions never hold more requests in flight than
+# the connector has connections, so none wait in its queue. Timeouts are split:
+# failing to connect means the node never saw the request and it is safe to
+# retry, while a slow response may belong to a transaction already accepted.
+NODE_CONN_LIMIT = 64
+NODE_CONNECT_TIMEOUT = 5
+NODE_READ_TIMEOUT = 30
+
+# Errors raised before the request body reaches the node
+_NOT_SENT_ERRORS = (aiohttp.ClientConnectorError,) + (
+    (aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, "ConnectionTimeoutError") else ()
+)
+
+
+def _cpu_has_sha_ni() -> bool:
+    """Check /proc/cpuinfo for the x86 SHA extensions"""
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("flags"):
+                    return "sha_ni" in line.split()
+    except OSError:
+        pass
+    return False
+
+
+# hashlib.sha256 is backed by OpenSSL, which dispatches to SHA-NI at runtime
+# when the CPU supports it, so no separate accelerated binding is needed
+SHA_NI_AVAILABLE = _cpu_has_sha_ni()
+_sha256 = hashlib.sha256
+
 
 class SimpleDeCoinBridge:
     """Simplified bridge for DeCoin blockchain integration"""
 
-    def __init__(self, node_url: str = "http://localhost:11080"):
+    def __init__(self, node_url: str = "http://localhost:11080",
+                 redis_url: Optional[str] = None):
         self.node_url = node_url
         self.exchange_address = self.generate_address("exchange_master")
-        self.pending_deposits: Dict[str, Dict] = {}
-        self.pending_withdrawals: Dict[str, Dict] = {}
+        self.pending_deposits: TTLCache = TTLCache(PENDING_CACHE_SIZE, PENDING_TTL_SECONDS)
+        self.pending_withdrawals: TTLCache = TTLCache(PENDING_CACHE_SIZE, PENDING_TTL_SECONDS)
+
+        # Optional Redis backing so pending state survives restarts and is
+        # shared between processes
+        self.redis = None
+        if redis_url and aioredis:
+            self.redis = aioredis.from_url(redis_url, decode_responses=True)
+
+        # Shared HTTP session with keep-alive connections (created lazily,
+        # it needs a running event loop)
+        self._sess: Optional[aiohttp.ClientSession] = None
+        self._sess_lock = asyncio.Lock()
+        self._tx_slots = asyncio.Semaphore(NODE_CONN_LIMIT)
+
         logger.info(f"Exchange master address: {self.exchange_address}")
+        logger.info(
+            f"SHA-256 backend: {ssl.OPENSSL_VERSION} "
+            f"({'SHA-NI' if SHA_NI_AVAILABLE else 'no SHA-NI'})"
+        )
+
+    async def _session(self) -> aiohttp.ClientSession:
+        """Get the shared ClientSession, creating it on first use"""
+        if self._sess is None or self._sess.closed:
+            async with self._sess_lock:
+                if self._sess is None or self._sess.closed:
+                    self._sess = aiohttp.ClientSession(
+                        connector=aiohttp.TCPConnector(limit=NODE_CONN_LIMIT, keepalive_timeout=60),
+                        timeout=aiohttp.ClientTimeout(
+                            total=None,
+                            connect=NODE_CONNECT_TIMEOUT,
+                            sock_read=NODE_READ_TIMEOUT
+                        )
+                    )
+        return self._sess
+
+    async def close(self):
+        """Close the shared HTTP session and Redis connection"""
+        if self._sess is not None and not self._sess.closed:
+            await self._sess.close()
+        self._sess = None
+        if self.redis is not None:
+            await self.redis.close()
 
-    def generate_address(self, seed: str) -> str:
-        """Generate deterministic DeCoin address"""
-        hash_bytes = hashlib.sha256(seed.encode()).digest()
-        address_hash = hashlib.sha256(hash_bytes).hexdigest()[:32]
+    async def _store_pending(self, kind: str, tx_id: str, record: Dict):
+        """Persist a pending deposit/withdrawal record to Redis"""
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(
+                f"pending:{kind}:{tx_id}",
+                json.dumps(record, default=str),
+                ex=PENDING_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Failed to store pending {kind} {tx_id} in Redis: {e}")
+
+    async def _load_pending(self, tx_id: str) -> Optional[Dict]:
+        """Look up a pending deposit/withdrawal record in Redis"""
+        if self.redis is None:
+            return None
+        try:
+            for kind in ("deposit", "withdrawal"):
+                data = await self.redis.get(f"pending:{kind}:{tx_id}")
+                if data:
+                    return json.loads(data)
+        except Exception as e:
+            logger.error(f"Failed to load pending transaction {tx_id} from Redis: {e}")
+        return None
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def generate_address(seed: str) -> str:
+        """Generate deterministic DeCoin address (memoized per seed)"""
+        hash_bytes = _sha256(seed.encode()).digest()
+        address_hash = _sha256(hash_bytes).hexdigest()[:32]
         return f"DEC{address_hash}"
 
     def get_user_deposit_address(self, user_id: str) -> str:
@@ -36,60 +149,69 @@ class SimpleDeCoinBridge:
 
     async def submit_transaction(self, sender: str, recipient: str, amount: float) -> Dict:
         """Submit transaction to DeCoin blockchain"""
-        async with aiohttp.ClientSession() as session:
-            tx_data = {
-                "sender": sender,
-                "recipient": recipient,
-                "amount": amount
-            }
+        return await self._post_transaction({
+            "sender": sender,
+            "recipient": recipient,
+            "amount": amount
+        })
 
-            try:
-                async with session.post(
-                    f"{self.node_url}/transaction",
-                    json=tx_data,
-                    timeout=aiohttp.ClientTimeout(total=5)
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result
-                    else:
-                        error = await response.text()
-                        logger.error(f"Transaction failed: {error}")
-                        return {"success": False, "error": error}
-            except Exception as e:
-                logger.error(f"Transaction error: {e}")
-                return {"success": False, "error": str(e)}
+    async def submit_transactions_bulk(self, txs: List[Dict]) -> List[Dict]:
+        """
+        Submit many transactions concurrently over the pooled keep-alive
+        connections, at most NODE_CONN_LIMIT at a time
+        """
+        return await asyncio.gather(*[self._post_transaction(tx) for tx in txs])
+
+    async def _post_transaction(self, tx_data: Dict) -> Dict:
+        """
+        POST one transaction to the node. Errors after the request may have
+        been sent come back with status "unknown": the node may have accepted
+        it, so the caller must reconcile rather than resubmit.
+        """
+        session = await self._session()
+        try:
+            async with self._tx_slots, session.post(
+                f"{self.node_url}/transaction",
+                json=tx_data
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    return result
+                else:
+                    error = await response.text()
+                    logger.error(f"Transaction failed: {error}")
+                    return {"success": False, "error": error}
+        except _NOT_SENT_ERRORS as e:
+            logger.error(f"Transaction not sent: {e}")
+            return {"success": False, "error": str(e)}
+        except Exception as e:
+            logger.error(f"Transaction outcome unknown: {e!r}")
+            return {"success": False, "status": "unknown", "error": str(e) or repr(e)}
 
     async def get_blockchain_info(self) -> Dict:
         """Get blockchain information"""
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(
-                    f"{self.node_url}/blockchain",
-                    timeout=aiohttp.ClientTimeout(total=5)
-                ) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    return {}
-            except Exception as e:
-                logger.error(f"Failed to get blockchain info: {e}")
+        session = await self._session()
+        try:
+            async with session.get(f"{self.node_url}/blockchain") as response:
+                if response.status == 200:
+                    return await response.json()
                 return {}
+        except Exception as e:
+            logger.error(f"Failed to get blockchain info: {e}")
+            return {}
 
     async def get_balance(self, address: str) -> float:
         """Get balance for an address"""
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(
-                    f"{self.node_url}/balance/{address}",
-                    timeout=aiohttp.ClientTimeout(total=5)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("balance", 0.0)
-                    return 0.0
-            except Exception as e:
-                logger.error(f"Failed to get balance: {e}")
+        session = await self._session()
+        try:
+            async with session.get(f"{self.node_url}/balance/{address}") as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data.get("balance", 0.0)
                 return 0.0
+        except Exception as e:
+            logger.error(f"Failed to get balance: {e}")
+            return 0.0
 
     async def process_deposit(self, user_id: str, amount: Decimal) -> Dict:
         """Process a deposit from blockchain to exchange"""
@@ -105,12 +227,14 @@ class SimpleDeCoinBridge:
 
         if tx_result.get("success"):
             tx_id = tx_result.get("data", {}).get("transaction_id", "unknown")
-            self.pending_deposits[tx_id] = {
+            record = {
                 "user_id": user_id,
                 "amount": amount,
                 "timestamp": datetime.utcnow(),
                 "status": "confirmed"
             }
+            self.pending_deposits[tx_id] = record
+            await self._store_pending("deposit", tx_id, record)
             logger.info(f"Deposit processed: {amount} DEC for user {user_id}")
             return {"success": True, "tx_id": tx_id, "amount": amount}
         else:
@@ -125,17 +249,49 @@ class SimpleDeCoinBridge:
             amount=float(amount)
         )
 
+        return await self._record_withdrawal(user_id, amount, to_address, tx_result)
+
+    async def process_withdrawals_bulk(self, withdrawals: List[Dict]) -> List[Dict]:
+        """
+        Process a batch of withdrawals ({user_id, amount, to_address}) with
+        their node submissions in flight concurrently
+        """
+        tx_results = await self.submit_transactions_bulk([
+            {
+                "sender": self.exchange_address,
+                "recipient": w["to_address"],
+                "amount": float(w["amount"])
+            }
+            for w in withdrawals
+        ])
+        return [
+            await self._record_withdrawal(w["user_id"], w["amount"], w["to_address"], tx_result)
+            for w, tx_result in zip(withdrawals, tx_results)
+        ]
+
+    async def _record_withdrawal(self, user_id: str, amount: Decimal,
+                           to_address: str, tx_result: Dict) -> Dict:
+        """Track a submitted withdrawal and build the caller's result"""
         if tx_result.get("success"):
             tx_id = tx_result.get("data", {}).get("transaction_id", "unknown")
-            self.pending_withdrawals[tx_id] = {
+            record = {
                 "user_id": user_id,
                 "amount": amount,
                 "to_address": to_address,
                 "timestamp": datetime.utcnow(),
                 "status": "confirmed"
             }
+            self.pending_withdrawals[tx_id] = record
+            await self._store_pending("withdrawal", tx_id, record)
             logger.info(f"Withdrawal processed: {amount} DEC to {to_address}")
             return {"success": True, "tx_id": tx_id, "amount": amount}
+        elif tx_result.get("status") == "unknown":
+            # The node may have broadcast it: keep the funds debited until
+            # reconciled instead of refunding or retrying into a double spend
+            logger.error(f"Withdrawal of {amount} DEC to {to_address} for user "
+                         f"{user_id} has unknown outcome, needs reconciliation")
+            return {"success": False, "status": "unknown",
+                    "error": tx_result.get("error", "Unknown error")}
         else:
             return {"success": False, "error": tx_result.get("error", "Unknown error")}
 
@@ -149,19 +305,21 @@ class SimpleDeCoinBridge:
         if tx_id in self.pending_withdrawals:
             return self.pending_withdrawals[tx_id]
 
+        # Check records persisted by this or another process
+        record = await self._load_pending(tx_id)
+        if record:
+            return record
+
         # Query blockchain
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(
-                    f"{self.node_url}/transaction/{tx_id}",
-                    timeout=aiohttp.ClientTimeout(total=5)
-                ) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    return {"status": "not_found"}
-            except Exception as e:
-                logger.error(f"Failed to get transaction status: {e}")
-                return {"status": "error", "error": str(e)}
+        session = await self._session()
+        try:
+            async with session.get(f"{self.node_url}/transaction/{tx_id}") as response:
+                if response.status == 200:
+                    return await response.json()
+                return {"status": "not_found"}
+        except Exception as e:
+            logger.error(f"Failed to get transaction status: {e}")
+            return {"status": "error", "error": str(e)}
 
 
 async def test_bridge():
@@ -207,6 +365,7 @@ async def test_bridge():
     exchange_balance = await bridge.get_balance(bridge.exchange_address)
     print(f"Exchange balance: {exchange_balance} DEC")
 
+    await bridge.close()
     print("\nBridge test completed!")
 
 
@@ -7,19 +7,31 @@ import asyncio
 import time
 import json
 import hashlib
-import redis
+import struct
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from cachetools import LRUCache
+from redis import asyncio as aioredis
 
 try:
-    import psycopg2
+    import asyncpg
 except ImportError:
-    psycopg2 = None  # Make PostgreSQL optional
-from decimal import Decimal
-from typing import Dict, List, Optional, Tuple, Any
+    asyncpg = None  # Make PostgreSQL optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Anchor leaves are packed with struct instead
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, MutableMapping, Optional, Tuple, Any
 from dataclasses import dataclass, field
 from enum import Enum
-import threading
-from collections import defaultdict, deque
-import uuid
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import secrets
 import sys
 import os
 
@@ -38,13 +50,215 @@ except ImportError:
     TransactionBuilder = None
     DECOIN_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
+# Optional queued logging, owned by the service (see start_log_listener)
+_log_handler: Optional[QueueHandler] = None
+_log_listener: Optional[QueueListener] = None
+
+def start_log_listener(*handlers: logging.Handler):
+    """
+    Route ledger logs through a queue to handlers (default: the root logger's)
+    on a background thread, so the event loop never blocks on log writes.
+    Levels and formatting stay with the application's logging config.
+    Pair with stop_log_listener() on shutdown.
+    """
+    global _log_handler, _log_listener
+    if _log_listener is not None:
+        return
+    handlers = handlers or tuple(logging.getLogger().handlers)
+    if not handlers:
+        return  # Nothing configured to write to; leave records propagating
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    _log_handler = QueueHandler(log_queue)
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    logger.addHandler(_log_handler)
+    logger.propagate = False  # The listener already feeds the root handlers
+
+def stop_log_listener():
+    """Flush queued ledger logs, stop the listener thread and restore propagation"""
+    global _log_handler, _log_listener
+    if _log_listener is None:
+        return
+    logger.removeHandler(_log_handler)
+    logger.propagate = True
+    _log_listener.stop()
+    _log_handler = _log_listener = None
+
+# Balances are held as integer units of 1e-8 DEC ("satoshis"); Decimal
+# only appears at the API and PostgreSQL boundaries
+UNIT = 100_000_000
+
+
+def to_units(amount: Any) -> int:
+    """Convert a DEC amount to integer units, rounding half-up to 8 dp"""
+    if isinstance(amount, int):
+        return amount * UNIT
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    return int(amount.scaleb(8).to_integral_value(ROUND_HALF_UP))
+
+
+def from_units(units: int) -> Decimal:
+    """Convert integer units back to a DEC amount"""
+    return Decimal(units).scaleb(-8)
+
+
+def _parse_units(value: str) -> int:
+    """Parse a Redis balance, accepting the older decimal-string format"""
+    try:
+        return int(value)
+    except ValueError:
+        return to_units(Decimal(value))
+
+# Batch scheduler: changes per conflict-free batch, pending changes
+# examined per batch
+SCHEDULER_BATCH = 16
+SCHEDULER_SCAN = 64
+
+# Random bytes fetched per ID pool refill (16 bytes per ID)
+ID_POOL_BYTES = 1 << 16
+
+# Most recently used balances kept in memory when PostgreSQL backs the
+# ledger; without a database memory is the store of record and is unbounded
+BALANCE_CACHE_SIZE = 1_000_000
+
+# Redis balance key TTL (seconds)
+BALANCE_TTL = 3600
+
+# Atomically apply signed deltas (ARGV[1..n]) to balance keys (KEYS[1..n])
+# in order, refreshing their TTL (ARGV[n+1]). Returns the new balances, -1
+# (with every key left untouched) if any step would go negative, -2 if a key
+# is not loaded so the caller can warm it from memory/PostgreSQL, or -3 if a
+# key still holds a legacy decimal-string balance that INCRBY cannot add to.
+APPLY_DELTAS_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    local value = redis.call('GET', key)
+    if not value then
+        return -2
+    end
+    if not string.match(value, '^-?%d+$') then
+        return -3
+    end
+end
+local balances = {}
+for i, key in ipairs(KEYS) do
+    balances[i] = redis.call('INCRBY', key, ARGV[i])
+    if balances[i] < 0 then
+        for j = i, 1, -1 do
+            redis.call('DECRBY', KEYS[j], ARGV[j])
+        end
+        return -1
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, ARGV[#KEYS + 1])
+end
+return balances
+"""
+DELTAS_INSUFFICIENT = -1
+DELTAS_NOT_LOADED = -2
+DELTAS_LEGACY = -3
+
+# Rewrite a balance key (KEYS[1]) from its legacy decimal string (ARGV[1])
+# to integer units (ARGV[2]), only if nothing changed it in between
+MIGRATE_BALANCE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'KEEPTTL')
+end
+return 1
+"""
+
+# Merkle leaf: address (NUL-padded to 32 B) + big-endian int64 balance units
+LEAF_RECORD = struct.Struct('>32sq')
+# Same layout as a numpy record: the ledger keeps every balance in one
+# contiguous array of these so anchor snapshots are a single memcpy
+LEAF_DTYPE = np.dtype([('addr', 'S32'), ('bal', '>i8')]) if np else None
+BALANCE_TABLE_CAPACITY = 1 << 16
+
+# Anchor early after this many transfers
+ANCHOR_TRANSFER_THRESHOLD = 10_000
+
+# Balance keys per pipelined MGET when snapshotting for an anchor
+ANCHOR_MGET_CHUNK = 1000
+
+# Number of balance lock stripes (power of two)
+LOCK_STRIPES = 1024
+
+# Transfer log batching: COPY at most this many rows, at least this often
+LOG_FLUSH_ROWS = 500
+LOG_FLUSH_INTERVAL = 0.01
+
+# Balance persistence: writers, rows per upsert batch, seconds before
+# retrying a failed batch
+BALANCE_DB_WORKERS = 4
+BALANCE_DB_BATCH = 500
+BALANCE_DB_RETRY = 1.0
+TRANSFER_LOG_COLUMNS = [
+    'id', 'from_address', 'to_address', 'amount', 'timestamp', 'status', 'metadata'
+]
+
+def pack_balance_leaves(balances: Dict[str, int]) -> bytes:
+    """Pack balances into address-sorted LEAF_RECORD records (no numpy)"""
+    return b''.join(
+        LEAF_RECORD.pack(address.encode(), balances[address])
+        for address in sorted(balances)
+    )
+
+def calculate_merkle_root(leaves: bytes, leaf_size: int = LEAF_RECORD.size) -> str:
+    """
+    Calculate merkle root of fixed-width leaf records. Module-level so it
+    can be shipped to the anchor process pool.
+    """
+    if not leaves:
+        return hashlib.sha256(b'').hexdigest()
+
+    # Leaves are zero-copy slices of one contiguous buffer; raw 32-byte
+    # digests throughout, only the root is hex-encoded
+    sha256 = hashlib.sha256
+    view = memoryview(leaves)
+    hashes = [sha256(view[i:i + leaf_size]).digest()
+              for i in range(0, len(view), leaf_size)]
+
+    while len(hashes) > 1:
+        if len(hashes) % 2 != 0:
+            hashes.append(hashes[-1])
+
+        hashes = [sha256(hashes[i] + hashes[i + 1]).digest()
+                  for i in range(0, len(hashes), 2)]
+
+    return hashes[0].hex()
+
+# Hot-path statements, prepared once per pooled connection
+_LEDGER_STATEMENTS: Dict[str, str] = {
+    "GET_BALANCE": "SELECT balance FROM decoin_balances WHERE address = $1",
+}
+
+def _encode_jsonb(value) -> bytes:
+    """Binary jsonb wire format: version byte 1, then the JSON text"""
+    return b'\x01' + json.dumps(value).encode()
+
+def _decode_jsonb(data: bytes):
+    return json.loads(data[1:])
+
+async def _init_ledger_connection(conn):
+    """Pool init callback: a JSONB codec for dicts"""
+    # Binary, not text: the transfer log is written with COPY, which only
+    # accepts binary-format codecs
+    await conn.set_type_codec(
+        'jsonb', encoder=_encode_jsonb, decoder=_decode_jsonb,
+        schema='pg_catalog', format='binary'
+    )
+
 class TransferStatus(Enum):
     PENDING = "pending"
     COMPLETED = "completed"
     FAILED = "failed"
     ANCHORED = "anchored"
 
-@dataclass
+@dataclass(slots=True)
 class InternalTransfer:
     """Ultra-fast internal transfer record"""
     id: str
@@ -57,7 +271,7 @@ class InternalTransfer:
     block_height: Optional[int] = None
     metadata: Dict[str, Any] = field(default_factory=dict)
 
-@dataclass
+@dataclass(slots=True)
 class WalletBalance:
     """Wallet balance with available and pending amounts"""
     address: str
@@ -81,107 +295,200 @@ class DeCoinLedger:
                  postgres_config: Optional[Dict] = None,
                  anchor_interval: int = 3600):  # Anchor every hour
 
-        # Initialize Redis for ultra-fast balance queries
-        try:
-            self.redis_client = redis.Redis(
+        # Initialize Redis for ultra-fast balance queries (connected lazily
+        # on the running event loop, see start())
+        self.redis_client = aioredis.Redis(
+            connection_pool=aioredis.ConnectionPool(
                 host=redis_host,
                 port=redis_port,
                 decode_responses=True,
-                connection_pool=redis.ConnectionPool(max_connections=100)
+                max_connections=100
             )
-            # Test connection
-            self.redis_client.ping()
-        except:
-            # Fallback to in-memory only if Redis not available
-            self.redis_client = None
-            print("Warning: Redis not available, using in-memory cache only")
-
-        # PostgreSQL for persistent transaction log
-        if postgres_config and psycopg2:
-            self.postgres_conn = psycopg2.connect(**postgres_config)
-            self.init_database()
-        else:
-            self.postgres_conn = None
-
-        # In-memory balance cache (backup for Redis)
-        self.balance_cache: Dict[str, Decimal] = {}
-        self.balance_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        )
+        self._apply_deltas_script = self.redis_client.register_script(APPLY_DELTAS_SCRIPT)
+        self._migrate_balance_script = self.redis_client.register_script(MIGRATE_BALANCE_SCRIPT)
+
+        # PostgreSQL for persistent transaction log (pool created in start())
+        self.postgres_config = postgres_config if asyncpg else None
+        self.pg_pool = None
+        self._pending_log_rows: deque = deque()
+        self._log_wakeup = asyncio.Event()
+        # Balance upserts awaiting a writer, sharded by address so each
+        # address's updates stay ordered within one writer. Pending values are
+        # coalesced per address (latest wins), so nothing is ever dropped
+        self._pending_balances: List[Dict[str, int]] = [
+            {} for _ in range(BALANCE_DB_WORKERS)
+        ]
+        self._balance_wakeups: List[asyncio.Event] = [
+            asyncio.Event() for _ in range(BALANCE_DB_WORKERS)
+        ]
+        # Batch each writer is upserting right now (not yet committed)
+        self._inflight_balances: List[Dict[str, int]] = [
+            {} for _ in range(BALANCE_DB_WORKERS)
+        ]
+
+        # In-memory balances (backup for Redis). Evicting is only safe when
+        # PostgreSQL holds every balance; otherwise this is the ledger itself
+        persistent = self.postgres_config is not None
+        self.balance_cache: MutableMapping[str, int] = (
+            LRUCache(BALANCE_CACHE_SIZE) if persistent else {}
+        )
+        # In-memory ledgers also mirror balances into a contiguous
+        # address|balance table, row per address, for memcpy anchor snapshots
+        self._balance_rows: Dict[str, int] = {}
+        self._balance_table = (
+            np.zeros(BALANCE_TABLE_CAPACITY, dtype=LEAF_DTYPE)
+            if np and not persistent else None
+        )
+        # Striped locks for the Redis-less path: fixed memory regardless of
+        # how many addresses exist
+        self.balance_locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(LOCK_STRIPES)]
 
         # Transaction queues
-        self.pending_transfers = deque(maxlen=100000)
+        # Balance changes awaiting the batch scheduler: (deltas, future)
+        self.pending_transfers: deque = deque()
+        self._transfers_ready = asyncio.Event()
         self.completed_transfers = deque(maxlen=100000)
 
         # Statistics
         self.total_transfers = 0
-        self.total_volume = Decimal('0')
+        self.total_volume_units = 0
         self.transfer_times = deque(maxlen=1000)  # Last 1000 transfer times
 
         # Blockchain anchoring
         self.anchor_interval = anchor_interval
         self.last_anchor_time = time.time()
         self.anchor_queue = []
+        self._anchor_pool: Optional[ProcessPoolExecutor] = None
+        self._anchor_trigger = asyncio.Event()
 
         # Address generation
         self.address_prefix = "DEC"
         self.address_counter = 0
 
-        # Start background tasks
-        self._start_background_tasks()
+        # Random pool for transfer IDs: one getrandom call per 4096 IDs
+        self._rand_pool = b''
+        self._rand_off = 0
 
-    def init_database(self):
+        # Pre-encoded Redis keys per address
+        self._balance_keys: Dict[str, bytes] = {}
+
+        # Background tasks, started on first use from the event loop
+        self._started = False
+        self._background_tasks: List[asyncio.Task] = []
+
+    async def init_database(self):
         """Initialize PostgreSQL tables"""
-        if not self.postgres_conn:
+        if not self.pg_pool:
             return
 
-        cursor = self.postgres_conn.cursor()
-
-        # Create transfers table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS decoin_transfers (
-                id VARCHAR(64) PRIMARY KEY,
-                from_address VARCHAR(64) NOT NULL,
-                to_address VARCHAR(64) NOT NULL,
-                amount DECIMAL(20, 8) NOT NULL,
-                timestamp TIMESTAMP NOT NULL,
-                status VARCHAR(20) NOT NULL,
-                tx_hash VARCHAR(64),
-                block_height INTEGER,
-                metadata JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Create balances table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS decoin_balances (
-                address VARCHAR(64) PRIMARY KEY,
-                balance DECIMAL(20, 8) NOT NULL DEFAULT 0,
-                pending DECIMAL(20, 8) NOT NULL DEFAULT 0,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        async with self.pg_pool.acquire() as conn:
+            # Create transfers table
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS decoin_transfers (
+                    id VARCHAR(64) PRIMARY KEY,
+                    from_address VARCHAR(64) NOT NULL,
+                    to_address VARCHAR(64) NOT NULL,
+                    amount DECIMAL(20, 8) NOT NULL,
+                    timestamp TIMESTAMP NOT NULL,
+                    status VARCHAR(20) NOT NULL,
+                    tx_hash VARCHAR(64),
+                    block_height INTEGER,
+                    metadata JSONB,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Create balances table
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS decoin_balances (
+                    address VARCHAR(64) PRIMARY KEY,
+                    balance DECIMAL(20, 8) NOT NULL DEFAULT 0,
+                    pending DECIMAL(20, 8) NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Create indexes for performance
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_transfers_from
+                ON decoin_transfers(from_address, timestamp DESC)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_transfers_to
+                ON decoin_transfers(to_address, timestamp DESC)
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_transfers_status
+                ON decoin_transfers(status)
+            """)
+
+    async def start(self):
+        """Connect to Redis and start background tasks on the running loop"""
+        if self._started:
+            return
+        self._started = True
+
+        try:
+            # Test connection
+            await self.redis_client.ping()
+        except Exception:
+            # Fallback to in-memory only if Redis not available
+            await self.redis_client.close()
+            self.redis_client = None
+            logger.warning("Redis not available, using in-memory cache only")
+
+        if self.postgres_config:
+            self.pg_pool = await asyncpg.create_pool(
+                **self.postgres_config,
+                min_size=10,
+                max_size=50,
+                max_queries=50_000,
+                # Durability comes from blockchain anchoring, so ledger
+                # writes skip the WAL flush wait on commit
+                server_settings={'synchronous_commit': 'off'},
+                init=_init_ledger_connection
             )
-        """)
-
-        # Create indexes for performance
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_transfers_from
-            ON decoin_transfers(from_address, timestamp DESC)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_transfers_to
-            ON decoin_transfers(to_address, timestamp DESC)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_transfers_status
-            ON decoin_transfers(status)
-        """)
-
-        self.postgres_conn.commit()
-        cursor.close()
+            await self.init_database()
+
+        self._anchor_pool = ProcessPoolExecutor(max_workers=1)
+        self._start_background_tasks()
+
+    async def close(self):
+        """Stop background tasks and release the Redis pool"""
+        for task in self._background_tasks:
+            task.cancel()
+        # Let cancelled writers hand back the batch they were holding
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        self._background_tasks.clear()
+
+        # Fail balance changes the scheduler will no longer run
+        while self.pending_transfers:
+            _, future = self.pending_transfers.popleft()
+            future.cancel()
+
+        # Drain transfers and balances still waiting for their writers
+        while self.pg_pool and self._pending_log_rows:
+            await self._flush_transfer_log()
+        for shard, pending in enumerate(self._pending_balances):
+            self._pending_balances[shard] = {}
+            if self.pg_pool and pending:
+                await self._write_balances_db(pending)
+
+        if self.redis_client:
+            await self.redis_client.close()
+        if self.pg_pool:
+            await self.pg_pool.close()
+            self.pg_pool = None
+        if self._anchor_pool:
+            self._anchor_pool.shutdown(wait=False, cancel_futures=True)
+            self._anchor_pool = None
+        self._started = False
 
     async def create_address(self, user_id: str) -> str:
         """Generate a new DeCoin address for a user"""
         # Create deterministic address from user_id
-        seed = f"{user_id}:{uuid.uuid4()}:{self.address_counter}"
+        seed = f"{user_id}:{self._new_id()}:{self.address_counter}"
         self.address_counter += 1
 
         # Generate address hash
@@ -191,7 +498,8 @@ class DeCoinLedger:
         address = f"{self.address_prefix}{address_hash[:20].upper()}"
 
         # Initialize balance
-        await self.set_balance(address, Decimal('0'))
+        self._balance_keys[address] = f"balance:{address}".encode()
+        await self._store_units({address: 0})
 
         return address
 
@@ -207,189 +515,537 @@ class DeCoinLedger:
         start_time = time.perf_counter()
 
         # Generate transfer ID
-        transfer_id = str(uuid.uuid4())
+        transfer_id = self._new_id()
 
         # Validate amount
-        if amount <= 0:
+        amount_units = to_units(amount)
+        if amount_units <= 0:
             return False, "Invalid amount"
 
-        # Get locks for both addresses (prevent double-spending)
-        from_lock = self.balance_locks[from_address]
-        to_lock = self.balance_locks[to_address]
-
-        # Acquire locks in consistent order to prevent deadlock
-        locks = sorted([(from_address, from_lock), (to_address, to_lock)])
-
-        try:
-            for _, lock in locks:
-                lock.acquire()
-
-            # Check balance
-            from_balance = await self.get_balance(from_address)
-            if from_balance < amount:
-                return False, "Insufficient balance"
-
-            # Update balances atomically
-            new_from_balance = from_balance - amount
-            to_balance = await self.get_balance(to_address)
-            new_to_balance = to_balance + amount
-
-            # Update Redis cache
-            await self.set_balance(from_address, new_from_balance)
-            await self.set_balance(to_address, new_to_balance)
-
-            # Create transfer record
-            transfer = InternalTransfer(
-                id=transfer_id,
-                from_address=from_address,
-                to_address=to_address,
-                amount=amount,
-                timestamp=time.time(),
-                status=TransferStatus.COMPLETED,
-                metadata=metadata or {}
-            )
-
-            # Add to completed queue
-            self.completed_transfers.append(transfer)
-
-            # Update statistics
-            self.total_transfers += 1
-            self.total_volume += amount
+        # Debit and credit in one atomic step (prevents double-spending)
+        applied = await self._apply_deltas(
+            [(from_address, -amount_units), (to_address, amount_units)]
+        )
+        if not applied:
+            return False, "Insufficient balance"
 
-            # Record transfer time
-            transfer_time = time.perf_counter() - start_time
-            self.transfer_times.append(transfer_time)
+        # Create transfer record
+        transfer = InternalTransfer(
+            id=transfer_id,
+            from_address=from_address,
+            to_address=to_address,
+            amount=amount,
+            timestamp=time.time(),
+            status=TransferStatus.COMPLETED,
+            metadata=metadata or {}
+        )
 
-            # Log to database (async)
-            if self.postgres_conn:
-                asyncio.create_task(self._log_transfer_to_db(transfer))
+        # Add to completed queue
+        self.completed_transfers.append(transfer)
 
-            return True, transfer_id
-
-        finally:
-            # Release locks
-            for _, lock in locks:
-                lock.release()
+        # Update statistics
+        self.total_transfers += 1
+        self.total_volume_units += amount_units
+        if self.total_transfers % ANCHOR_TRANSFER_THRESHOLD == 0:
+            self._anchor_trigger.set()
+
+        # Record transfer time
+        transfer_time = time.perf_counter() - start_time
+        self.transfer_times.append(transfer_time)
+
+        # Log to database (async)
+        self._log_transfer_to_db(transfer)
+
+        return True, transfer_id
+
+    def _new_id(self) -> str:
+        """128-bit random hex ID sliced from a pooled random buffer"""
+        if self._rand_off + 16 > len(self._rand_pool):
+            self._rand_pool = secrets.token_bytes(ID_POOL_BYTES)
+            self._rand_off = 0
+        off = self._rand_off
+        self._rand_off = off + 16
+        return self._rand_pool[off:off + 16].hex()
+
+    def _balance_key(self, address: str) -> bytes:
+        """Redis key for an address, encoded once and reused"""
+        key = self._balance_keys.get(address)
+        if key is None:
+            key = self._balance_keys[address] = f"balance:{address}".encode()
+        return key
 
     async def get_balance(self, address: str) -> Decimal:
         """Get balance from cache with fallback to database"""
+        return from_units(await self._get_units(address))
+
+    async def _get_units(self, address: str) -> int:
+        """Get balance in integer units: Redis, then memory, then database"""
+        if not self._started:
+            await self.start()
+
         # Try Redis first
         if self.redis_client:
-            balance_str = self.redis_client.get(f"balance:{address}")
+            balance_str = await self.redis_client.get(self._balance_key(address))
             if balance_str:
-                return Decimal(str(balance_str))
+                return _parse_units(balance_str)
 
         # Fallback to memory cache
-        if address in self.balance_cache:
-            return self.balance_cache[address]
+        balance = self._cached_units(address)
+        if balance is not None:
+            return balance
 
         # Fallback to database
-        if self.postgres_conn:
-            cursor = self.postgres_conn.cursor()
-            cursor.execute(
-                "SELECT balance FROM decoin_balances WHERE address = %s",
-                (address,)
-            )
-            result = cursor.fetchone()
-            cursor.close()
-
-            if result:
-                balance = Decimal(str(result[0]))
-                # Update caches
-                await self.set_balance(address, balance)
-                return balance
+        balance = await self._load_units_db(address)
+        if balance:
+            # Update caches
+            await self._store_units({address: balance})
+        return balance
+
+    async def _load_units_db(self, address: str) -> int:
+        """Read a balance from PostgreSQL, defaulting to zero"""
+        if self.pg_pool:
+            async with self.pg_pool.acquire() as conn:
+                # Executed through the connection's statement cache, which
+                # keeps it prepared across pool acquires (PreparedStatement
+                # objects are invalidated on release)
+                result = await conn.fetchval(_LEDGER_STATEMENTS["GET_BALANCE"], address)
+
+            if result is not None:
+                return to_units(result)  # NUMERIC decodes to Decimal
 
         # Default to zero
-        return Decimal('0')
+        return 0
 
     async def set_balance(self, address: str, balance: Decimal):
         """Update balance in all caches"""
-        # Update Redis if available
+        await self._store_units({address: to_units(balance)})
+
+    async def set_balances(self, balances: Dict[str, Decimal]):
+        """Update several balances, pipelining the Redis writes"""
+        await self._store_units(
+            {address: to_units(balance) for address, balance in balances.items()}
+        )
+
+    async def _store_units(self, balances: Dict[str, int]):
+        """Write integer-unit balances to Redis (one pipeline), memory and database"""
+        if not self._started:
+            await self.start()
+
+        # Update Redis if available (1 hour TTL)
         if self.redis_client:
-            self.redis_client.set(f"balance:{address}", str(balance), ex=3600)  # 1 hour TTL
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for address, balance in balances.items():
+                    pipe.set(self._balance_key(address), balance, ex=BALANCE_TTL)
+                await pipe.execute()
 
         # Update memory cache
-        self.balance_cache[address] = balance
+        self._cache_units(balances)
 
         # Update database (async)
-        if self.postgres_conn:
-            asyncio.create_task(self._update_balance_db(address, balance))
+        self._queue_balance_db(balances)
 
-    async def _log_transfer_to_db(self, transfer: InternalTransfer):
-        """Log transfer to PostgreSQL"""
-        if not self.postgres_conn:
-            return
+    async def _apply_deltas(self, deltas: List[Tuple[str, int]]) -> bool:
+        """
+        Apply signed unit deltas to balances atomically and in order.
+        Returns False, changing nothing, if any balance would go negative.
+        """
+        if not self._started:
+            await self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending_transfers.append((deltas, future))
+        self._transfers_ready.set()
+        return await future
+
+    async def _batch_scheduler(self):
+        """
+        Drain pending balance changes in conflict-free batches: no two
+        changes in a batch touch the same address, so the batch runs
+        concurrently while each address still sees its changes in order
+        """
+        while True:
+            await self._transfers_ready.wait()
+            self._transfers_ready.clear()
+
+            while self.pending_transfers:
+                batch, deferred = [], []
+                touched = set()
+                scanned = 0
+                while (self.pending_transfers and len(batch) < SCHEDULER_BATCH
+                       and scanned < SCHEDULER_SCAN):
+                    item = self.pending_transfers.popleft()
+                    scanned += 1
+                    addresses = {address for address, _ in item[0]}
+                    if addresses & touched:
+                        deferred.append(item)
+                    else:
+                        batch.append(item)
+                    # Deferred changes also block their addresses, so later
+                    # changes cannot overtake them
+                    touched |= addresses
+                self.pending_transfers.extendleft(reversed(deferred))
+
+                try:
+                    await self._execute_batch(batch)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+
+    async def _execute_batch(self, batch: List[Tuple[List[Tuple[str, int]], asyncio.Future]]):
+        """Apply a conflict-free batch and resolve its futures"""
+        if self.redis_client:
+            # Every script call of the batch in one round-trip
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for deltas, _ in batch:
+                    await self._apply_deltas_script(
+                        keys=[self._balance_key(address) for address, _ in deltas],
+                        args=[delta for _, delta in deltas] + [BALANCE_TTL],
+                        client=pipe
+                    )
+                results = await pipe.execute()
+
+            outcomes = []
+            for (deltas, _), result in zip(batch, results):
+                if result in (DELTAS_NOT_LOADED, DELTAS_LEGACY):
+                    outcomes.append(await self._apply_deltas_redis(deltas))
+                elif isinstance(result, list):
+                    outcomes.append(
+                        {address: balance for (address, _), balance in zip(deltas, result)}
+                    )
+                else:
+                    outcomes.append(None)
+        else:
+            outcomes = await asyncio.gather(
+                *(self._apply_deltas_local(deltas) for deltas, _ in batch)
+            )
+
+        for (_, future), balances in zip(batch, outcomes):
+            if balances is not None:
+                # Update memory cache
+                self._cache_units(balances)
+
+                # Update database (async)
+                self._queue_balance_db(balances)
+            if not future.done():
+                future.set_result(balances is not None)
+
+    async def _apply_deltas_redis(self, deltas: List[Tuple[str, int]]) -> Optional[Dict[str, int]]:
+        """One script call: INCRBY/DECRBY run server-side, no client lock"""
+        keys = [self._balance_key(address) for address, _ in deltas]
+        args = [delta for _, delta in deltas] + [BALANCE_TTL]
+
+        result = await self._apply_deltas_script(keys=keys, args=args)
+        for _ in range(2):
+            if result == DELTAS_NOT_LOADED:
+                # Seed missing keys (expired or never cached) and retry
+                await self._warm_balance_keys([address for address, _ in deltas])
+            elif result == DELTAS_LEGACY:
+                # Convert decimal-string balances to units and retry
+                await self._migrate_balance_keys(keys)
+            else:
+                break
+            result = await self._apply_deltas_script(keys=keys, args=args)
+        if not isinstance(result, list):
+            # DELTAS_INSUFFICIENT (or a key evicted again before the retry)
+            return None
+        return {address: balance for (address, _), balance in zip(deltas, result)}
+
+    async def _warm_balance_keys(self, addresses: List[str]):
+        """Load balances into Redis from memory/PostgreSQL unless already present"""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for address in addresses:
+                balance = self._cached_units(address)
+                if balance is None:
+                    balance = await self._load_units_db(address)
+                pipe.set(self._balance_key(address), balance, ex=BALANCE_TTL, nx=True)
+            await pipe.execute()
+
+    async def _migrate_balance_keys(self, keys: List[bytes]):
+        """Rewrite legacy decimal-string balances under keys as integer units"""
+        for key, value in zip(keys, await self.redis_client.mget(keys)):
+            if value is None:
+                continue
+            units = _parse_units(value)
+            if str(units) != value:
+                await self._migrate_balance_script(keys=[key], args=[value, units])
+
+    async def _apply_deltas_local(self, deltas: List[Tuple[str, int]]) -> Optional[Dict[str, int]]:
+        """Read-modify-write under striped locks when Redis is unavailable"""
+        # Acquire stripes in index order to prevent deadlock, each stripe once
+        stripes = sorted({hash(address) & (LOCK_STRIPES - 1) for address, _ in deltas})
+        locks = [self.balance_locks[stripe] for stripe in stripes]
+
+        for lock in locks:
+            await lock.acquire()
 
         try:
-            cursor = self.postgres_conn.cursor()
-            cursor.execute("""
-                INSERT INTO decoin_transfers
-                (id, from_address, to_address, amount, timestamp, status, metadata)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                transfer.id,
-                transfer.from_address,
-                transfer.to_address,
-                str(transfer.amount),
-                transfer.timestamp,
-                transfer.status.value,
-                json.dumps(transfer.metadata)
-            ))
-            self.postgres_conn.commit()
-            cursor.close()
-        except Exception as e:
-            print(f"Error logging transfer to database: {e}")
+            balances: Dict[str, int] = {}
+            for address, delta in deltas:
+                if address not in balances:
+                    balance = self._cached_units(address)
+                    if balance is None:
+                        balance = await self._load_units_db(address)
+                    balances[address] = balance
+                balances[address] += delta
+                if balances[address] < 0:
+                    return None
+
+            # Publish before releasing the locks
+            self._cache_units(balances)
+            return balances
+
+        finally:
+            # Release locks
+            for lock in locks:
+                lock.release()
+
+    def _cached_units(self, address: str) -> Optional[int]:
+        """Balance held in memory, if any"""
+        return self.balance_cache.get(address)
+
+    def _cache_units(self, balances: Dict[str, int]):
+        """Update the memory cache and its contiguous balance table"""
+        self.balance_cache.update(balances)
 
-    async def _update_balance_db(self, address: str, balance: Decimal):
-        """Update balance in PostgreSQL"""
-        if not self.postgres_conn:
+        table = self._balance_table
+        if table is None:
             return
 
+        rows = self._balance_rows
+        for address, balance in balances.items():
+            row = rows.get(address)
+            if row is None:
+                row = rows[address] = len(rows)
+                if row == len(table):
+                    # Grow by doubling
+                    table = np.concatenate([table, np.zeros(len(table), dtype=LEAF_DTYPE)])
+                    self._balance_table = table
+                table['addr'][row] = address.encode()
+            table['bal'][row] = balance
+
+    def _log_transfer_to_db(self, transfer: InternalTransfer):
+        """Queue a transfer for the batched PostgreSQL log writer"""
+        if not self.pg_pool:
+            return
+
+        self._pending_log_rows.append((
+            transfer.id,
+            transfer.from_address,
+            transfer.to_address,
+            transfer.amount,
+            # TIMESTAMP column: naive UTC
+            datetime.fromtimestamp(transfer.timestamp, timezone.utc).replace(tzinfo=None),
+            transfer.status.value,
+            transfer.metadata  # encoded by the connection's JSONB codec
+        ))
+        if len(self._pending_log_rows) >= LOG_FLUSH_ROWS:
+            self._log_wakeup.set()
+
+    async def _log_flusher(self):
+        """Write queued transfers every LOG_FLUSH_INTERVAL or LOG_FLUSH_ROWS rows"""
+        while True:
+            if len(self._pending_log_rows) < LOG_FLUSH_ROWS:
+                self._log_wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._log_wakeup.wait(), LOG_FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush_transfer_log()
+
+    async def _flush_transfer_log(self):
+        """COPY up to LOG_FLUSH_ROWS queued transfers into decoin_transfers"""
+        if not self._pending_log_rows:
+            return
+
+        rows = [self._pending_log_rows.popleft()
+                for _ in range(min(LOG_FLUSH_ROWS, len(self._pending_log_rows)))]
         try:
-            cursor = self.postgres_conn.cursor()
-            cursor.execute("""
-                INSERT INTO decoin_balances (address, balance, updated_at)
-                VALUES (%s, %s, CURRENT_TIMESTAMP)
-                ON CONFLICT (address)
-                DO UPDATE SET balance = %s, updated_at = CURRENT_TIMESTAMP
-            """, (address, str(balance), str(balance)))
-            self.postgres_conn.commit()
-            cursor.close()
+            async with self.pg_pool.acquire() as conn:
+                await conn.copy_records_to_table(
+                    'decoin_transfers', records=rows, columns=TRANSFER_LOG_COLUMNS
+                )
         except Exception as e:
-            print(f"Error updating balance in database: {e}")
+            logger.error(f"Error logging transfers to database: {e}")
 
-    def _start_background_tasks(self):
-        """Start background processing threads"""
-        # Blockchain anchoring thread
-        anchor_thread = threading.Thread(target=self._anchor_worker, daemon=True)
-        anchor_thread.start()
+    def _queue_balance_db(self, balances: Dict[str, int]):
+        """Hand balances to the PostgreSQL writers, replacing any pending older value"""
+        if not self.pg_pool:
+            return
 
-        # Statistics reporting thread
-        stats_thread = threading.Thread(target=self._stats_worker, daemon=True)
-        stats_thread.start()
+        for address, balance in balances.items():
+            shard = hash(address) % BALANCE_DB_WORKERS
+            self._pending_balances[shard][address] = balance
+            self._balance_wakeups[shard].set()
 
-    def _anchor_worker(self):
-        """Periodically anchor internal state to blockchain"""
+    async def _balance_db_worker(self, shard: int):
+        """Upsert a shard's pending balances in batches of BALANCE_DB_BATCH"""
+        wakeup = self._balance_wakeups[shard]
         while True:
-            time.sleep(60)  # Check every minute
+            await wakeup.wait()
+            wakeup.clear()
+
+            while self._pending_balances[shard]:
+                pending = self._pending_balances[shard]
+                if len(pending) <= BALANCE_DB_BATCH:
+                    batch = pending
+                    self._pending_balances[shard] = {}
+                else:
+                    batch = {address: pending.pop(address)
+                             for address in list(islice(pending, BALANCE_DB_BATCH))}
+
+                self._inflight_balances[shard] = batch
+                try:
+                    written = await self._write_balances_db(batch)
+                except asyncio.CancelledError:
+                    self._requeue_balances(shard, batch)
+                    raise
+                finally:
+                    self._inflight_balances[shard] = {}
+                if not written:
+                    self._requeue_balances(shard, batch)
+                    await asyncio.sleep(BALANCE_DB_RETRY)
+
+    def _requeue_balances(self, shard: int, batch: Dict[str, int]):
+        """Put an unwritten batch back unless a newer value arrived meanwhile"""
+        pending = self._pending_balances[shard]
+        for address, balance in batch.items():
+            pending.setdefault(address, balance)
+
+    async def _write_balances_db(self, balances: Dict[str, int]) -> bool:
+        """COPY balances into a staging table and upsert them in one statement.
+        Returns False if the write failed."""
+        try:
+            async with self.pg_pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute("""
+                        CREATE TEMP TABLE _balances_stage
+                        (address VARCHAR(64), balance DECIMAL(20, 8))
+                        ON COMMIT DROP
+                    """)
+                    await conn.copy_records_to_table(
+                        '_balances_stage',
+                        records=[(address, from_units(balance))
+                                 for address, balance in balances.items()]
+                    )
+                    await conn.execute("""
+                        INSERT INTO decoin_balances (address, balance, updated_at)
+                        SELECT address, balance, CURRENT_TIMESTAMP FROM _balances_stage
+                        ON CONFLICT (address)
+                        DO UPDATE SET balance = EXCLUDED.balance, updated_at = CURRENT_TIMESTAMP
+                    """)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating balances in database: {e}")
+            return False
 
-            if time.time() - self.last_anchor_time >= self.anchor_interval:
-                self._create_anchor_checkpoint()
-                self.last_anchor_time = time.time()
+    def _start_background_tasks(self):
+        """Start background tasks on the ledger's event loop"""
+        self._background_tasks = [
+            # Blockchain anchoring
+            asyncio.create_task(self._anchor_worker()),
+            # Statistics reporting
+            asyncio.create_task(self._stats_worker()),
+            # Balance change scheduler
+            asyncio.create_task(self._batch_scheduler()),
+        ]
+        if self.pg_pool:
+            # Batched transfer log writer
+            self._background_tasks.append(asyncio.create_task(self._log_flusher()))
+            # Batched balance writers
+            self._background_tasks.extend(
+                asyncio.create_task(self._balance_db_worker(shard))
+                for shard in range(BALANCE_DB_WORKERS)
+            )
 
-    def _create_anchor_checkpoint(self):
+    async def _anchor_worker(self):
+        """Anchor internal state to blockchain every anchor_interval, or
+        sooner when a burst of transfers trips the anchor trigger"""
+        while True:
+            remaining = self.anchor_interval - (time.time() - self.last_anchor_time)
+            try:
+                await asyncio.wait_for(self._anchor_trigger.wait(), timeout=max(remaining, 0))
+            except asyncio.TimeoutError:
+                pass
+            self._anchor_trigger.clear()
+
+            await self._create_anchor_checkpoint()
+            self.last_anchor_time = time.time()
+
+    async def _read_redis_units(self, addresses: List[str]) -> List[Optional[int]]:
+        """Read many balances (in units) from Redis with pipelined MGETs"""
+        if not self.redis_client:
+            return [None] * len(addresses)
+
+        chunks = [addresses[i:i + ANCHOR_MGET_CHUNK]
+                  for i in range(0, len(addresses), ANCHOR_MGET_CHUNK)]
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for chunk in chunks:
+                pipe.mget([self._balance_key(address) for address in chunk])
+            results = await pipe.execute()
+
+        return [None if value is None else _parse_units(value)
+                for values in results for value in values]
+
+    async def _read_db_units(self) -> Dict[str, int]:
+        """Every balance stored in PostgreSQL, in units"""
+        balances: Dict[str, int] = {}
+        async with self.pg_pool.acquire() as conn:
+            async with conn.transaction():
+                async for record in conn.cursor(
+                    "SELECT address, balance FROM decoin_balances", prefetch=ANCHOR_MGET_CHUNK
+                ):
+                    balances[record['address']] = to_units(record['balance'])
+        return balances
+
+    async def _snapshot_leaves(self) -> bytes:
+        """Point-in-time, address-sorted leaf records of every balance"""
+        if self.pg_pool:
+            # PostgreSQL holds every address; the memory cache is bounded and
+            # may have evicted some. Capture the not-yet-committed writes and
+            # recently used balances first, so a batch committing during the
+            # read is covered either way, then layer them over the table
+            newer: Dict[str, int] = {}
+            for inflight, pending in zip(self._inflight_balances, self._pending_balances):
+                newer.update(inflight)
+                newer.update(pending)
+            newer.update(self.balance_cache)
+            current = await self._read_db_units()
+            current.update(newer)
+        elif self._balance_table is None:
+            current = dict(self.balance_cache)
+        else:
+            # One memcpy of the table; transfers keep writing the live copy
+            addresses = list(self._balance_rows)
+            snapshot = self._balance_table[:len(addresses)].copy()
+
+            # Redis is authoritative; overlay it row by row
+            balances = snapshot['bal']
+            for row, value in enumerate(await self._read_redis_units(addresses)):
+                if value is not None:
+                    balances[row] = value
+
+            snapshot.sort(order='addr')
+            return snapshot.tobytes()
+
+        # Redis is authoritative where it still holds a key
+        addresses = list(current)
+        for address, value in zip(addresses, await self._read_redis_units(addresses)):
+            if value is not None:
+                current[address] = value
+        return pack_balance_leaves(current)
+
+    async def _create_anchor_checkpoint(self):
         """Create blockchain checkpoint of current state"""
         try:
-            # Calculate merkle root of all balances
-            balances = []
-            for address, balance in self.balance_cache.items():
-                balances.append(f"{address}:{balance}")
+            # Pack all balances, sorted for consistency, into one buffer
+            leaves = await self._snapshot_leaves()
 
-            # Sort for consistency
-            balances.sort()
-
-            # Calculate merkle root
-            merkle_root = self._calculate_merkle_root(balances)
+            # Calculate merkle root on another core, off the event loop
+            loop = asyncio.get_running_loop()
+            merkle_root = await loop.run_in_executor(
+                self._anchor_pool, calculate_merkle_root, leaves
+            )
 
             # Create anchor transaction (would be sent to DeCoin blockchain)
             anchor_tx = {
@@ -397,48 +1053,28 @@ class DeCoinLedger:
                 'merkle_root': merkle_root,
                 'timestamp': time.time(),
                 'total_transfers': self.total_transfers,
-                'total_volume': str(self.total_volume)
+                'total_volume': str(from_units(self.total_volume_units))
             }
 
-            print(f"Created anchor checkpoint: {merkle_root[:16]}...")
+            logger.info(f"Created anchor checkpoint: {merkle_root[:16]}...")
 
             # In production, this would submit to DeCoin blockchain
             # For now, just log it
             self.anchor_queue.append(anchor_tx)
 
         except Exception as e:
-            print(f"Error creating anchor checkpoint: {e}")
-
-    def _calculate_merkle_root(self, items: List[str]) -> str:
-        """Calculate merkle root of items"""
-        if not items:
-            return hashlib.sha256(b'').hexdigest()
+            logger.error(f"Error creating anchor checkpoint: {e}")
 
-        hashes = [hashlib.sha256(item.encode()).hexdigest() for item in items]
-
-        while len(hashes) > 1:
-            if len(hashes) % 2 != 0:
-                hashes.append(hashes[-1])
-
-            new_hashes = []
-            for i in range(0, len(hashes), 2):
-                combined = hashes[i] + hashes[i + 1]
-                new_hash = hashlib.sha256(combined.encode()).hexdigest()
-                new_hashes.append(new_hash)
-            hashes = new_hashes
-
-        return hashes[0]
-
-    def _stats_worker(self):
+    async def _stats_worker(self):
         """Report statistics periodically"""
         while True:
-            time.sleep(30)  # Report every 30 seconds
+            await asyncio.sleep(30)  # Report every 30 seconds
 
             if self.transfer_times:
                 avg_time = sum(self.transfer_times) / len(self.transfer_times)
-                print(f"DeCoin Ledger Stats: {self.total_transfers} transfers, "
-                      f"Volume: {self.total_volume:.2f} DEC, "
-                      f"Avg time: {avg_time*1000:.2f}ms")
+                logger.info(f"DeCoin Ledger Stats: {self.total_transfers} transfers, "
+                            f"Volume: {from_units(self.total_volume_units):.2f} DEC, "
+                            f"Avg time: {avg_time*1000:.2f}ms")
 
     def get_stats(self) -> Dict[str, Any]:
         """Get current ledger statistics"""
@@ -448,7 +1084,7 @@ class DeCoinLedger:
 
         return {
             'total_transfers': self.total_transfers,
-            'total_volume': float(self.total_volume),
+            'total_volume': float(from_units(self.total_volume_units)),
             'average_transfer_time_ms': avg_time * 1000,
             'cached_addresses': len(self.balance_cache),
             'pending_transfers': len(self.pending_transfers),
@@ -458,13 +1094,12 @@ class DeCoinLedger:
 
     async def mint(self, address: str, amount: Decimal) -> bool:
         """Mint new DeCoin (admin function)"""
-        current_balance = await self.get_balance(address)
-        new_balance = current_balance + amount
-        await self.set_balance(address, new_balance)
+        if not await self._apply_deltas([(address, to_units(amount))]):
+            return False
 
         # Log minting event
         transfer = InternalTransfer(
-            id=str(uuid.uuid4()),
+            id=self._new_id(),
             from_address="MINT",
             to_address=address,
             amount=amount,
@@ -475,24 +1110,18 @@ class DeCoinLedger:
 
         self.completed_transfers.append(transfer)
 
-        if self.postgres_conn:
-            await self._log_transfer_to_db(transfer)
+        self._log_transfer_to_db(transfer)
 
         return True
 
     async def burn(self, address: str, amount: Decimal) -> Tuple[bool, str]:
         """Burn DeCoin (remove from circulation)"""
-        current_balance = await self.get_balance(address)
-
-        if current_balance < amount:
+        if not await self._apply_deltas([(address, -to_units(amount))]):
             return False, "Insufficient balance"
 
-        new_balance = current_balance - amount
-        await self.set_balance(address, new_balance)
-
         # Log burning event
         transfer = InternalTransfer(
-            id=str(uuid.uuid4()),
+            id=self._new_id(),
             from_address=address,
             to_address="BURN",
             amount=amount,
@@ -503,8 +1132,7 @@ class DeCoinLedger:
 
         self.completed_transfers.append(transfer)
 
-        if self.postgres_conn:
-            await self._log_transfer_to_db(transfer)
+        self._log_transfer_to_db(transfer)
 
         return True, transfer.id
 
@@ -562,7 +1190,7 @@ class ExchangeSettlementBridge:
         if success:
             # In production, this would trigger blockchain transaction
             # For now, just log it
-            print(f"Withdrawal queued: {amount} DEC to {external_address}")
+            logger.info(f"Withdrawal queued: {amount} DEC to {external_address}")
 
         return success, result
 
@@ -5,6 +5,7 @@ Manages DeCoin balances and settlements
 """
 
 import asyncio
+import logging
 import os
 import signal
 import sys
@@ -12,10 +13,16 @@ import sys
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from exchange.ledger.decoin_ledger import DeCoinLedger, ExchangeSettlementBridge
+from exchange.ledger.decoin_ledger import (
+    DeCoinLedger, ExchangeSettlementBridge, start_log_listener, stop_log_listener
+)
 
 class DeCoinLedgerService:
     def __init__(self):
+        # Ledger logs go to stdout through a listener thread, off the event loop
+        logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+        start_log_listener()
+
         # Get configuration from environment
         redis_host = os.getenv('REDIS_HOST', 'localhost')
         redis_port = int(os.getenv('REDIS_PORT', 6379))
@@ -82,6 +89,7 @@ class DeCoinLedgerService:
         """Graceful shutdown"""
         print("\nShutting down DeCoin Ledger Service...")
         self.running = False
+        stop_log_listener()
         sys.exit(0)
 
 if __name__ == "__main__":
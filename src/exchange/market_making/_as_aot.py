@@ -0,0 +1,25 @@
+"""
+Ahead-of-time build of the Avellaneda-Stoikov quote kernel
+Compiles _as_kernel._as_quotes into the _as_native extension next to this file,
+so a fresh process quotes without waiting on numba's JIT.
+
+Usage: python src/exchange/market_making/_as_aot.py
+"""
+
+import os
+import sys
+
+from numba.pycc import CC
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _as_kernel import _as_quotes
+
+cc = CC('_as_native')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+cc.verbose = True
+
+cc.export('as_quotes', 'UniTuple(f8, 3)(f8, f8, f8, f8, f8, f8, f8)')(_as_quotes)
+
+
+if __name__ == "__main__":
+    cc.compile()
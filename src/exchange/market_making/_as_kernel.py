@@ -0,0 +1,43 @@
+"""
+Avellaneda-Stoikov quote kernel
+Native float64 math for the per-tick quote path; Decimal stays at the caller's boundary
+"""
+
+import math
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """No-op stand-in so the kernel runs as plain Python without numba"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+def _as_quotes(mid: float, q: float, gamma: float, sigma: float, tau: float,
+               min_spread: float, max_spread: float):
+    """
+    Optimal bid/ask around the inventory-adjusted reservation price.
+    Returns (bid, ask, reservation).
+    """
+    # Reservation price: shift mid against inventory
+    reservation = mid - q * gamma * sigma * sigma * tau
+
+    # Optimal spread from A-S model (simplified): (2/gamma) * ln(1 + gamma*sigma^2*tau/2)
+    spread = (2.0 / gamma) * math.log1p(max(gamma * sigma * sigma * tau / 2.0, 0.0))
+
+    # Ensure spread is within configured bounds
+    spread = max(min_spread, min(spread, max_spread))
+
+    half_spread = spread / 2.0
+    return reservation - half_spread, reservation + half_spread, reservation
+
+
+# Resolution order: AOT extension from _as_aot.py, then numba JIT, then plain Python
+as_quotes = njit(cache=True)(_as_quotes)
+
+try:
+    from ._as_native import as_quotes
+except ImportError:
+    pass
@@ -3,9 +3,9 @@ Market Making Algorithms for Automated Liquidity Provision
 Implements various market making strategies
 """
 
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Set
-from decimal import Decimal
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+from decimal import Decimal, ROUND_HALF_UP
 from enum import Enum
 from datetime import datetime, timedelta
 import asyncio
@@ -13,8 +13,51 @@ import logging
 import random
 import math
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from market_making._as_kernel import as_quotes
+except ImportError:
+    from ._as_kernel import as_quotes
+
 logger = logging.getLogger(__name__)
 
+# Decimal constants shared by the quoting loop (built once, not per tick)
+_D0 = Decimal(0)
+_D_0_9 = Decimal("0.9")
+_HIGH_VARIANCE_THRESH = 0.02 ** 2  # High volatility is above 2% per tick
+_DEFAULT_VOLATILITY = Decimal("0.01")
+_DEFAULT_VARIANCE = 0.01 ** 2
+_PRICE_PROT_UP = Decimal("1.01")
+_PRICE_PROT_DN = Decimal("0.99")
+
+# Float factors for the internal quote math
+_F_HALF = 0.5
+_F_0_2 = 0.2
+_F_1_5 = 1.5
+
+
+def _to_dec(value) -> Decimal:
+    """Decimal from market data, skipping the str round-trip when it isn't needed"""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    return Decimal(str(value))
+
+
+def _to_price(value: float, tick: Decimal) -> Decimal:
+    """Round a float price onto the tick grid at the order boundary"""
+    return Decimal(str(round(value, 8))).quantize(tick, rounding=ROUND_HALF_UP)
+
+
+def _to_quantity(value: float) -> Decimal:
+    """Convert a float size back to Decimal at the order boundary"""
+    return Decimal(str(round(value, 8)))
+
 
 class MarketMakingStrategy(Enum):
     """Available market making strategies"""
@@ -45,6 +88,7 @@ class MarketMakerConfig:
     order_lifetime: int = 60  # Order lifetime in seconds
     enable_inventory_risk: bool = True
     enable_price_protection: bool = True
+    tick_size: Decimal = Decimal("0.00000001")  # Price increment quotes are rounded to
 
 
 @dataclass
@@ -59,21 +103,96 @@ class MarketState:
     order_book_imbalance: Decimal  # -1 to 1, negative = more sells
     recent_trades: List[Dict]
     timestamp: datetime
+    variance: float = 0.0  # Mean squared return, for threshold checks without the sqrt
 
 
-class GridMarketMaker:
-    """Grid trading strategy - places orders at regular price intervals"""
+@dataclass(slots=True)
+class Order:
+    """Order generated by a strategy; also readable like the dicts it replaces"""
+    symbol: str
+    side: str
+    price: Decimal
+    quantity: Decimal
+    order_type: str = "limit"
+    time_in_force: str = "GTC"
+    metadata: Dict = field(default_factory=dict)
+    maker_id: Optional[str] = None
+    # Execution state kept by MarketMaker: accepted by the exchange and not yet
+    # filled, cancelled or expired; when it was accepted; the quantity filled so far
+    live: bool = False
+    submitted_at: Optional[datetime] = None
+    filled_quantity: Decimal = _D0
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+
+class BaseMarketMaker:
+    """Base strategy - every strategy tracks a signed position in base currency"""
 
     def __init__(self, config: MarketMakerConfig):
         self.config = config
+        self.position: Decimal = _D0
+        self._tick = config.tick_size
+
+    def _next_order(self, orders: List[Order], side: str, price: Decimal,
+                    quantity: Decimal, **metadata) -> Order:
+        """
+        Append a new order to orders. Orders are never reused: callers keep
+        them (and their metadata) past the next refresh.
+        """
+        order = Order(symbol=self.config.symbol, side=side, price=price,
+                      quantity=quantity, metadata=metadata)
+        orders.append(order)
+        return order
+
+    def generate_orders(self, market_state: MarketState) -> List[Order]:
+        """Generate orders for the current market state"""
+        raise NotImplementedError
+
+
+class GridMarketMaker(BaseMarketMaker):
+    """Grid trading strategy - places orders at regular price intervals"""
+
+    def __init__(self, config: MarketMakerConfig):
+        super().__init__(config)
         self.grid_levels: List[Decimal] = []
         self.active_orders: Dict[str, Dict] = {}
         self.filled_orders: List[Dict] = []
-        self.current_position: Decimal = Decimal(0)
+        self._spread_bps_ratio = config.spread_bps / 10000.0
+
+    @property
+    def current_position(self) -> Decimal:
+        """Alias of position kept for existing callers"""
+        return self.position
 
-    def calculate_grid_levels(self, center_price: Decimal, grid_spacing: Decimal,
-                            num_levels: int) -> List[Decimal]:
+    @current_position.setter
+    def current_position(self, value: Decimal):
+        self.position = value
+
+    def calculate_grid_levels(self, center_price: float, grid_spacing: float,
+                            num_levels: int) -> List[Tuple[str, float]]:
         """Calculate grid price levels around center price"""
+        if np is not None:
+            offsets = np.arange(1, num_levels + 1, dtype=np.float64) * grid_spacing
+            buy_levels = (center_price - offsets).tolist()
+            sell_levels = (center_price + offsets).tolist()
+            return [level
+                    for buy_level, sell_level in zip(buy_levels, sell_levels)
+                    for level in (("buy", buy_level), ("sell", sell_level))]
+
         levels = []
 
         # Create levels above and below center
@@ -88,114 +207,97 @@ class GridMarketMaker:
 
         return levels
 
-    def generate_orders(self, market_state: MarketState) -> List[Dict]:
+    def _compute_size_multipliers(self) -> Tuple[float, float]:
+        """Buy/sell size multipliers based on current inventory"""
+        if not self.config.enable_inventory_risk or self.config.inventory_target <= 0:
+            return 1.0, 1.0
+
+        inventory_ratio = float(self.position / self.config.inventory_target)
+
+        # Reduce buy size if over-inventory, sell size if under-inventory
+        buy_mult = 2 - min(inventory_ratio, 2) if inventory_ratio > 1 else 1.0
+        sell_mult = 2 + max(inventory_ratio, -2) if inventory_ratio < 0 else 1.0
+
+        return buy_mult, sell_mult
+
+    def generate_orders(self, market_state: MarketState) -> List[Order]:
         """Generate grid orders based on current market state"""
         orders = []
+        mid_price = float(market_state.mid_price)
+
+        # Size multipliers are the same for every level
+        buy_mult, sell_mult = self._compute_size_multipliers()
+        buy_size = _to_quantity(float(self.config.order_amount) * buy_mult) if buy_mult != 1.0 else self.config.order_amount
+        sell_size = _to_quantity(float(self.config.order_amount) * sell_mult) if sell_mult != 1.0 else self.config.order_amount
 
         # Calculate grid spacing based on volatility
-        grid_spacing = market_state.mid_price * self.config.spread_bps / Decimal(10000)
+        grid_spacing = mid_price * self._spread_bps_ratio
 
         # Adjust spacing based on volatility
-        if market_state.volatility > Decimal("0.02"):  # High volatility
-            grid_spacing *= Decimal("1.5")
+        if market_state.variance > _HIGH_VARIANCE_THRESH:  # High volatility
+            grid_spacing *= _F_1_5
 
         # Calculate grid levels
         levels = self.calculate_grid_levels(
-            market_state.mid_price,
+            mid_price,
             grid_spacing,
             self.config.max_orders_per_side
         )
 
         # Generate orders for each level
-        for side, price in levels:
+        for side, level in levels:
             # Skip if position limit reached
-            if self.current_position > self.config.max_position and side == "buy":
+            if self.position > self.config.max_position and side == "buy":
                 continue
-            if self.current_position < -self.config.max_position and side == "sell":
+            if self.position < -self.config.max_position and side == "sell":
                 continue
 
-            order = {
-                "symbol": self.config.symbol,
-                "side": side,
-                "price": price,
-                "quantity": self.config.order_amount,
-                "order_type": "limit",
-                "time_in_force": "GTC",
-                "metadata": {
-                    "strategy": "grid",
-                    "level": price,
-                    "created_at": market_state.timestamp
-                }
-            }
-            orders.append(order)
+            price = _to_price(level, self._tick)
+            self._next_order(
+                orders, side, price,
+                buy_size if side == "buy" else sell_size,
+                strategy="grid",
+                level=price,
+                created_at=market_state.timestamp
+            )
 
         return orders
 
-    def adjust_for_inventory(self, orders: List[Dict]) -> List[Dict]:
-        """Adjust orders based on current inventory"""
-        if not self.config.enable_inventory_risk:
-            return orders
-
-        inventory_ratio = self.current_position / self.config.inventory_target if self.config.inventory_target > 0 else 0
-
-        adjusted_orders = []
-        for order in orders:
-            adjusted_order = order.copy()
-
-            if order["side"] == "buy":
-                # Reduce buy size if over-inventory
-                if inventory_ratio > 1:
-                    adjusted_order["quantity"] *= Decimal(2 - min(inventory_ratio, 2))
-            else:  # sell
-                # Reduce sell size if under-inventory
-                if inventory_ratio < 0:
-                    adjusted_order["quantity"] *= Decimal(2 + max(inventory_ratio, -2))
-
-            adjusted_orders.append(adjusted_order)
-
-        return adjusted_orders
-
-
-class SpreadMarketMaker:
+class SpreadMarketMaker(BaseMarketMaker):
     """Simple spread-based market making around mid price"""
 
     def __init__(self, config: MarketMakerConfig):
-        self.config = config
+        super().__init__(config)
         self.active_orders: Dict[str, Dict] = {}
-        self.position: Decimal = Decimal(0)
-        self.pnl: Decimal = Decimal(0)
+        self.pnl: Decimal = _D0
+        self._spread_bps_ratio = config.spread_bps / 10000.0
 
-    def calculate_optimal_spread(self, market_state: MarketState) -> Tuple[Decimal, Decimal]:
+    def calculate_optimal_spread(self, market_state: MarketState) -> Tuple[float, float]:
         """Calculate optimal bid-ask spread based on market conditions"""
-        base_spread = self.config.spread_bps / Decimal(10000)
+        base_spread = self._spread_bps_ratio
 
         # Adjust spread based on volatility
-        volatility_adjustment = Decimal(1) + (market_state.volatility * Decimal(10))
+        volatility_adjustment = 1.0 + (float(market_state.volatility) * 10.0)
 
         # Adjust spread based on inventory
-        inventory_ratio = abs(self.position) / self.config.max_position
-        inventory_adjustment = Decimal(1) + (inventory_ratio * Decimal(2))
+        inventory_ratio = float(abs(self.position) / self.config.max_position)
+        inventory_adjustment = 1.0 + (inventory_ratio * 2.0)
 
         # Calculate final spread
         spread = base_spread * volatility_adjustment * inventory_adjustment
-        spread = max(self.config.min_spread, min(spread, self.config.max_spread))
+        spread = max(float(self.config.min_spread), min(spread, float(self.config.max_spread)))
 
         # Calculate bid and ask offsets
-        half_spread = spread / Decimal(2)
-
-        # Skew based on inventory
-        if self.position > 0:  # Long inventory, want to sell more
-            bid_offset = half_spread * Decimal("1.2")
-            ask_offset = half_spread * Decimal("0.8")
-        elif self.position < 0:  # Short inventory, want to buy more
-            bid_offset = half_spread * Decimal("0.8")
-            ask_offset = half_spread * Decimal("1.2")
-        else:
-            bid_offset = ask_offset = half_spread
+        half_spread = spread / 2.0
+
+        # Skew based on inventory: long widens the bid (sell more), short widens the ask (buy more)
+        skew = _F_0_2 * ((self.position > 0) - (self.position < 0))
+        bid_offset = half_spread * (1.0 + skew)
+        ask_offset = half_spread * (1.0 - skew)
 
         return bid_offset, ask_offset
 
-    def generate_orders(self, market_state: MarketState) -> List[Dict]:
+    def generate_orders(self, market_state: MarketState) -> List[Order]:
         """Generate bid and ask orders"""
         orders = []
 
@@ -203,152 +305,131 @@ class SpreadMarketMaker:
         bid_offset, ask_offset = self.calculate_optimal_spread(market_state)
 
         # Generate bid orders
-        bid_price = market_state.mid_price - bid_offset
-        ask_price = market_state.mid_price + ask_offset
+        mid_price = float(market_state.mid_price)
+        bid_price = mid_price - bid_offset
+        ask_price = mid_price + ask_offset
 
         # Adjust order sizes based on position
-        buy_size = self.config.order_amount
-        sell_size = self.config.order_amount
+        buy_size = float(self.config.order_amount)
+        sell_size = buy_size
 
         if self.position > self.config.inventory_target:
             # Over inventory, reduce buys, increase sells
-            buy_size *= Decimal("0.5")
-            sell_size *= Decimal("1.5")
+            buy_size *= _F_HALF
+            sell_size *= _F_1_5
         elif self.position < -self.config.inventory_target:
             # Under inventory, increase buys, reduce sells
-            buy_size *= Decimal("1.5")
-            sell_size *= Decimal("0.5")
+            buy_size *= _F_1_5
+            sell_size *= _F_HALF
+
+        total_spread = bid_offset + ask_offset
 
         # Create multiple orders at different levels
         for i in range(self.config.max_orders_per_side):
-            level_adjustment = Decimal(i) * bid_offset * Decimal("0.2")
+            level_adjustment = i * bid_offset * _F_0_2
+            level_size = 1 - i * 0.1  # Decrease size at further levels
 
             # Buy order
-            orders.append({
-                "symbol": self.config.symbol,
-                "side": "buy",
-                "price": bid_price - level_adjustment,
-                "quantity": buy_size * Decimal(1 - i * 0.1),  # Decrease size at further levels
-                "order_type": "limit",
-                "time_in_force": "GTC",
-                "metadata": {
-                    "strategy": "spread",
-                    "level": i,
-                    "spread": float(bid_offset + ask_offset)
-                }
-            })
+            self._next_order(
+                orders, "buy",
+                _to_price(bid_price - level_adjustment, self._tick),
+                _to_quantity(buy_size * level_size),
+                strategy="spread",
+                level=i,
+                spread=total_spread
+            )
 
             # Sell order
-            orders.append({
-                "symbol": self.config.symbol,
-                "side": "sell",
-                "price": ask_price + level_adjustment,
-                "quantity": sell_size * Decimal(1 - i * 0.1),
-                "order_type": "limit",
-                "time_in_force": "GTC",
-                "metadata": {
-                    "strategy": "spread",
-                    "level": i,
-                    "spread": float(bid_offset + ask_offset)
-                }
-            })
+            self._next_order(
+                orders, "sell",
+                _to_price(ask_price + level_adjustment, self._tick),
+                _to_quantity(sell_size * level_size),
+                strategy="spread",
+                level=i,
+                spread=total_spread
+            )
 
         return orders
 
 
-class AvellanedaStoikovMaker:
+class AvellanedaStoikovMaker(BaseMarketMaker):
     """Advanced market making using Avellaneda-Stoikov model"""
 
     def __init__(self, config: MarketMakerConfig):
-        self.config = config
-        self.position: Decimal = Decimal(0)
+        super().__init__(config)
         self.cash: Decimal = Decimal(100000)  # Starting cash
         self.trades: List[Dict] = []
 
     def calculate_reservation_price(self, market_state: MarketState,
-                                   time_remaining: float) -> Decimal:
+                                   time_remaining: float) -> float:
         """Calculate reservation price based on inventory and risk"""
-        mid_price = market_state.mid_price
+        mid_price = float(market_state.mid_price)
 
         # Inventory risk adjustment
-        gamma = self.config.risk_factor  # Risk aversion parameter
-        sigma = market_state.volatility
+        gamma = float(self.config.risk_factor)  # Risk aversion parameter
+        sigma = float(market_state.volatility)
 
         # Calculate reservation price
-        inventory_adjustment = float(self.position) * float(gamma) * float(sigma) * float(sigma) * time_remaining
-        reservation_price = mid_price - Decimal(str(inventory_adjustment))
+        inventory_adjustment = float(self.position) * gamma * sigma * sigma * time_remaining
+        reservation_price = mid_price - inventory_adjustment
 
         return reservation_price
 
-    def calculate_optimal_quotes(self, market_state: MarketState) -> Tuple[Decimal, Decimal]:
-        """Calculate optimal bid and ask quotes using A-S model"""
+    def _quote(self, market_state: MarketState) -> Tuple[float, float, float]:
+        """Bid, ask and reservation price from a single kernel call"""
         # Time remaining in trading day (simplified)
         time_remaining = 1.0  # Normalized time
 
-        # Get reservation price
-        reservation_price = self.calculate_reservation_price(market_state, time_remaining)
-
-        # Calculate spread based on volatility and order arrival rate
-        sigma = market_state.volatility
-        gamma = self.config.risk_factor
-
-        # Optimal spread from A-S model (simplified)
-        spread_factor = 1 + float(gamma) * float(sigma) * float(sigma) * time_remaining / 2
-        optimal_spread = Decimal(2) / gamma * Decimal(str(math.log(max(spread_factor, 1.001))))
-
-        # Ensure spread is within configured bounds
-        optimal_spread = max(self.config.min_spread, min(optimal_spread, self.config.max_spread))
-
-        # Calculate bid and ask
-        half_spread = optimal_spread / Decimal(2)
-        bid_price = reservation_price - half_spread
-        ask_price = reservation_price + half_spread
+        # Reservation price and spread in native float math
+        return as_quotes(
+            float(market_state.mid_price),
+            float(self.position),
+            float(self.config.risk_factor),
+            float(market_state.volatility),
+            time_remaining,
+            float(self.config.min_spread),
+            float(self.config.max_spread)
+        )
 
-        return bid_price, ask_price
+    def calculate_optimal_quotes(self, market_state: MarketState) -> Tuple[float, float]:
+        """Calculate optimal bid and ask quotes using A-S model"""
+        bid, ask, _ = self._quote(market_state)
+        return bid, ask
 
-    def generate_orders(self, market_state: MarketState) -> List[Dict]:
+    def generate_orders(self, market_state: MarketState) -> List[Order]:
         """Generate orders using Avellaneda-Stoikov model"""
         orders = []
 
-        # Calculate optimal quotes
-        bid_price, ask_price = self.calculate_optimal_quotes(market_state)
+        # Calculate optimal quotes; the reservation price comes from the same call
+        bid_price, ask_price, reservation_price = self._quote(market_state)
+        optimal_spread = ask_price - bid_price
 
         # Adjust order sizes based on position and risk
-        position_ratio = abs(self.position) / self.config.max_position
-        size_multiplier = Decimal(1) - position_ratio * Decimal("0.5")
+        position_ratio = float(abs(self.position) / self.config.max_position)
+        size_multiplier = 1.0 - position_ratio * _F_HALF
 
-        order_size = self.config.order_amount * size_multiplier
+        order_size = _to_quantity(float(self.config.order_amount) * size_multiplier)
 
         # Generate orders
         if self.position < self.config.max_position:
-            orders.append({
-                "symbol": self.config.symbol,
-                "side": "buy",
-                "price": bid_price,
-                "quantity": order_size,
-                "order_type": "limit",
-                "time_in_force": "GTC",
-                "metadata": {
-                    "strategy": "avellaneda_stoikov",
-                    "reservation_price": float(self.calculate_reservation_price(market_state, 1.0)),
-                    "optimal_spread": float(ask_price - bid_price)
-                }
-            })
+            self._next_order(
+                orders, "buy",
+                _to_price(bid_price, self._tick),
+                order_size,
+                strategy="avellaneda_stoikov",
+                reservation_price=reservation_price,
+                optimal_spread=optimal_spread
+            )
 
         if self.position > -self.config.max_position:
-            orders.append({
-                "symbol": self.config.symbol,
-                "side": "sell",
-                "price": ask_price,
-                "quantity": order_size,
-                "order_type": "limit",
-                "time_in_force": "GTC",
-                "metadata": {
-                    "strategy": "avellaneda_stoikov",
-                    "reservation_price": float(self.calculate_reservation_price(market_state, 1.0)),
-                    "optimal_spread": float(ask_price - bid_price)
-                }
-            })
+            self._next_order(
+                orders, "sell",
+                _to_price(ask_price, self._tick),
+                order_size,
+                strategy="avellaneda_stoikov",
+                reservation_price=reservation_price,
+                optimal_spread=optimal_spread
+            )
 
         return orders
 
@@ -360,7 +441,9 @@ class MarketMaker:
         self.config = config
         self.active = False
         self.strategy = self._create_strategy(config)
-        self.active_orders: Set[str] = set()
+        # Orders the exchange accepted that are still resting, oldest first
+        self.live_orders: List[Order] = []
+        self.active_order_count = 0
         self.performance_metrics = {
             "total_volume": Decimal(0),
             "total_trades": 0,
@@ -369,7 +452,14 @@ class MarketMaker:
             "win_rate": 0.0
         }
 
-    def _create_strategy(self, config: MarketMakerConfig):
+        # Last market state, reused while the market data is unchanged
+        self._last_md_key: Optional[Tuple] = None
+        self._last_state: Optional[MarketState] = None
+        self._last_prices: Optional[List] = None
+        self._last_volatility: Decimal = _DEFAULT_VOLATILITY
+        self._last_variance: float = _DEFAULT_VARIANCE
+
+    def _create_strategy(self, config: MarketMakerConfig) -> BaseMarketMaker:
         """Create the appropriate strategy instance"""
         if config.strategy == MarketMakingStrategy.GRID:
             return GridMarketMaker(config)
@@ -390,44 +480,89 @@ class MarketMaker:
         self.active = False
         logger.info(f"Stopping market maker for {self.config.symbol}")
         # In production, would cancel all active orders here
+        for order in self.live_orders:
+            order.live = False
+        self.live_orders.clear()
+        self.active_order_count = 0
+
+    def _calculate_volatility(self, recent_prices: List) -> Tuple[Decimal, float]:
+        """Volatility and variance of recent returns, recomputed only when the price window changes"""
+        if self._last_prices is not None and recent_prices == self._last_prices:
+            return self._last_volatility, self._last_variance
+
+        # Calculate volatility (simplified)
+        if len(recent_prices) > 1:
+            if np is not None:
+                prices = np.asarray(recent_prices, dtype=np.float64)
+                returns = np.diff(prices) / prices[:-1]
+                variance = float(np.dot(returns, returns) / returns.size)
+            else:
+                returns = [(recent_prices[i] - recent_prices[i-1]) / recent_prices[i-1]
+                          for i in range(1, len(recent_prices))]
+                variance = float(sum(r*r for r in returns) / len(returns))
+            volatility = Decimal(str(math.sqrt(variance)))
+        else:
+            volatility = _DEFAULT_VOLATILITY
+            variance = _DEFAULT_VARIANCE
+
+        # Keep a copy so in-place appends by the caller are noticed
+        self._last_prices = list(recent_prices)
+        self._last_volatility = volatility
+        self._last_variance = variance
+        return volatility, variance
 
     async def update_market_state(self, market_data: Dict) -> MarketState:
         """Update market state from market data"""
+        recent_prices = market_data.get("recent_prices", [])
+        volatility, variance = self._calculate_volatility(recent_prices)
+
+        md_key = (
+            market_data.get("mid_price"),
+            market_data.get("best_bid"),
+            market_data.get("best_ask"),
+            market_data.get("bid_volume"),
+            market_data.get("ask_volume"),
+            market_data.get("volume_24h"),
+            volatility
+        )
+        if md_key == self._last_md_key:
+            # Nothing changed since the last tick: copy the last state with the
+            # cheap fields refreshed, leaving the one the caller already holds intact
+            return replace(self._last_state,
+                           recent_trades=market_data.get("recent_trades", []),
+                           timestamp=datetime.utcnow())
+
         # Calculate metrics from market data
-        mid_price = Decimal(str(market_data.get("mid_price", 0)))
-        best_bid = Decimal(str(market_data.get("best_bid", 0))) if market_data.get("best_bid") else None
-        best_ask = Decimal(str(market_data.get("best_ask", 0))) if market_data.get("best_ask") else None
+        mid_price = _to_dec(market_data.get("mid_price", 0))
+        best_bid = _to_dec(market_data["best_bid"]) if market_data.get("best_bid") else None
+        best_ask = _to_dec(market_data["best_ask"]) if market_data.get("best_ask") else None
 
         spread = best_ask - best_bid if best_ask and best_bid else Decimal(0)
 
-        # Calculate volatility (simplified)
-        recent_prices = market_data.get("recent_prices", [])
-        if len(recent_prices) > 1:
-            returns = [(recent_prices[i] - recent_prices[i-1]) / recent_prices[i-1]
-                      for i in range(1, len(recent_prices))]
-            volatility = Decimal(str(math.sqrt(sum(r*r for r in returns) / len(returns)))) if returns else Decimal(0)
-        else:
-            volatility = Decimal("0.01")  # Default volatility
-
         # Calculate order book imbalance
-        bid_volume = Decimal(str(market_data.get("bid_volume", 0)))
-        ask_volume = Decimal(str(market_data.get("ask_volume", 0)))
+        bid_volume = _to_dec(market_data.get("bid_volume", 0))
+        ask_volume = _to_dec(market_data.get("ask_volume", 0))
         total_volume = bid_volume + ask_volume
         imbalance = (bid_volume - ask_volume) / total_volume if total_volume > 0 else Decimal(0)
 
-        return MarketState(
+        state = MarketState(
             mid_price=mid_price,
             best_bid=best_bid,
             best_ask=best_ask,
             spread=spread,
-            volume_24h=Decimal(str(market_data.get("volume_24h", 0))),
+            volume_24h=_to_dec(market_data.get("volume_24h", 0)),
             volatility=volatility,
             order_book_imbalance=imbalance,
             recent_trades=market_data.get("recent_trades", []),
-            timestamp=datetime.utcnow()
+            timestamp=datetime.utcnow(),
+            variance=variance
         )
 
-    async def generate_orders(self, market_data: Dict) -> List[Dict]:
+        self._last_md_key = md_key
+        self._last_state = state
+        return state
+
+    async def generate_orders(self, market_data: Dict) -> List[Order]:
         """Generate new orders based on market conditions"""
         if not self.active:
             return []
@@ -443,42 +578,148 @@ class MarketMaker:
 
         return orders
 
-    def _apply_risk_management(self, orders: List[Dict], market_state: MarketState) -> List[Dict]:
+    async def submit_orders(self, orders: List[Order], exchange_client) -> List:
+        """Submit a refresh cycle's orders as one concurrent burst"""
+        if not orders:
+            return []
+
+        # Prefer a native batch endpoint when the client has one
+        place_batch = getattr(exchange_client, "place_batch", None)
+        if place_batch is not None:
+            results = await place_batch(orders)
+        else:
+            results = await asyncio.gather(
+                *(exchange_client.place_order_async(order) for order in orders),
+                return_exceptions=True
+            )
+
+        # Only orders the exchange accepted are live
+        now = datetime.utcnow()
+        for order, result in zip(orders, results):
+            if not isinstance(result, Exception):
+                order.live = True
+                order.submitted_at = now
+                self.live_orders.append(order)
+                self.active_order_count += 1
+            else:
+                logger.warning(f"Order submission failed for {self.config.symbol} {order.side} @ {order.price}: {result}")
+
+        return results
+
+    async def replace_orders(self, orders: List[Order], exchange_client) -> List:
+        """
+        Start a refresh cycle: cancel the previous cycle's live orders, then
+        submit orders. Orders whose cancel fails stay live (they may have
+        filled meanwhile) and are retried by the next refresh.
+        """
+        stale = list(self.live_orders)
+        cancel = getattr(exchange_client, "cancel_order_async", None)
+        if stale and cancel is not None:
+            results = await asyncio.gather(*(cancel(order) for order in stale),
+                                           return_exceptions=True)
+            for order, result in zip(stale, results):
+                if isinstance(result, Exception) or result is False:
+                    logger.warning(f"Cancel failed for {self.config.symbol} {order.side} @ {order.price}: {result}")
+                else:
+                    self.handle_cancel(order)
+
+        return await self.submit_orders(orders, exchange_client)
+
+    def expire_orders(self, now: Optional[datetime] = None) -> List[Order]:
+        """
+        Retire live orders older than order_lifetime and return them, so the
+        caller can cancel them on the exchange.
+        """
+        cutoff = (now or datetime.utcnow()) - timedelta(seconds=self.config.order_lifetime)
+        expired = []
+        # live_orders is in submission order, so the expired ones are a prefix
+        for order in self.live_orders:
+            if order.submitted_at > cutoff:
+                break
+            expired.append(order)
+        for order in expired:
+            self.handle_cancel(order)
+        return expired
+
+    def handle_cancel(self, order: Order) -> bool:
+        """Take a cancelled or expired order off the live set; False if it wasn't live"""
+        if not order.live:
+            return False
+        self._retire(order)
+        return True
+
+    def _retire(self, order: Order):
+        order.live = False
+        # By identity: distinct orders with equal fields compare equal
+        live = self.live_orders
+        for i, other in enumerate(live):
+            if other is order:
+                del live[i]
+                break
+        self.active_order_count -= 1
+
+    def _apply_risk_management(self, orders: List[Order], market_state: MarketState) -> List[Order]:
         """Apply risk management rules to orders"""
+        price_protection = self.config.enable_price_protection
+        position = self.strategy.position
+        near_limit = abs(position) > self.config.max_position * _D_0_9
+
+        # No rule can reject anything: hand back the strategy's list untouched
+        if not price_protection and not near_limit:
+            return orders
+
+        # Near position limit, only allow reducing orders
+        blocked_side = None
+        if near_limit:
+            if position > 0:
+                blocked_side = "buy"
+            elif position < 0:
+                blocked_side = "sell"
+
+        # Price protection bounds are the same for every order
+        if price_protection:
+            upper_cap = market_state.mid_price * _PRICE_PROT_UP
+            lower_cap = market_state.mid_price * _PRICE_PROT_DN
+
         filtered_orders = []
 
         for order in orders:
+            side = order.side
+
+            # Check position limits
+            if side == blocked_side:
+                continue
+
             # Check price protection
-            if self.config.enable_price_protection:
-                if order["side"] == "buy":
+            if price_protection:
+                if side == "buy":
                     # Don't buy too far above mid price
-                    if order["price"] > market_state.mid_price * Decimal("1.01"):
+                    if order.price > upper_cap:
                         continue
                 else:  # sell
                     # Don't sell too far below mid price
-                    if order["price"] < market_state.mid_price * Decimal("0.99"):
-                        continue
-
-            # Check position limits
-            if hasattr(self.strategy, 'position'):
-                if abs(self.strategy.position) > self.config.max_position * Decimal("0.9"):
-                    # Near position limit, only allow reducing orders
-                    if (self.strategy.position > 0 and order["side"] == "buy") or \
-                       (self.strategy.position < 0 and order["side"] == "sell"):
+                    if order.price < lower_cap:
                         continue
 
             filtered_orders.append(order)
 
         return filtered_orders
 
-    def handle_fill(self, order: Dict, fill_price: Decimal, fill_quantity: Decimal):
+    def handle_fill(self, order: Order, fill_price: Decimal, fill_quantity: Decimal):
         """Handle order fill and update position"""
+        fill_price = _to_dec(fill_price)
+        fill_quantity = _to_dec(fill_quantity)
+
         # Update strategy position
-        if hasattr(self.strategy, 'position'):
-            if order["side"] == "buy":
-                self.strategy.position += fill_quantity
-            else:
-                self.strategy.position -= fill_quantity
+        if order["side"] == "buy":
+            self.strategy.position += fill_quantity
+        else:
+            self.strategy.position -= fill_quantity
+
+        # The fill that completes a live order takes it off the book
+        order.filled_quantity += fill_quantity
+        if order.live and order.filled_quantity >= order.quantity:
+            self._retire(order)
 
         # Update metrics
         self.performance_metrics["total_volume"] += fill_quantity * fill_price
@@ -493,7 +734,7 @@ class MarketMaker:
             "symbol": self.config.symbol,
             "total_volume": float(self.performance_metrics["total_volume"]),
             "total_trades": self.performance_metrics["total_trades"],
-            "current_position": float(getattr(self.strategy, 'position', 0)),
+            "current_position": float(self.strategy.position),
             "pnl": float(self.performance_metrics["pnl"]),
-            "active_orders": len(self.active_orders)
+            "active_orders": self.active_order_count
         }
\ No newline at end of file
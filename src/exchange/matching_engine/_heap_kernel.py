@@ -0,0 +1,95 @@
+"""
+Heap match kernel for the enhanced engine
+One book side is a binary min-heap of slot indices over int64 (keys, ts) columns; bids use key = -price ticks
+"""
+
+from array import array
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """No-op stand-in so the kernel runs as plain Python without numba"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def _before(a, b, keys, ts):
+    """Price-time priority: does slot a come before slot b?"""
+    return keys[a] < keys[b] or (keys[a] == keys[b] and ts[a] < ts[b])
+
+
+@njit(cache=True)
+def heap_push(heap, size, keys, ts):
+    """Sift up the slot already written at heap[size]; returns the new size."""
+    i = size
+    slot = heap[i]
+    while i > 0:
+        parent = (i - 1) >> 1
+        if not _before(slot, heap[parent], keys, ts):
+            break
+        heap[i] = heap[parent]
+        i = parent
+    heap[i] = slot
+    return size + 1
+
+
+@njit(cache=True)
+def heap_pop(heap, size, keys, ts):
+    """Remove heap[0] and sift down; returns the new size."""
+    size -= 1
+    last = heap[size]
+    i = 0
+    while True:
+        child = 2 * i + 1
+        if child >= size:
+            break
+        if child + 1 < size and _before(heap[child + 1], heap[child], keys, ts):
+            child += 1
+        if not _before(heap[child], last, keys, ts):
+            break
+        heap[i] = heap[child]
+        i = child
+    if size > 0:
+        heap[i] = last
+    return size
+
+
+@njit(cache=True)
+def match_heap(heap, size, keys, ts, qtys, limit_key, taker_qty, out_slots, out_qtys):
+    """
+    Fill taker_qty against the heap while its top key is <= limit_key.
+    Filled and cancelled (qty 0) slots are popped. Each visited slot is written to
+    out_slots/out_qtys (sized >= size + 1), with fill 0 for a dropped tombstone.
+    Returns (out_count, taker_qty_left, new_size).
+    """
+    n = 0
+    while size > 0 and taker_qty > 0:
+        top = heap[0]
+        resting = qtys[top]
+        if resting <= 0:
+            out_slots[n] = top
+            out_qtys[n] = 0
+            n += 1
+            size = heap_pop(heap, size, keys, ts)
+            continue
+        if keys[top] > limit_key:
+            break
+        fill = taker_qty if taker_qty < resting else resting
+        resting -= fill
+        qtys[top] = resting
+        taker_qty -= fill
+        out_slots[n] = top
+        out_qtys[n] = fill
+        n += 1
+        if resting == 0:
+            size = heap_pop(heap, size, keys, ts)
+    return n, taker_qty, size
+
+
+# Warm the JIT cache at import so the first real order doesn't pay for compilation
+match_heap(array('q', [0]), 1, array('q', [1]), array('q', [1]), array('q', [1]),
+           1, 1, array('q', [0, 0]), array('q', [0, 0]))
+heap_push(array('q', [0]), 0, array('q', [1]), array('q', [1]))
@@ -0,0 +1,29 @@
+"""
+Ahead-of-time build of the price-level match kernel
+Compiles _match_kernel._match_level into the _match_native extension next to this file,
+so a fresh engine process matches without waiting on numba's JIT.
+
+Usage: python src/exchange/matching_engine/_match_aot.py
+"""
+
+import os
+import sys
+
+from numba import types
+from numba.pycc import CC
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _match_kernel import _match_level
+
+cc = CC('_match_native')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+cc.verbose = True
+
+# Level columns and fill buffers are array('q'), passed through the buffer protocol
+_col = types.PyArray(types.int64, 1, 'C')
+cc.export('match_level', types.UniTuple(types.int64, 2)(
+    _col, _col, types.int64, types.int64, types.int64, _col, _col))(_match_level)
+
+
+if __name__ == "__main__":
+    cc.compile()
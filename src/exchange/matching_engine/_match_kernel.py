@@ -0,0 +1,86 @@
+"""
+Price-level match kernel
+Walks one price level's int64 columns; Order objects and Trade creation stay in the caller
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """No-op stand-in so the kernel runs as plain Python without numba"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+def _match_level(qtys, user_ids, head, taker_qty, taker_user_id, fill_idx, fill_qty):
+    """
+    Fill taker_qty against qtys[head:] in FIFO order, skipping empty slots and
+    the taker's own resting orders. Decrements qtys in place and writes each
+    fill's slot index and size into fill_idx/fill_qty (sized >= len(qtys)).
+    Returns (fill_count, taker_qty_left).
+    """
+    n = 0
+    for i in range(head, len(qtys)):
+        if taker_qty == 0:
+            break
+        resting = qtys[i]
+        if resting == 0 or user_ids[i] == taker_user_id:
+            continue
+        fill = taker_qty if taker_qty < resting else resting
+        qtys[i] = resting - fill
+        taker_qty -= fill
+        fill_idx[n] = i
+        fill_qty[n] = fill
+        n += 1
+    return n, taker_qty
+
+
+# Below this many slots numpy's per-call overhead outweighs the vectorised walk
+VECTOR_MIN_SLOTS = 64
+
+
+def _match_level_np(qtys, user_ids, head, taker_qty, taker_user_id, fill_idx, fill_qty):
+    """Vectorised _match_level: cumsum over the level, searchsorted for the last fill."""
+    q = np.frombuffer(qtys, dtype=np.int64)[head:]
+    live = np.where(np.frombuffer(user_ids, dtype=np.int64)[head:] == taker_user_id, 0, q)
+    csum = np.cumsum(live)
+    if not len(csum) or csum[-1] <= taker_qty:
+        fills = live
+    else:
+        k = int(np.searchsorted(csum, taker_qty))  # First slot reaching taker_qty
+        fills = live[:k + 1]
+        fills[k] = taker_qty - (csum[k] - live[k])
+    idx = np.flatnonzero(fills)
+    n = len(idx)
+    np.frombuffer(fill_idx, dtype=np.int64)[:n] = idx + head
+    np.frombuffer(fill_qty, dtype=np.int64)[:n] = fills[idx]
+    q[:len(fills)] -= fills
+    return n, taker_qty - int(fills.sum())
+
+
+# Resolution order: AOT extension from _match_aot.py, then numba JIT, then plain Python
+match_level = njit(cache=True, boundscheck=False)(_match_level)
+
+try:
+    from ._match_native import match_level
+except ImportError:
+    pass
+
+if match_level is _match_level and np is not None:
+    # No compiled kernel: vectorise deep levels with numpy, walk shallow ones directly
+    def match_level(qtys, user_ids, head, taker_qty, taker_user_id, fill_idx, fill_qty):
+        kernel = _match_level_np if len(qtys) - head >= VECTOR_MIN_SLOTS else _match_level
+        return kernel(qtys, user_ids, head, taker_qty, taker_user_id, fill_idx, fill_qty)
+
+# Warm the JIT cache at import so the first real order doesn't pay for compilation
+_warm = array('q', [0])
+match_level(array('q', [1]), array('q', [1]), 0, 1, 2, _warm, array('q', [0]))
+del _warm
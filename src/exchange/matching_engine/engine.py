@@ -3,16 +3,64 @@ High-performance matching engine for real exchange.
 Optimized for low latency and high throughput.
 """
 
+from array import array
 from dataclasses import dataclass, field
 from decimal import Decimal
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, List, Optional, Tuple
 from enum import Enum
-import heapq
 import time
-from collections import defaultdict
-import uuid
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from queue import SimpleQueue
+from itertools import count, islice
 from datetime import datetime
 
+from sortedcontainers import SortedDict
+
+try:
+    from matching_engine._match_kernel import match_level
+except ImportError:
+    from ._match_kernel import match_level
+
+
+logger = logging.getLogger(__name__)
+
+
+# Default fixed-point scales: prices in ticks, quantities in lots
+DEFAULT_TICK_SIZE = Decimal('0.00000001')
+DEFAULT_LOT_SIZE = Decimal('0.00000001')
+
+# Recent trades kept in MatchingEngine.trades
+TRADE_HISTORY_SIZE = 1_000_000
+
+# Recycled Trade objects kept per book (also the number preallocated)
+TRADE_POOL_SIZE = 1024
+
+# Trade batches awaiting callback dispatch before new orders are rejected
+CALLBACK_HIGH_WATERMARK = 100_000
+
+# Seconds an unchanged order book snapshot may be served from cache
+SNAPSHOT_TTL = 0.01
+
+# Trade id layout (63 bits, always a positive int64), unique engine-wide and across shards:
+#   ms since TRADE_ID_EPOCH_NS (41 bits, ~69 years) | sequence (10) | shard (4) | book (8)
+# The shard/book node sits in the low bits, so a book issues ids by adding TRADE_ID_STEP;
+# more than 1024 trades in one ms carry into the next ms instead of into another node
+TRADE_ID_EPOCH_NS = 1_704_067_200_000_000_000  # 2024-01-01T00:00:00Z
+TRADE_ID_BOOK_BITS = 8
+TRADE_ID_SHARD_BITS = 4
+TRADE_ID_SEQ_BITS = 10
+TRADE_ID_STEP = 1 << (TRADE_ID_SHARD_BITS + TRADE_ID_BOOK_BITS)
+TRADE_ID_TIME_SHIFT = TRADE_ID_SEQ_BITS + TRADE_ID_SHARD_BITS + TRADE_ID_BOOK_BITS
+
+
+def ns_to_datetime(ts_ns: int) -> datetime:
+    """Convert an engine timestamp (ns since epoch) to a naive UTC datetime."""
+    seconds, ns = divmod(ts_ns, 1_000_000_000)
+    return datetime.utcfromtimestamp(seconds).replace(microsecond=ns // 1000)
+
 
 class OrderType(Enum):
     MARKET = "market"
@@ -42,7 +90,7 @@ class TimeInForce(Enum):
     DAY = "day"
 
 
-@dataclass
+@dataclass(slots=True)
 class Order:
     """Order with all necessary fields for real exchange."""
     id: str
@@ -54,71 +102,357 @@ class Order:
     quantity: Decimal
     time_in_force: TimeInForce
     status: OrderStatus = OrderStatus.NEW
-    filled_quantity: Decimal = Decimal('0')
-    remaining_quantity: Decimal = field(init=False)
     average_fill_price: Optional[Decimal] = None
     stop_price: Optional[Decimal] = None
     iceberg_quantity: Optional[Decimal] = None
     post_only: bool = False
     reduce_only: bool = False
     client_order_id: Optional[str] = None
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    updated_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: int = field(default_factory=time.time_ns)  # ns since epoch
+    updated_at: int = 0
     expire_time: Optional[datetime] = None
+    # Fixed-point state used by the order book (stamped on admission)
+    price_ticks: int = field(default=0, init=False)
+    level_key: int = field(default=0, init=False)  # Sort key in its side's book: -ticks for bids
+    stop_ticks: int = field(default=0, init=False)
+    filled_lots: int = field(default=0, init=False)
+    remaining_lots: int = field(default=0, init=False)
+    user_key: int = field(default=0, init=False)  # Interned user_id
+    order_key: int = field(default=0, init=False)  # Book-local int id while resting
+    # Intrusive links in the owner's list of open orders (see OrderBook.user_head)
+    prev_uo: Optional['Order'] = field(default=None, init=False, repr=False, compare=False)
+    next_uo: Optional['Order'] = field(default=None, init=False, repr=False, compare=False)
+    level_slot: int = field(default=-1, init=False)  # Position in its PriceLevel while resting
+    lot_size: Decimal = field(default=DEFAULT_LOT_SIZE, init=False)
 
     def __post_init__(self):
-        self.remaining_quantity = self.quantity - self.filled_quantity
-
-    def __lt__(self, other):
-        """For heap operations - price-time priority."""
-        if self.side == 'buy':
-            # For buys, higher price is better (use negative for min heap)
-            if self.price != other.price:
-                return -self.price < -other.price
-        else:
-            # For sells, lower price is better
-            if self.price != other.price:
-                return self.price < other.price
-        # Time priority (earlier is better)
-        return self.created_at < other.created_at
+        if not self.updated_at:
+            self.updated_at = self.created_at
+        self.remaining_lots = int((self.quantity / self.lot_size).to_integral_value())
+
+    @property
+    def filled_quantity(self) -> Decimal:
+        return self.filled_lots * self.lot_size
 
+    @property
+    def remaining_quantity(self) -> Decimal:
+        return self.remaining_lots * self.lot_size
 
-@dataclass
+
+@dataclass(slots=True)
+class TradeDetail:
+    """Settlement details for a trade, attached only when fees are charged."""
+    fee_currency: str = "USD"
+    buyer_fee: Decimal = Decimal('0')
+    seller_fee: Decimal = Decimal('0')
+
+
+@dataclass(slots=True)
 class Trade:
     """Executed trade record."""
-    id: str
+    id: int  # Unique engine-wide, increasing per book; layout above TRADE_ID_EPOCH_NS
     symbol: str
     buyer_order_id: str
     seller_order_id: str
     buyer_user_id: str
     seller_user_id: str
-    price: Decimal
-    quantity: Decimal
+    price_ticks: int
+    qty_lots: int
     maker_order_id: str
     taker_order_id: str
-    timestamp: datetime = field(default_factory=datetime.utcnow)
-    fee_currency: str = "USD"
-    buyer_fee: Decimal = Decimal('0')
-    seller_fee: Decimal = Decimal('0')
+    timestamp: int  # ns since epoch
+    tick_size: Decimal = DEFAULT_TICK_SIZE
+    lot_size: Decimal = DEFAULT_LOT_SIZE
+    detail: Optional[TradeDetail] = None
+
+    @property
+    def price(self) -> Decimal:
+        return self.price_ticks * self.tick_size
+
+    @property
+    def quantity(self) -> Decimal:
+        return self.qty_lots * self.lot_size
+
+
+class Interner:
+    """Registry of small int keys for strings; safe to share between book threads."""
+
+    __slots__ = ('ids', '_next')
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self._next = count(1)
+
+    def __call__(self, name: str) -> int:
+        key = self.ids.get(name)
+        if key is None:
+            key = self.ids.setdefault(name, next(self._next))
+        return key
+
+
+class PriceLevel:
+    """
+    Resting orders at one price in FIFO order, stored as parallel int64 columns.
+    Order objects live in the book's resting map, keyed by the ids column.
+    """
+
+    __slots__ = ('price_ticks', 'price', 'ids', 'qtys', 'user_ids', 'head', 'base', 'cancelled', 'total')
+
+    def __init__(self, price_ticks: int, price: Decimal):
+        self.price_ticks = price_ticks  # Unsigned price, whichever side the level is on
+        self.price = price
+        self.ids = array('q')       # Order key per slot
+        self.qtys = array('q')      # Remaining lots per slot, 0 once filled or cancelled
+        self.user_ids = array('q')  # Interned user key per slot
+        self.head = 0               # First live slot
+        self.base = 0               # Slot number of index 0 (Order.level_slot - base = index)
+        self.cancelled = 0          # Tombstones left by cancels
+        self.total = 0              # Aggregate remaining lots at this price
+
+    def __bool__(self) -> bool:
+        return self.head < len(self.qtys)
+
+    def append(self, order: Order):
+        order.level_slot = self.base + len(self.qtys)
+        self.ids.append(order.order_key)
+        self.qtys.append(order.remaining_lots)
+        self.user_ids.append(order.user_key)
+        self.total += order.remaining_lots
+
+    def advance(self):
+        """Move head past filled slots, dropping the dead prefix once it dominates."""
+        qtys = self.qtys
+        head = self.head
+        size = len(qtys)
+        while head < size and qtys[head] == 0:
+            head += 1
+        if head == size:
+            del self.ids[:]
+            del qtys[:]
+            del self.user_ids[:]
+            self.base += size
+            self.cancelled = 0
+            head = 0
+        elif head > 32 and head * 2 > size:
+            del self.ids[:head]
+            del qtys[:head]
+            del self.user_ids[:head]
+            self.base += head
+            head = 0
+        self.head = head
+
+    def cancel(self, order: Order, resting: Dict[int, Order]) -> bool:
+        """Tombstone order's slot in O(1); compact once tombstones outnumber live slots."""
+        i = order.level_slot - self.base
+        if i < self.head or i >= len(self.ids) or self.ids[i] != order.order_key:
+            return False
+        self.total -= self.qtys[i]
+        self.qtys[i] = 0
+        self.cancelled += 1
+        if i == self.head:
+            self.advance()
+        elif self.cancelled * 2 > len(self.qtys) - self.head:
+            self._compact(resting)
+        return True
+
+    def _compact(self, resting: Dict[int, Order]):
+        """Rebuild the columns without empty slots, renumbering the survivors."""
+        qtys = self.qtys
+        keep = [i for i in range(self.head, len(qtys)) if qtys[i]]
+        self.base += len(qtys)
+        self.ids = array('q', [self.ids[i] for i in keep])
+        for slot, key in enumerate(self.ids, self.base):
+            resting[key].level_slot = slot
+        self.qtys = array('q', [qtys[i] for i in keep])
+        self.user_ids = array('q', [self.user_ids[i] for i in keep])
+        self.head = 0
+        self.cancelled = 0
+
+
+# Per-symbol matcher source. Symbol and side are baked in as literals and the tick/lot
+# sizes are globals of the generated module, so the per-fill loop only touches locals.
+_MATCHER_TEMPLATE = """
+def match_{side}(book, order, limit_key):
+    trades = []
+    levels = book.{opposite}_levels
+    resting = book._resting
+    pool = book._trade_pool
+    unlink = book._unlink_user_order
+    taker_key = order.user_key
+    ts_ns = book._now_ns
+    trade_id = book._last_trade_id
+    # Snowflake-style: this ms with sequence 0 and the book's node, or past the last id issued
+    first_id = ((ts_ns - TRADE_ID_EPOCH_NS) // 1_000_000 << TRADE_ID_TIME_SHIFT) | book.trade_node
+    if first_id > trade_id:
+        trade_id = first_id - TRADE_ID_STEP
+    volume = 0
+    emptied = []
+    for key in levels.irange(maximum=limit_key):
+        level = levels[key]
+        size = len(level.qtys)
+        if size > len(book._fill_idx):
+            book._fill_idx = array('q', bytes(8 * size))
+            book._fill_qty = array('q', bytes(8 * size))
+        fill_idx = book._fill_idx
+        fill_qty = book._fill_qty
+
+        # Kernel walks the level (skipping self-trades in place); Python only builds trades
+        count, left = match_level(level.qtys, level.user_ids, level.head,
+                                  order.remaining_lots, taker_key, fill_idx, fill_qty)
+        filled = order.remaining_lots - left
+        order.filled_lots += filled
+        order.remaining_lots = left
+        level.total -= filled
+        ids = level.ids
+        trade_ticks = level.price_ticks  # Maker price
+        for k in range(count):
+            lots = fill_qty[k]
+            maker = resting[ids[fill_idx[k]]]
+            trade_id += TRADE_ID_STEP
+            trade = pool.pop() if pool else new_trade(Trade)
+            trade.id = trade_id
+            trade.symbol = {symbol!r}
+            trade.buyer_order_id = {buyer}.id
+            trade.seller_order_id = {seller}.id
+            trade.buyer_user_id = {buyer}.user_id
+            trade.seller_user_id = {seller}.user_id
+            trade.price_ticks = trade_ticks
+            trade.qty_lots = lots
+            trade.maker_order_id = maker.id
+            trade.taker_order_id = order.id
+            trade.timestamp = ts_ns
+            trade.tick_size = TICK_SIZE
+            trade.lot_size = LOT_SIZE
+            trade.detail = None
+            trades.append(trade)
+            maker.filled_lots += lots
+            maker.remaining_lots -= lots
+            if maker.remaining_lots == 0:
+                maker.status = FILLED
+                del resting[maker.order_key]
+                unlink(maker)
+            else:
+                maker.status = PARTIALLY_FILLED
+            volume += lots * trade_ticks
+
+        level.advance()
+        if not level:
+            emptied.append(key)
+        if left <= 0:
+            break
+
+    for key in emptied:
+        del levels[key]
+
+    if trades:
+        order.status = FILLED if order.remaining_lots == 0 else PARTIALLY_FILLED
+        book._last_trade_id = trade_id
+        book.last_trade_ticks = trades[-1].price_ticks
+        book.last_trade_time = ts_ns
+        book.daily_volume_units += volume
+        book.daily_trades += len(trades)
+    return trades
+"""
+
+
+def _build_matcher(symbol: str, tick_size: Decimal, lot_size: Decimal, side: str):
+    """Compile the matching loop for one symbol and taker side."""
+    src = _MATCHER_TEMPLATE.format(
+        side=side,
+        opposite='ask' if side == 'buy' else 'bid',
+        symbol=symbol,
+        buyer='order' if side == 'buy' else 'maker',
+        seller='maker' if side == 'buy' else 'order',
+    )
+    namespace = {
+        'array': array, 'match_level': match_level, 'Trade': Trade, 'new_trade': object.__new__,
+        'FILLED': OrderStatus.FILLED, 'PARTIALLY_FILLED': OrderStatus.PARTIALLY_FILLED,
+        'TICK_SIZE': tick_size, 'LOT_SIZE': lot_size,
+        'TRADE_ID_EPOCH_NS': TRADE_ID_EPOCH_NS, 'TRADE_ID_STEP': TRADE_ID_STEP,
+        'TRADE_ID_TIME_SHIFT': TRADE_ID_TIME_SHIFT,
+    }
+    exec(compile(src, f"<match_{side}_{symbol}>", "exec"), namespace)
+    return namespace[f"match_{side}"]
 
 
 class OrderBook:
     """Optimized order book for a single trading pair."""
 
-    def __init__(self, symbol: str):
+    def __init__(self, symbol: str, tick_size: Decimal = DEFAULT_TICK_SIZE,
+                 lot_size: Decimal = DEFAULT_LOT_SIZE, user_interner: Optional[Interner] = None,
+                 trade_node: int = 0):
         self.symbol = symbol
-        self.bids: List[Order] = []  # Max heap (use negative prices)
-        self.asks: List[Order] = []  # Min heap
+        # Shard/book bits of this book's trade ids, assigned by TradeIdNodes
+        self.trade_node = trade_node
+        self.tick_size = tick_size
+        self.lot_size = lot_size
+        # Price levels: price in ticks -> PriceLevel
+        # Bids are keyed by -price_ticks so the best level is the first key on both sides
+        self.bid_levels: SortedDict = SortedDict()
+        self.ask_levels: SortedDict = SortedDict()
         self.orders: Dict[str, Order] = {}
         self.stop_orders: Dict[str, Order] = {}
-        self.order_index: Dict[str, Set[str]] = defaultdict(set)  # user_id -> order_ids
-        self.last_trade_price: Optional[Decimal] = None
-        self.last_trade_time: Optional[datetime] = None
-        self.daily_volume: Decimal = Decimal('0')
+        # Stop index: stop_ticks -> orders; buys trigger at or above, sells at or below
+        self._buy_stops: SortedDict = SortedDict()
+        self._sell_stops: SortedDict = SortedDict()
+        self._pending_stops: deque = deque()  # Triggered, waiting to be entered
+        # user_key -> most recent open (resting or pending stop) order, linked via prev_uo/next_uo
+        self.user_head: Dict[int, Order] = {}
+        self._resting: Dict[int, Order] = {}  # order_key -> Order for orders on the levels
+        self._next_order_key = count(1)
+        self.last_trade_ticks: Optional[int] = None
+        self.last_trade_time: Optional[int] = None  # ns since epoch
+        self.daily_volume_units: int = 0  # Sum of ticks * lots
         self.daily_trades: int = 0
 
+        # Recycled Trade objects, refilled only through release_trades()
+        self._trade_pool: List[Trade] = [object.__new__(Trade) for _ in range(TRADE_POOL_SIZE)]
+
+        # Matchers specialised for this symbol's constants and each taker side
+        self._match_buy = _build_matcher(symbol, tick_size, lot_size, 'buy')
+        self._match_sell = _build_matcher(symbol, tick_size, lot_size, 'sell')
+
+        # Interned user keys (shared engine-wide) and scratch buffers for the match kernel
+        self._user_key = user_interner if user_interner is not None else Interner()
+        self._fill_idx = array('q', bytes(8 * 64))
+        self._fill_qty = array('q', bytes(8 * 64))
+
+        # Clock read once per add_order and the last trade id issued
+        self._now_ns = 0
+        self._last_trade_id = trade_node
+
+        # Book version, bumped on every mutation, and snapshots cached against it
+        self._seq = 0
+        self._snapshot_cache: Dict[int, Tuple[int, float, Dict]] = {}
+
+    @property
+    def last_trade_price(self) -> Optional[Decimal]:
+        if self.last_trade_ticks is None:
+            return None
+        return self.last_trade_ticks * self.tick_size
+
+    @property
+    def daily_volume(self) -> Decimal:
+        return self.daily_volume_units * self.tick_size * self.lot_size
+
+    def _to_ticks(self, price: Decimal) -> int:
+        return int((price / self.tick_size).to_integral_value())
+
+    def _to_lots(self, quantity: Decimal) -> int:
+        return int((quantity / self.lot_size).to_integral_value())
+
     def add_order(self, order: Order) -> List[Trade]:
-        """Add order and execute matches."""
+        """Add order and execute matches, including any stop orders its trades trigger."""
+        trades = self._add_order(order)
+
+        # Enter triggered stops iteratively; their trades may trigger further stops
+        pending = self._pending_stops
+        while pending:
+            trades.extend(self._add_order(pending.popleft()))
+
+        return trades
+
+    def _add_order(self, order: Order) -> List[Trade]:
         trades = []
 
         # Validate order
@@ -126,9 +460,21 @@ class OrderBook:
             order.status = OrderStatus.REJECTED
             return trades
 
+        self._now_ns = time.time_ns()
+        self._seq += 1
+
+        # Convert to fixed point once; everything below works in ticks and lots
+        order.lot_size = self.lot_size
+        order.remaining_lots = self._to_lots(order.quantity) - order.filled_lots
+        if order.price is not None:
+            order.price_ticks = self._to_ticks(order.price)
+            order.level_key = -order.price_ticks if order.side == 'buy' else order.price_ticks
+        if order.stop_price is not None:
+            order.stop_ticks = self._to_ticks(order.stop_price)
+
         # Store order
+        order.user_key = self._user_key(order.user_id)
         self.orders[order.id] = order
-        self.order_index[order.user_id].add(order.id)
 
         # Handle different order types
         if order.order_type == OrderType.MARKET:
@@ -142,7 +488,7 @@ class OrderBook:
 
         # Check stop orders after trades
         if trades:
-            self._trigger_stop_orders(trades[-1].price)
+            self._trigger_stop_orders(trades[-1].price_ticks)
 
         return trades
 
@@ -157,93 +503,100 @@ class OrderBook:
         if order.order_type in [OrderType.STOP, OrderType.STOP_LIMIT] and order.stop_price is None:
             return False
 
+        # Reject rather than round to the grid: an off-lot quantity would trade a
+        # different size (a sub-lot one rounds to zero lots and reports FILLED)
+        if order.quantity % self.lot_size:
+            return False
+
+        if order.price is not None and order.price % self.tick_size:
+            return False
+
+        if order.stop_price is not None and order.stop_price % self.tick_size:
+            return False
+
         # Add more validation rules as needed
         return True
 
-    def _match_market_order(self, order: Order) -> List[Trade]:
-        """Match market order against book."""
-        trades = []
-
+    def _match_against_book(self, order: Order, limit_key: Optional[int]) -> List[Trade]:
+        """
+        Fill order against the opposite side, best price first, FIFO within a level.
+        limit_key is the worst acceptable level key on that side (None for no limit).
+        """
         if order.side == 'buy':
-            book = self.asks
+            return self._match_buy(self, order, limit_key)
+        return self._match_sell(self, order, limit_key)
+
+    def _rest_order(self, order: Order):
+        """Queue order at the back of its price level."""
+        levels = self.bid_levels if order.side == 'buy' else self.ask_levels
+        level = levels.get(order.level_key)
+        if level is None:
+            level = levels[order.level_key] = PriceLevel(order.price_ticks,
+                                                         order.price_ticks * self.tick_size)
+        order.order_key = next(self._next_order_key)
+        self._resting[order.order_key] = order
+        level.append(order)
+        self._link_user_order(order)
+
+    def _link_user_order(self, order: Order):
+        head = self.user_head.get(order.user_key)
+        order.next_uo = head
+        if head is not None:
+            head.prev_uo = order
+        self.user_head[order.user_key] = order
+
+    def _unlink_user_order(self, order: Order):
+        prev, nxt = order.prev_uo, order.next_uo
+        if prev is None:
+            if nxt is None:
+                del self.user_head[order.user_key]
+            else:
+                self.user_head[order.user_key] = nxt
         else:
-            book = self.bids
-
-        while book and order.remaining_quantity > 0:
-            counter_order = heapq.heappop(book)
-
-            # Skip self-trade
-            if counter_order.user_id == order.user_id:
-                heapq.heappush(book, counter_order)
-                continue
+            prev.next_uo = nxt
+        if nxt is not None:
+            nxt.prev_uo = prev
+        order.prev_uo = order.next_uo = None
+
+    def release_trades(self, trades: List[Trade]):
+        """
+        Return trades to the pool for reuse by later matches. Only call this once
+        nothing else holds them: they are overwritten in place when reused.
+        """
+        pool = self._trade_pool
+        room = TRADE_POOL_SIZE - len(pool)
+        if room > 0:
+            pool.extend(trades[:room])
+
+    def get_user_orders(self, user_id: str) -> List[Order]:
+        """Open (resting or pending stop) orders for a user, newest first."""
+        orders = []
+        key = self._user_key.ids.get(user_id)
+        order = self.user_head.get(key) if key is not None else None
+        while order is not None:
+            orders.append(order)
+            order = order.next_uo
+        return orders
 
-            trade = self._execute_trade(order, counter_order)
-            if trade:
-                trades.append(trade)
-
-            # Put back partially filled order
-            if counter_order.remaining_quantity > 0:
-                heapq.heappush(book, counter_order)
+    def _match_market_order(self, order: Order) -> List[Trade]:
+        """Match market order against book."""
+        trades = self._match_against_book(order, None)
 
         # Update order status
-        if order.remaining_quantity == 0:
+        if order.remaining_lots == 0:
             order.status = OrderStatus.FILLED
-        elif order.filled_quantity > 0:
+        elif order.filled_lots > 0:
             order.status = OrderStatus.PARTIALLY_FILLED
 
         return trades
 
     def _match_limit_order(self, order: Order) -> List[Trade]:
         """Match limit order against book."""
-        trades = []
-
-        if order.side == 'buy':
-            book = self.asks
-            while book and order.remaining_quantity > 0:
-                if book[0].price > order.price:
-                    break
-                counter_order = heapq.heappop(book)
-
-                # Skip self-trade
-                if counter_order.user_id == order.user_id:
-                    heapq.heappush(book, counter_order)
-                    continue
-
-                trade = self._execute_trade(order, counter_order)
-                if trade:
-                    trades.append(trade)
-
-                if counter_order.remaining_quantity > 0:
-                    heapq.heappush(book, counter_order)
-        else:
-            book = self.bids
-            while book and order.remaining_quantity > 0:
-                # Note: bids use negative prices in heap
-                if -book[0].price < order.price:
-                    break
-                counter_order = heapq.heappop(book)
-
-                # Skip self-trade
-                if counter_order.user_id == order.user_id:
-                    heapq.heappush(book, counter_order)
-                    continue
-
-                trade = self._execute_trade(order, counter_order)
-                if trade:
-                    trades.append(trade)
-
-                if counter_order.remaining_quantity > 0:
-                    heapq.heappush(book, counter_order)
+        trades = self._match_against_book(order, -order.level_key)
 
         # Add remaining order to book
-        if order.remaining_quantity > 0:
-            if order.side == 'buy':
-                # Use negative price for buy orders (max heap)
-                order.price = -order.price
-                heapq.heappush(self.bids, order)
-                order.price = -order.price  # Restore original
-            else:
-                heapq.heappush(self.asks, order)
+        if order.remaining_lots > 0:
+            self._rest_order(order)
         else:
             order.status = OrderStatus.FILLED
 
@@ -252,95 +605,40 @@ class OrderBook:
     def _match_post_only_order(self, order: Order) -> List[Trade]:
         """Match post-only order (must be maker)."""
         # Check if order would cross the spread
-        if order.side == 'buy':
-            if self.asks and order.price >= self.asks[0].price:
-                order.status = OrderStatus.REJECTED
-                return []
-        else:
-            if self.bids and order.price <= -self.bids[0].price:
-                order.status = OrderStatus.REJECTED
-                return []
+        opposite = self.ask_levels if order.side == 'buy' else self.bid_levels
+        if opposite and opposite.peekitem(0)[0] <= -order.level_key:
+            order.status = OrderStatus.REJECTED
+            return []
 
         # Add as limit order
-        if order.side == 'buy':
-            order.price = -order.price
-            heapq.heappush(self.bids, order)
-            order.price = -order.price
-        else:
-            heapq.heappush(self.asks, order)
+        self._rest_order(order)
 
         return []
 
-    def _execute_trade(self, taker_order: Order, maker_order: Order) -> Optional[Trade]:
-        """Execute trade between two orders."""
-        trade_quantity = min(taker_order.remaining_quantity, maker_order.remaining_quantity)
-
-        if trade_quantity <= 0:
-            return None
-
-        # Use maker price
-        trade_price = abs(maker_order.price) if maker_order.price else self.last_trade_price
-
-        # Create trade
-        trade = Trade(
-            id=str(uuid.uuid4()),
-            symbol=self.symbol,
-            buyer_order_id=taker_order.id if taker_order.side == 'buy' else maker_order.id,
-            seller_order_id=maker_order.id if taker_order.side == 'buy' else taker_order.id,
-            buyer_user_id=taker_order.user_id if taker_order.side == 'buy' else maker_order.user_id,
-            seller_user_id=maker_order.user_id if taker_order.side == 'buy' else taker_order.user_id,
-            price=trade_price,
-            quantity=trade_quantity,
-            maker_order_id=maker_order.id,
-            taker_order_id=taker_order.id
-        )
-
-        # Update orders
-        taker_order.filled_quantity += trade_quantity
-        taker_order.remaining_quantity -= trade_quantity
-        maker_order.filled_quantity += trade_quantity
-        maker_order.remaining_quantity -= trade_quantity
-
-        # Update order status
-        if taker_order.remaining_quantity == 0:
-            taker_order.status = OrderStatus.FILLED
-        else:
-            taker_order.status = OrderStatus.PARTIALLY_FILLED
-
-        if maker_order.remaining_quantity == 0:
-            maker_order.status = OrderStatus.FILLED
-        else:
-            maker_order.status = OrderStatus.PARTIALLY_FILLED
-
-        # Update market data
-        self.last_trade_price = trade_price
-        self.last_trade_time = trade.timestamp
-        self.daily_volume += trade_quantity * trade_price
-        self.daily_trades += 1
-
-        return trade
-
     def _add_stop_order(self, order: Order):
         """Add stop order to monitoring."""
         self.stop_orders[order.id] = order
-
-    def _trigger_stop_orders(self, price: Decimal):
-        """Check and trigger stop orders."""
-        triggered = []
-
-        for order_id, order in self.stop_orders.items():
-            if order.side == 'buy' and price >= order.stop_price:
-                triggered.append(order_id)
-            elif order.side == 'sell' and price <= order.stop_price:
-                triggered.append(order_id)
-
-        for order_id in triggered:
-            order = self.stop_orders.pop(order_id)
-            if order.order_type == OrderType.STOP:
-                order.order_type = OrderType.MARKET
-            else:  # STOP_LIMIT
-                order.order_type = OrderType.LIMIT
-            self.add_order(order)
+        stops = self._buy_stops if order.side == 'buy' else self._sell_stops
+        bucket = stops.get(order.stop_ticks)
+        if bucket is None:
+            bucket = stops[order.stop_ticks] = []
+        bucket.append(order)
+        self._link_user_order(order)
+
+    def _trigger_stop_orders(self, price_ticks: int):
+        """Queue the stop orders crossed by price_ticks; only crossed buckets are visited."""
+        crossed = [(self._buy_stops, p) for p in self._buy_stops.irange(maximum=price_ticks)]
+        crossed += [(self._sell_stops, p) for p in self._sell_stops.irange(minimum=price_ticks)]
+
+        for stops, stop_ticks in crossed:
+            for order in stops.pop(stop_ticks):
+                del self.stop_orders[order.id]
+                self._unlink_user_order(order)
+                if order.order_type == OrderType.STOP:
+                    order.order_type = OrderType.MARKET
+                else:  # STOP_LIMIT
+                    order.order_type = OrderType.LIMIT
+                self._pending_stops.append(order)
 
     def cancel_order(self, order_id: str) -> bool:
         """Cancel an order."""
@@ -352,82 +650,242 @@ class OrderBook:
         if order.status in [OrderStatus.FILLED, OrderStatus.CANCELLED]:
             return False
 
-        # Remove from books
-        if order.side == 'buy':
-            self.bids = [o for o in self.bids if o.id != order_id]
-            heapq.heapify(self.bids)
-        else:
-            self.asks = [o for o in self.asks if o.id != order_id]
-            heapq.heapify(self.asks)
+        # Tombstone its slot; the match kernel and snapshots skip empty slots
+        levels = self.bid_levels if order.side == 'buy' else self.ask_levels
+        level = levels.get(order.level_key)
+        if level is not None and level.cancel(order, self._resting):
+            del self._resting[order.order_key]
+            self._unlink_user_order(order)
+            if not level:
+                del levels[order.level_key]
 
         # Remove from stop orders
         if order_id in self.stop_orders:
             del self.stop_orders[order_id]
+            self._unlink_user_order(order)
+            stops = self._buy_stops if order.side == 'buy' else self._sell_stops
+            bucket = stops[order.stop_ticks]
+            bucket[:] = [o for o in bucket if o is not order]
+            if not bucket:
+                del stops[order.stop_ticks]
 
         order.status = OrderStatus.CANCELLED
-        order.updated_at = datetime.utcnow()
+        order.updated_at = time.time_ns()
+        self._seq += 1
 
         return True
 
     def get_order_book_snapshot(self, depth: int = 20) -> Dict:
-        """Get current order book snapshot."""
-        return {
+        """Get current order book snapshot, aggregated per price level."""
+        now = time.monotonic()
+        cached = self._snapshot_cache.get(depth)
+        if cached is not None and cached[0] == self._seq and now < cached[1]:
+            return cached[2]
+
+        lot_size = self.lot_size
+        snapshot = {
             "symbol": self.symbol,
             "bids": [
-                {"price": abs(o.price), "quantity": o.remaining_quantity}
-                for o in sorted(self.bids)[:depth]
+                {"price": level.price, "quantity": level.total * lot_size}
+                for level in islice(self.bid_levels.values(), depth)
             ],
             "asks": [
-                {"price": o.price, "quantity": o.remaining_quantity}
-                for o in sorted(self.asks)[:depth]
+                {"price": level.price, "quantity": level.total * lot_size}
+                for level in islice(self.ask_levels.values(), depth)
             ],
             "last_price": self.last_trade_price,
             "timestamp": datetime.utcnow().isoformat()
         }
 
+        # Unchanged book within the TTL: repeated polls share this dict (treat as read-only)
+        self._snapshot_cache[depth] = (self._seq, now + SNAPSHOT_TTL, snapshot)
+        return snapshot
+
+
+class TradeIdNodes:
+    """
+    Engine-wide allocator of the shard/book bits in trade ids. Each book gets a
+    distinct node, so books matching in the same ms never issue the same id, and
+    engines given distinct shard ids never collide with each other.
+    """
+
+    __slots__ = ('shard_id', '_books')
+
+    def __init__(self, shard_id: int = 0):
+        if not 0 <= shard_id < 1 << TRADE_ID_SHARD_BITS:
+            raise ValueError(f"shard_id must be in [0, {1 << TRADE_ID_SHARD_BITS})")
+        self.shard_id = shard_id
+        self._books = count()
+
+    def next_node(self) -> int:
+        book = next(self._books)
+        if book >= 1 << TRADE_ID_BOOK_BITS:
+            raise ValueError(f"at most {1 << TRADE_ID_BOOK_BITS} books per shard")
+        return (self.shard_id << TRADE_ID_BOOK_BITS) | book
+
+
+class BookWorker:
+    """Single thread that owns one OrderBook; every book operation goes through its inbox."""
+
+    def __init__(self, book: OrderBook):
+        self.book = book
+        self.inbox: SimpleQueue = SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name=f"book-{book.symbol}", daemon=True)
+        self.thread.start()
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the book thread and wait for its result."""
+        if threading.current_thread() is self.thread:
+            return fn(*args)  # Re-entrant call from a callback on this book
+        future = Future()
+        self.inbox.put((fn, args, future))
+        return future.result()
+
+    def _run(self):
+        inbox = self.inbox
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            fn, args, future = item
+            try:
+                future.set_result(fn(*args))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+    def stop(self):
+        self.inbox.put(None)
+        self.thread.join()
+
 
 class MatchingEngine:
     """Main matching engine managing multiple order books."""
 
-    def __init__(self):
+    def __init__(self, threaded: bool = False, enable_trade_history: bool = True,
+                 shard_id: int = 0):
         self.order_books: Dict[str, OrderBook] = {}
-        self.trades: List[Trade] = []
+        # Bounded ledger of recent trades; disable when trades are streamed elsewhere
+        self.enable_trade_history = enable_trade_history
+        self.trades: deque = deque(maxlen=TRADE_HISTORY_SIZE)
         self.trade_callbacks = []
-
-    def add_symbol(self, symbol: str):
+        # Callbacks run on a background thread, started with the first registration
+        self._cb_queue: SimpleQueue = SimpleQueue()
+        self._cb_thread: Optional[threading.Thread] = None
+        # With threaded=True each symbol gets a BookWorker as its sole mutator
+        self.threaded = threaded
+        self.workers: Dict[str, BookWorker] = {}
+        self._uid_interner = Interner()
+        # Trade ids are unique across this engine's books and, by shard_id, across engines
+        self._trade_nodes = TradeIdNodes(shard_id)
+
+    def add_symbol(self, symbol: str, tick_size: Decimal = DEFAULT_TICK_SIZE,
+                   lot_size: Decimal = DEFAULT_LOT_SIZE):
         """Add new trading pair."""
         if symbol not in self.order_books:
-            self.order_books[symbol] = OrderBook(symbol)
+            book = self.order_books[symbol] = OrderBook(symbol, tick_size, lot_size,
+                                                        self._uid_interner,
+                                                        self._trade_nodes.next_node())
+            if self.threaded:
+                self.workers[symbol] = BookWorker(book)
+
+    def _call(self, symbol: str, fn, *args):
+        worker = self.workers.get(symbol)
+        if worker is None:
+            return fn(*args)
+        return worker.call(fn, *args)
 
     def place_order(self, order: Order) -> Tuple[bool, List[Trade]]:
         """Place an order."""
-        if order.symbol not in self.order_books:
+        book = self.order_books.get(order.symbol)
+        if book is None:
+            return False, []
+
+        # Backpressure: refuse new flow while trade consumers are too far behind
+        if self._cb_thread is not None and self._cb_queue.qsize() > CALLBACK_HIGH_WATERMARK:
+            order.status = OrderStatus.REJECTED
             return False, []
 
-        trades = self.order_books[order.symbol].add_order(order)
+        return True, self._call(order.symbol, self._place, book, order)
 
-        # Store trades and trigger callbacks
-        self.trades.extend(trades)
-        for callback in self.trade_callbacks:
-            for trade in trades:
-                callback(trade)
+    def _place(self, book: OrderBook, order: Order) -> List[Trade]:
+        trades = book.add_order(order)
 
-        return True, trades
+        # Store trades and hand them to the callback thread
+        if trades:
+            if self.enable_trade_history:
+                self.trades.extend(trades)
+            if self._cb_thread is not None:
+                self._cb_queue.put(trades)
+
+        return trades
 
     def cancel_order(self, symbol: str, order_id: str) -> bool:
         """Cancel an order."""
-        if symbol not in self.order_books:
+        book = self.order_books.get(symbol)
+        if book is None:
             return False
 
-        return self.order_books[symbol].cancel_order(order_id)
+        return self._call(symbol, book.cancel_order, order_id)
 
     def get_order_book(self, symbol: str, depth: int = 20) -> Optional[Dict]:
         """Get order book for symbol."""
-        if symbol not in self.order_books:
+        book = self.order_books.get(symbol)
+        if book is None:
             return None
 
-        return self.order_books[symbol].get_order_book_snapshot(depth)
+        return self._call(symbol, book.get_order_book_snapshot, depth)
+
+    def release_trades(self, trades: List[Trade]):
+        """
+        Hand trades back for reuse once the caller and every callback are done with them.
+        Ignored while trade history is enabled, since the ledger still references them.
+        """
+        if self.enable_trade_history or not trades:
+            return
+        book = self.order_books.get(trades[0].symbol)
+        if book is not None:
+            book.release_trades(trades)
 
     def register_trade_callback(self, callback):
-        """Register callback for trade events."""
-        self.trade_callbacks.append(callback)
\ No newline at end of file
+        """
+        Register callback for trade events, called once per order with its List[Trade].
+        Callbacks run on a background thread so slow consumers never stall matching.
+        """
+        self.trade_callbacks.append(callback)
+        if self._cb_thread is None:
+            self._cb_thread = threading.Thread(target=self._run_callbacks,
+                                               name="trade-callbacks", daemon=True)
+            self._cb_thread.start()
+
+    def _run_callbacks(self):
+        queue = self._cb_queue
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            for callback in self.trade_callbacks:
+                try:
+                    callback(item)
+                except Exception:
+                    logger.exception("Trade callback failed")
+
+    def drain_callbacks(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every trade queued so far has been delivered to the callbacks."""
+        if self._cb_thread is None:
+            return True
+        done = threading.Event()
+        self._cb_queue.put(done)
+        return done.wait(timeout)
+
+    def shutdown(self):
+        """Stop book worker threads, then the callback thread once it has drained."""
+        for worker in self.workers.values():
+            worker.stop()
+        self.workers.clear()
+        if self._cb_thread is not None:
+            self._cb_queue.put(None)
+            self._cb_thread.join()
+            self._cb_thread = None
@@ -3,40 +3,257 @@ Enhanced Matching Engine with Advanced Order Types Support
 Integrates stop-loss, trailing stops, iceberg orders, and market making
 """
 
-import heapq
+from array import array
 from typing import Dict, List, Tuple, Optional
 from decimal import Decimal
 from dataclasses import dataclass, field
 from datetime import datetime
 from collections import defaultdict
+from itertools import islice
 import logging
 import sys
 import os
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sortedcontainers import SortedDict
+
 from order_types.advanced_orders import (
     AdvancedOrderManager, StopLossOrder, TrailingStopOrder,
     IcebergOrder, TakeProfitOrder, OCOOrder
 )
 from market_making.market_maker import MarketMaker, MarketMakerConfig, MarketMakingStrategy
+from matching_engine._heap_kernel import match_heap, heap_push
 
 logger = logging.getLogger(__name__)
 
+# Fixed-point ticks: book columns and volume are int64, floats exist only at the API boundary
+PRICE_TICK = 1e-8
+QTY_TICK = 1e-8
+PRICE_SCALE = round(1 / PRICE_TICK)  # Dividing by the scale round-trips floats exactly
+QTY_SCALE = round(1 / QTY_TICK)
+
+PRICE_HISTORY_SIZE = 1000
+TRADE_HISTORY_SIZE = 1_000_000
+
 
-@dataclass(order=True)
+@dataclass(slots=True)
 class EnhancedOrder:
-    """Enhanced order with priority queue ordering and advanced features"""
-    price: float = field(compare=True)
-    timestamp: int = field(compare=True)
-    order_id: int = field(compare=False)
-    side: str = field(compare=False)
-    quantity: float = field(compare=False)
-    user_id: int = field(compare=False)
-    order_type: str = field(compare=False, default="limit")
-    parent_order_id: Optional[str] = field(compare=False, default=None)  # For iceberg slices
-    metadata: Dict = field(compare=False, default_factory=dict)
+    """Enhanced order with advanced features; priority lives in the BookSide columns"""
+    price: float
+    timestamp: int
+    order_id: int
+    side: str
+    quantity: float
+    user_id: int
+    order_type: str = "limit"
+    parent_order_id: Optional[str] = None  # For iceberg slices
+    metadata: Dict = field(default_factory=dict)
+    slot: int = -1  # Column index while resting in a BookSide
+
+
+class BookSide:
+    """
+    One side of the book in SoA form: per-slot columns plus a binary heap of slot
+    indices ordered by (key, timestamp). Keys are price ticks, negated for bids so
+    both sides are min-heaps, and qtys are lots. Cancelled slots keep qty 0 until
+    they surface at the top. levels aggregates live lots per key, best first, and
+    best caches its first key so top-of-book is a plain attribute read.
+    """
+
+    __slots__ = ('keys', 'ts', 'qtys', 'orders', 'heap', 'size', 'free', 'cancelled',
+                 'levels', 'volume', 'best')
+
+    def __init__(self):
+        self.keys = array('q')
+        self.ts = array('q')
+        self.qtys = array('q')
+        self.orders: List[Optional[EnhancedOrder]] = []
+        self.heap = array('q')
+        self.size = 0
+        self.free: List[int] = []  # Slots whose order has left the heap
+        self.cancelled = 0  # Tombstones still in the heap
+        self.levels = SortedDict()  # key -> aggregated lots
+        self.volume = 0  # Live lots across all levels
+        self.best: Optional[int] = None  # Best live key, None when empty
+
+    def __len__(self) -> int:
+        return self.size - self.cancelled
+
+    def push(self, key: int, lots: int, order: EnhancedOrder):
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = key
+            self.ts[slot] = order.timestamp
+            self.qtys[slot] = lots
+            self.orders[slot] = order
+        else:
+            slot = len(self.orders)
+            self.keys.append(key)
+            self.ts.append(order.timestamp)
+            self.qtys.append(lots)
+            self.orders.append(order)
+        order.slot = slot
+        self.levels[key] = self.levels.get(key, 0) + lots
+        self.volume += lots
+        if self.best is None or key < self.best:
+            self.best = key
+        if self.size == len(self.heap):
+            self.heap.append(slot)
+        else:
+            self.heap[self.size] = slot
+        self.size = heap_push(self.heap, self.size, self.keys, self.ts)
+
+    def take(self, key: int, lots: int):
+        """Remove lots from the key's level, dropping it once empty."""
+        left = self.levels[key] - lots
+        if left:
+            self.levels[key] = left
+        else:
+            del self.levels[key]
+            if key == self.best:
+                self.best = self.levels.keys()[0] if self.levels else None
+        self.volume -= lots
+
+    def release(self, slot: int):
+        self.orders[slot] = None
+        self.free.append(slot)
+
+    def cancel(self, order: EnhancedOrder):
+        """Tombstone order's slot; rebuild the heap once tombstones dominate."""
+        self.take(self.keys[order.slot], self.qtys[order.slot])
+        self.qtys[order.slot] = 0
+        self.cancelled += 1
+        if self.cancelled * 2 > self.size:
+            keys, ts, qtys = self.keys, self.ts, self.qtys
+            live = []
+            for slot in self.heap[:self.size]:
+                if qtys[slot] > 0:
+                    live.append(slot)
+                else:
+                    self.release(slot)
+            live.sort(key=lambda slot: (keys[slot], ts[slot]))  # A sorted array is a heap
+            self.heap = array('q', live)
+            self.size = len(live)
+            self.cancelled = 0
+
+
+class PriceRing:
+    """Fixed-size ring of recent trade prices; numpy-backed when available."""
+
+    __slots__ = ('buf', 'head', 'count')
+
+    def __init__(self, size: int = PRICE_HISTORY_SIZE):
+        self.buf = np.zeros(size) if np is not None else array('d', bytes(8 * size))
+        self.head = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def extend(self, prices):
+        """Append prices (same container type as buf) with at most two slice writes."""
+        buf, size = self.buf, len(self.buf)
+        n = len(prices)
+        if n >= size:
+            buf[:] = prices[n - size:]
+            self.head = 0
+        else:
+            head = self.head
+            first = min(n, size - head)
+            buf[head:head + first] = prices[:first]
+            buf[:n - first] = prices[first:]
+            self.head = (head + n) % size
+        self.count = min(self.count + n, size)
+
+    def recent(self, n: int) -> List[float]:
+        """Up to n most recent prices, oldest first."""
+        n = min(n, self.count)
+        buf, head = self.buf, self.head
+        if n <= head:
+            return buf[head - n:head].tolist()
+        tail = buf[len(buf) - (n - head):]
+        if np is not None:
+            return np.concatenate((tail, buf[:head])).tolist()
+        return (tail + buf[:head]).tolist()
+
+
+class TradeLog:
+    """
+    Columnar ring of the last `size` trades: one int64 array per field, grown on
+    demand up to size and then overwritten oldest first. Dicts are only built on read.
+    """
+
+    __slots__ = ('size', 'head', 'total', 'ts', 'price_ticks', 'lots', 'buyer_ids',
+                 'seller_ids', 'buyer_orders', 'seller_orders')
+
+    def __init__(self, size: int = TRADE_HISTORY_SIZE):
+        self.size = size
+        self.head = 0  # Oldest row once the columns are full
+        self.total = 0  # Trades ever recorded
+        self.ts = array('q')
+        self.price_ticks = array('q')
+        self.lots = array('q')
+        self.buyer_ids = array('q')
+        self.seller_ids = array('q')
+        self.buyer_orders = array('q')
+        self.seller_orders = array('q')
+
+    def __len__(self) -> int:
+        return self.total
+
+    def _columns(self):
+        return (self.ts, self.price_ticks, self.lots, self.buyer_ids, self.seller_ids,
+                self.buyer_orders, self.seller_orders)
+
+    def extend(self, *rows):
+        """Append equal-length int64 arrays, one per column in _columns order."""
+        n = len(rows[0])
+        self.total += n
+        size, head = self.size, self.head
+        grow = min(n, size - len(self.ts))
+        m = n - grow
+        for col, values in zip(self._columns(), rows):
+            if grow:
+                col.extend(values[:grow])
+            if not m:
+                continue
+            if m >= size:
+                col[:] = values[n - size:]
+            else:
+                first = min(m, size - head)
+                col[head:head + first] = values[grow:grow + first]
+                col[:m - first] = values[grow + first:]
+        if m:
+            self.head = 0 if m >= size else (head + m) % size
+
+    def recent(self, n: int) -> List[dict]:
+        """Up to n most recent trades as dicts, oldest first."""
+        length = len(self.ts)
+        n = min(n, length)
+        start = self.head - n
+        ts, prices, lots = self.ts, self.price_ticks, self.lots
+        buyers, sellers = self.buyer_ids, self.seller_ids
+        buyer_orders, seller_orders = self.buyer_orders, self.seller_orders
+        trades = []
+        for i in range(start, start + n):
+            i %= length
+            trades.append({
+                "buyer_id": buyers[i],
+                "seller_id": sellers[i],
+                "price": prices[i] / PRICE_SCALE,
+                "quantity": lots[i] / QTY_SCALE,
+                "timestamp": ts[i],
+                "buyer_order": buyer_orders[i],
+                "seller_order": seller_orders[i]
+            })
+        return trades
 
 
 class EnhancedMatchingEngine:
@@ -44,13 +261,17 @@ class EnhancedMatchingEngine:
 
     def __init__(self, symbol: str = "DEC/USD"):
         self.symbol = symbol
-        self.buy_orders = []  # Max heap (negative prices)
-        self.sell_orders = []  # Min heap
+        self.buy_orders = BookSide()  # Keyed by -price ticks
+        self.sell_orders = BookSide()  # Keyed by price ticks
+        # Kernel output buffers, grown to the opposite side's heap size
+        self._out_slots = array('q', bytes(8 * 64))
+        self._out_qtys = array('q', bytes(8 * 64))
         self.order_id_counter = 1
         self.timestamp_counter = 1
-        self.trades = []
+        self.trade_log = TradeLog()
         self.last_price = None
         self.current_price = None
+        self._triggers_dirty = False  # Advanced orders added since the last trigger check
 
         # Advanced order managers
         self.advanced_orders = AdvancedOrderManager()
@@ -59,10 +280,11 @@ class EnhancedMatchingEngine:
         # Order tracking
         self.active_orders: Dict[int, EnhancedOrder] = {}
         self.order_map: Dict[str, int] = {}  # External ID -> Internal ID
+        self.order_map_inv: Dict[int, str] = {}  # Internal ID -> External ID
 
         # Market data
-        self.price_history = []
-        self.volume_24h = Decimal(0)
+        self.price_history = PriceRing()
+        self.volume_24h = 0  # Lots
         self.high_24h = None
         self.low_24h = None
 
@@ -99,6 +321,8 @@ class EnhancedMatchingEngine:
                 limit_price=Decimal(price) if price else None
             )
             self.advanced_orders.add_stop_loss(stop_order)
+            self._bind_external_id(external_order_id, order_id)
+            self._triggers_dirty = True
             logger.info(f"Stop-loss order placed: {external_order_id}")
             return order_id, [], external_order_id
 
@@ -113,6 +337,8 @@ class EnhancedMatchingEngine:
                 trail_percent=Decimal(trail_percent) if trail_percent else None
             )
             self.advanced_orders.add_trailing_stop(trailing_order)
+            self._bind_external_id(external_order_id, order_id)
+            self._triggers_dirty = True
             logger.info(f"Trailing stop order placed: {external_order_id}")
             return order_id, [], external_order_id
 
@@ -127,6 +353,7 @@ class EnhancedMatchingEngine:
                 price=Decimal(price)
             )
             self.advanced_orders.add_iceberg(iceberg_order)
+            self._bind_external_id(external_order_id, order_id)
 
             # Place the first visible slice
             slice_info = self.advanced_orders.get_iceberg_slice(external_order_id)
@@ -151,6 +378,8 @@ class EnhancedMatchingEngine:
                 limit_price=Decimal(price) if price else None
             )
             self.advanced_orders.add_take_profit(tp_order)
+            self._bind_external_id(external_order_id, order_id)
+            self._triggers_dirty = True
             logger.info(f"Take-profit order placed: {external_order_id}")
             return order_id, [], external_order_id
 
@@ -161,6 +390,11 @@ class EnhancedMatchingEngine:
                 order_id, timestamp, metadata=metadata
             ) + (external_order_id,)
 
+    def _bind_external_id(self, external_id: str, order_id: int):
+        """Map an advanced order's external ID to its internal ID, both ways"""
+        self.order_map[external_id] = order_id
+        self.order_map_inv[order_id] = external_id
+
     def _place_limit_order(self, side: str, price: float, quantity: float,
                           user_id: int, order_id: int, timestamp: int,
                           parent_order_id: Optional[str] = None,
@@ -179,116 +413,119 @@ class EnhancedMatchingEngine:
         )
 
         trades = []
+        prev_price = self.current_price
 
+        # Convert to ticks once (float or Decimal in); everything below works in int64
+        price_ticks = round(price * PRICE_SCALE)
+        lots = round(quantity * QTY_SCALE)
         if side == "buy":
-            # Try to match with sell orders
-            while self.sell_orders and quantity > 0:
-                best_sell = self.sell_orders[0]
-
-                if price >= best_sell.price:
-                    # Match found
-                    trade_quantity = min(quantity, best_sell.quantity)
-                    trade_price = best_sell.price
-
-                    trades.append({
-                        "buyer_id": user_id,
-                        "seller_id": best_sell.user_id,
-                        "price": trade_price,
-                        "quantity": trade_quantity,
-                        "timestamp": timestamp,
-                        "buyer_order": order_id,
-                        "seller_order": best_sell.order_id
-                    })
-
-                    quantity -= trade_quantity
-                    best_sell.quantity -= trade_quantity
-                    self.last_price = trade_price
-                    self.current_price = trade_price
-
-                    # Handle iceberg order refill
-                    if best_sell.parent_order_id:
-                        self._handle_iceberg_execution(best_sell.parent_order_id, trade_quantity)
-
-                    if best_sell.quantity == 0:
-                        heapq.heappop(self.sell_orders)
-                        del self.active_orders[best_sell.order_id]
-                else:
-                    break
-
-            # Add remaining quantity to buy orders
-            if quantity > 0:
-                order.quantity = quantity
-                heapq.heappush(self.buy_orders, EnhancedOrder(
-                    price=-price,  # Negative for max heap
-                    timestamp=timestamp,
-                    order_id=order_id,
-                    side=side,
-                    quantity=quantity,
-                    user_id=user_id,
-                    parent_order_id=parent_order_id,
-                    metadata=metadata or {}
-                ))
-                self.active_orders[order_id] = order
-
-        else:  # sell
-            # Try to match with buy orders
-            while self.buy_orders and quantity > 0:
-                best_buy = self.buy_orders[0]
-                best_buy_price = -best_buy.price  # Convert back from negative
-
-                if price <= best_buy_price:
-                    # Match found
-                    trade_quantity = min(quantity, best_buy.quantity)
-                    trade_price = best_buy_price
-
-                    trades.append({
-                        "buyer_id": best_buy.user_id,
-                        "seller_id": user_id,
-                        "price": trade_price,
-                        "quantity": trade_quantity,
-                        "timestamp": timestamp,
-                        "buyer_order": best_buy.order_id,
-                        "seller_order": order_id
-                    })
-
-                    quantity -= trade_quantity
-                    best_buy.quantity -= trade_quantity
-                    self.last_price = trade_price
-                    self.current_price = trade_price
-
-                    # Handle iceberg order refill
-                    if best_buy.parent_order_id:
-                        self._handle_iceberg_execution(best_buy.parent_order_id, trade_quantity)
-
-                    if best_buy.quantity == 0:
-                        heapq.heappop(self.buy_orders)
-                        del self.active_orders[best_buy.order_id]
-                else:
-                    break
+            book, opposite, limit_key = self.buy_orders, self.sell_orders, price_ticks
+        else:
+            book, opposite, limit_key = self.sell_orders, self.buy_orders, -price_ticks
+
+        # Kernel walks the opposite heap; Python only turns its fills into trade dicts.
+        # An order that doesn't reach the opposite best can't fill, so skip the call.
+        count = 0
+        if opposite.best is not None and opposite.best <= limit_key:
+            if opposite.size >= len(self._out_slots):
+                self._out_slots = array('q', bytes(8 * (opposite.size + 1)))
+                self._out_qtys = array('q', bytes(8 * (opposite.size + 1)))
+            count, lots, opposite.size = match_heap(
+                opposite.heap, opposite.size, opposite.keys, opposite.ts, opposite.qtys,
+                limit_key, lots, self._out_slots, self._out_qtys
+            )
 
-            # Add remaining quantity to sell orders
-            if quantity > 0:
-                order.quantity = quantity
-                heapq.heappush(self.sell_orders, order)
-                self.active_orders[order_id] = order
+        iceberg_fills = []
+        # Per-order fill columns; the taker side is filled in once matching is done
+        fill_ticks = array('q')
+        fill_lots_col = array('q')
+        maker_ids = array('q')
+        maker_orders = array('q')
+        volume = 0
+        # Buys fill at ask keys (price ticks), sells at bid keys (-price ticks)
+        tick_sign = 1 if side == "buy" else -1
+        out_slots, out_qtys = self._out_slots, self._out_qtys
+        for k in range(count):
+            slot = out_slots[k]
+            fill_lots = out_qtys[k]
+            maker = opposite.orders[slot]
+            if fill_lots == 0:
+                # Dropped tombstone
+                opposite.cancelled -= 1
+                opposite.release(slot)
+                continue
+
+            trade_price = maker.price
+            if side == "buy":
+                buyer_id, seller_id, buyer_order, seller_order = user_id, maker.user_id, order_id, maker.order_id
+            else:
+                buyer_id, seller_id, buyer_order, seller_order = maker.user_id, user_id, maker.order_id, order_id
+            trades.append({
+                "buyer_id": buyer_id,
+                "seller_id": seller_id,
+                "price": trade_price,
+                "quantity": fill_lots / QTY_SCALE,
+                "timestamp": timestamp,
+                "buyer_order": buyer_order,
+                "seller_order": seller_order
+            })
+            self.last_price = trade_price
+            self.current_price = trade_price
+            key = opposite.keys[slot]
+            opposite.take(key, fill_lots)
+            fill_ticks.append(tick_sign * key)
+            fill_lots_col.append(fill_lots)
+            maker_ids.append(maker.user_id)
+            maker_orders.append(maker.order_id)
+            volume += fill_lots
+
+            maker.quantity = opposite.qtys[slot] / QTY_SCALE
+            if maker.quantity == 0:
+                del self.active_orders[maker.order_id]
+                opposite.release(slot)
+
+            if maker.parent_order_id:
+                iceberg_fills.append((maker.parent_order_id, fill_lots))
+
+        # Add remaining quantity to the book
+        if lots > 0:
+            order.quantity = lots / QTY_SCALE
+            book.push(-price_ticks if side == "buy" else price_ticks, lots, order)
+            self.active_orders[order_id] = order
+
+        # Handle iceberg order refills once this order's matching is done
+        for parent_order_id, fill_lots in iceberg_fills:
+            self._handle_iceberg_execution(parent_order_id, fill_lots)
 
         # Store trades
-        self.trades.extend(trades)
+        if trades:
+            n = len(trades)
+            taker_ids = array('q', [user_id]) * n
+            taker_orders = array('q', [order_id]) * n
+            if side == "buy":
+                self.trade_log.extend(array('q', [timestamp]) * n, fill_ticks, fill_lots_col,
+                                      taker_ids, maker_ids, taker_orders, maker_orders)
+            else:
+                self.trade_log.extend(array('q', [timestamp]) * n, fill_ticks, fill_lots_col,
+                                      maker_ids, taker_ids, maker_orders, taker_orders)
 
         # Update market data
-        self._update_market_data(trades)
+        if volume:
+            self._update_market_data(fill_ticks, volume)
 
-        # Check for triggered advanced orders
-        if self.current_price:
+        # Check for triggered advanced orders once, at the final price, and only when
+        # that price moved or new advanced orders could fire at the unchanged one
+        if self.current_price and (self.current_price != prev_price or self._triggers_dirty):
+            self._triggers_dirty = False
             self._check_triggered_orders(self.current_price)
 
         return order_id, trades
 
-    def _handle_iceberg_execution(self, parent_order_id: str, executed_qty: float):
+    def _handle_iceberg_execution(self, parent_order_id: str, executed_lots: int):
         """Handle iceberg order execution and place next slice"""
         next_slice = self.advanced_orders.handle_iceberg_execution(
             parent_order_id,
-            Decimal(executed_qty)
+            Decimal(executed_lots) / QTY_SCALE  # Exact, unlike Decimal(float)
         )
 
         if next_slice:
@@ -305,7 +542,7 @@ class EnhancedMatchingEngine:
 
     def _check_triggered_orders(self, current_price: float):
         """Check and execute triggered advanced orders"""
-        triggered = self.advanced_orders.update_price(self.symbol, Decimal(current_price))
+        triggered = self.advanced_orders.update_price(self.symbol, current_price)
 
         for trigger_info in triggered:
             order = trigger_info["order"]
@@ -326,46 +563,44 @@ class EnhancedMatchingEngine:
                     metadata={"triggered_from": order.order_id, "trigger_type": trigger_type}
                 )
 
-    def _update_market_data(self, trades: List[Dict]):
-        """Update market data from trades"""
-        for trade in trades:
-            price = trade["price"]
-            volume = trade["quantity"]
+    def _update_market_data(self, price_ticks: array, volume: int):
+        """Update market data from one order's fill prices (ticks) and lots"""
+        self.volume_24h += volume
 
-            # Update price history
-            self.price_history.append(price)
-            if len(self.price_history) > 1000:
-                self.price_history.pop(0)
+        if np is not None:
+            ticks = np.frombuffer(price_ticks, dtype=np.int64)
+            high, low = int(ticks.max()), int(ticks.min())
+            prices = ticks / PRICE_SCALE
+        else:
+            high, low = max(price_ticks), min(price_ticks)
+            prices = array('d', [t / PRICE_SCALE for t in price_ticks])
 
-            # Update 24h stats
-            self.volume_24h += Decimal(volume)
+        # Update price history
+        self.price_history.extend(prices)
 
-            if self.high_24h is None or price > self.high_24h:
-                self.high_24h = price
-            if self.low_24h is None or price < self.low_24h:
-                self.low_24h = price
+        # Update 24h stats
+        high, low = high / PRICE_SCALE, low / PRICE_SCALE
+        if self.high_24h is None or high > self.high_24h:
+            self.high_24h = high
+        if self.low_24h is None or low < self.low_24h:
+            self.low_24h = low
 
     def cancel_order(self, order_id: int) -> bool:
         """Cancel an order"""
         # Check regular orders
         if order_id in self.active_orders:
-            order = self.active_orders[order_id]
-
-            # Remove from appropriate book
-            if order.side == "buy":
-                self.buy_orders = [o for o in self.buy_orders if o.order_id != order_id]
-                heapq.heapify(self.buy_orders)
-            else:
-                self.sell_orders = [o for o in self.sell_orders if o.order_id != order_id]
-                heapq.heapify(self.sell_orders)
+            order = self.active_orders.pop(order_id)
 
-            del self.active_orders[order_id]
+            # Leave a tombstone in the heap; rebuild only once tombstones dominate
+            book = self.buy_orders if order.side == "buy" else self.sell_orders
+            book.cancel(order)
             return True
 
         # Check advanced orders
-        for external_id, internal_id in self.order_map.items():
-            if internal_id == order_id:
-                return self.advanced_orders.cancel_order(external_id)
+        external_id = self.order_map_inv.pop(order_id, None)
+        if external_id is not None:
+            del self.order_map[external_id]
+            return self.advanced_orders.cancel_order(external_id)
 
         return False
 
@@ -395,8 +630,10 @@ class EnhancedMatchingEngine:
 
     def get_market_data(self) -> Dict:
         """Get current market data for market makers"""
-        best_bid = -self.buy_orders[0].price if self.buy_orders else None
-        best_ask = self.sell_orders[0].price if self.sell_orders else None
+        best_bid_key = self.buy_orders.best
+        best_bid = -best_bid_key / PRICE_SCALE if best_bid_key is not None else None
+        best_ask_key = self.sell_orders.best
+        best_ask = best_ask_key / PRICE_SCALE if best_ask_key is not None else None
 
         mid_price = None
         if best_bid and best_ask:
@@ -404,9 +641,9 @@ class EnhancedMatchingEngine:
         elif self.last_price:
             mid_price = self.last_price
 
-        # Calculate order book volumes
-        bid_volume = sum(o.quantity for o in self.buy_orders)
-        ask_volume = sum(o.quantity for o in self.sell_orders)
+        # Order book volumes are kept incrementally per side
+        bid_volume = self.buy_orders.volume / QTY_SCALE
+        ask_volume = self.sell_orders.volume / QTY_SCALE
 
         return {
             "symbol": self.symbol,
@@ -416,39 +653,20 @@ class EnhancedMatchingEngine:
             "bid_volume": bid_volume,
             "ask_volume": ask_volume,
             "last_price": self.last_price,
-            "volume_24h": float(self.volume_24h),
+            "volume_24h": self.volume_24h / QTY_SCALE,
             "high_24h": self.high_24h,
             "low_24h": self.low_24h,
-            "recent_prices": self.price_history[-100:] if self.price_history else [],
-            "recent_trades": self.trades[-100:] if self.trades else []
+            "recent_prices": self.price_history.recent(100),
+            "recent_trades": self.trade_log.recent(100)
         }
 
     def get_order_book(self, depth: int = 10) -> Dict:
         """Get order book with specified depth"""
-        bids = []
-        asks = []
-
-        # Aggregate buy orders
-        buy_levels = {}
-        for order in sorted(self.buy_orders, key=lambda x: -x.price)[:depth*2]:
-            price = -order.price
-            if price not in buy_levels:
-                buy_levels[price] = 0
-            buy_levels[price] += order.quantity
-
-        # Aggregate sell orders
-        sell_levels = {}
-        for order in sorted(self.sell_orders, key=lambda x: x.price)[:depth*2]:
-            if order.price not in sell_levels:
-                sell_levels[order.price] = 0
-            sell_levels[order.price] += order.quantity
-
-        # Format for output
-        for price in sorted(buy_levels.keys(), reverse=True)[:depth]:
-            bids.append({"price": price, "quantity": buy_levels[price]})
-
-        for price in sorted(sell_levels.keys())[:depth]:
-            asks.append({"price": price, "quantity": sell_levels[price]})
+        # Levels are already aggregated and sorted best first (bid keys are -price)
+        bids = [{"price": -key / PRICE_SCALE, "quantity": lots / QTY_SCALE}
+                for key, lots in islice(self.buy_orders.levels.items(), depth)]
+        asks = [{"price": key / PRICE_SCALE, "quantity": lots / QTY_SCALE}
+                for key, lots in islice(self.sell_orders.levels.items(), depth)]
 
         return {
             "symbol": self.symbol,
@@ -465,9 +683,9 @@ class EnhancedMatchingEngine:
             "active_orders": len(self.active_orders),
             "buy_orders": len(self.buy_orders),
             "sell_orders": len(self.sell_orders),
-            "total_trades": len(self.trades),
+            "total_trades": len(self.trade_log),
             "last_price": self.last_price,
-            "volume_24h": float(self.volume_24h),
+            "volume_24h": self.volume_24h / QTY_SCALE,
             "high_24h": self.high_24h,
             "low_24h": self.low_24h,
             "advanced_orders": {
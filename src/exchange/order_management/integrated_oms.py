@@ -238,33 +238,11 @@ class IntegratedOMS:
             self.total_trades += 1
             self.total_volume += Decimal(str(trade['quantity']))
 
-            # Persist trade to database if available
-            if self.db_manager:
-                try:
-                    trade_id = await self.db_manager.insert_trade({
-                        'symbol': order_info['symbol'],
-                        'buyer_order_id': order_info.get('db_order_id'),
-                        'seller_order_id': None,  # Would need matching order info
-                        'buyer_user_id': order_info['user_id'] if order_info['side'] == 'buy' else None,
-                        'seller_user_id': order_info['user_id'] if order_info['side'] == 'sell' else None,
-                        'price': trade['price'],
-                        'quantity': trade['quantity'],
-                        'maker_side': trade.get('maker_side', 'buy')
-                    })
-                    trade['db_trade_id'] = trade_id
-
-                    # Update order status in database
-                    if order_info.get('db_order_id'):
-                        status = 'filled' if order_info['filled_quantity'] >= order_info['quantity'] else 'partially_filled'
-                        await self.db_manager.update_order_status(
-                            order_info['db_order_id'],
-                            status,
-                            order_info['filled_quantity'],
-                            Decimal(str(trade['price']))
-                        )
-                except Exception as e:
-                    print(f"Failed to persist trade to database: {e}")
+        # Persist the whole burst of fills to database if available
+        if self.db_manager:
+            await self.persist_trades(order_info, trades)
 
+        for trade in trades:
             # Settlement for DEC pairs
             if order_info['symbol'].startswith("DEC/"):
                 await self.settle_dec_trade(order_info, trade)
@@ -279,6 +257,37 @@ class IntegratedOMS:
         else:
             order_info['status'] = 'PARTIALLY_FILLED'
 
+    async def persist_trades(self, order_info: dict, trades: List[dict]):
+        """Write a batch of fills and the resulting order status in one pass"""
+        try:
+            trade_ids = await self.db_manager.insert_trades_bulk([
+                {
+                    'symbol': order_info['symbol'],
+                    'buyer_order_id': order_info.get('db_order_id'),
+                    'seller_order_id': None,  # Would need matching order info
+                    'buyer_user_id': order_info['user_id'] if order_info['side'] == 'buy' else None,
+                    'seller_user_id': order_info['user_id'] if order_info['side'] == 'sell' else None,
+                    'price': trade['price'],
+                    'quantity': trade['quantity'],
+                    'maker_side': trade.get('maker_side', 'buy')
+                }
+                for trade in trades
+            ])
+            for trade, trade_id in zip(trades, trade_ids):
+                trade['db_trade_id'] = trade_id
+
+            # Update order status in database
+            if order_info.get('db_order_id'):
+                status = 'filled' if order_info['filled_quantity'] >= order_info['quantity'] else 'partially_filled'
+                await self.db_manager.update_order_status(
+                    order_info['db_order_id'],
+                    status,
+                    order_info['filled_quantity'],
+                    Decimal(str(trades[-1]['price']))
+                )
+        except Exception as e:
+            print(f"Failed to persist trades to database: {e}")
+
     async def settle_dec_trade(self, order_info: dict, trade: dict):
         """Settle DEC trade instantly using ledger"""
         symbol = order_info['symbol']
@@ -378,7 +387,7 @@ class IntegratedOMS:
         self.data_feed = WebSocketDataFeed(host, port)
 
         # Replace engines in data feed with our engines
-        self.data_feed.engines = self.engines
+        self.data_feed.set_engines(self.engines)
 
         # Start server
         await self.data_feed.start()
@@ -12,7 +12,9 @@ from datetime import datetime
 import asyncio
 import logging
 
-from ..matching_engine.engine import Order, OrderType, OrderStatus, TimeInForce, MatchingEngine
+from ..matching_engine.engine import (
+    Order, OrderType, OrderStatus, TimeInForce, MatchingEngine, ns_to_datetime
+)
 
 
 logger = logging.getLogger(__name__)
@@ -363,18 +365,18 @@ class OrderManagementSystem:
             "remaining_quantity": str(order.remaining_quantity),
             "status": order.status.value,
             "time_in_force": order.time_in_force.value,
-            "created_at": order.created_at.isoformat(),
-            "updated_at": order.updated_at.isoformat()
+            "created_at": ns_to_datetime(order.created_at).isoformat(),
+            "updated_at": ns_to_datetime(order.updated_at).isoformat()
         }
 
     def _trade_to_dict(self, trade) -> Dict:
         """Convert trade to dictionary."""
         return {
-            "id": trade.id,
+            "id": str(trade.id),
             "symbol": trade.symbol,
             "price": str(trade.price),
             "quantity": str(trade.quantity),
             "buyer_order_id": trade.buyer_order_id,
             "seller_order_id": trade.seller_order_id,
-            "timestamp": trade.timestamp.isoformat()
+            "timestamp": ns_to_datetime(trade.timestamp).isoformat()
         }
\ No newline at end of file
@@ -4,10 +4,13 @@ Implements stop-loss, trailing stops, and iceberg orders
 """
 
 from dataclasses import dataclass
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Tuple, Union
 from decimal import Decimal
 from enum import Enum
 from datetime import datetime
+from collections import deque
+from itertools import count
+import heapq
 import logging
 
 logger = logging.getLogger(__name__)
@@ -261,11 +264,25 @@ class AdvancedOrderManager:
         self.iceberg_orders: Dict[str, IcebergOrder] = {}
         self.take_profit_orders: Dict[str, TakeProfitOrder] = {}
         self.oco_orders: Dict[str, OCOOrder] = {}
-        self.price_history: Dict[str, List[Decimal]] = {}  # symbol -> recent prices
+        self.price_history: Dict[str, deque] = {}  # symbol -> last 100 prices
+        # Trigger ladders per symbol: (rising, falling) heaps of (level, seq, kind, order).
+        # Rising entries fire once price >= level; falling ones store -level and fire
+        # once price <= level. Cancelled orders stay in the heap until they surface.
+        self._ladders: Dict[str, Tuple[list, list]] = {}
+        self._trigger_seq = count()
+
+    def _add_trigger(self, kind: str, order, level: Decimal, rising: bool):
+        """Put a fixed-level order on its symbol's trigger ladder"""
+        rise, fall = self._ladders.setdefault(order.symbol, ([], []))
+        if rising:
+            heapq.heappush(rise, (level, next(self._trigger_seq), kind, order))
+        else:
+            heapq.heappush(fall, (-level, next(self._trigger_seq), kind, order))
 
     def add_stop_loss(self, order: StopLossOrder) -> str:
         """Add a stop-loss order"""
         self.stop_orders[order.order_id] = order
+        self._add_trigger("stop_loss", order, order.stop_price, rising=order.side != "sell")
         logger.info(f"Added stop-loss order {order.order_id}: {order.quantity} @ stop {order.stop_price}")
         return order.order_id
 
@@ -284,6 +301,7 @@ class AdvancedOrderManager:
     def add_take_profit(self, order: TakeProfitOrder) -> str:
         """Add a take-profit order"""
         self.take_profit_orders[order.order_id] = order
+        self._add_trigger("take_profit", order, order.target_price, rising=order.side == "sell")
         logger.info(f"Added take-profit order {order.order_id}: {order.quantity} @ target {order.target_price}")
         return order.order_id
 
@@ -293,20 +311,35 @@ class AdvancedOrderManager:
         logger.info(f"Added OCO order {order.order_id}: limit @ {order.leg1_price}, stop @ {order.leg2_stop_price}")
         return order.order_id
 
-    def update_price(self, symbol: str, price: Decimal) -> List[Dict]:
-        """Update price and check for triggered orders. Returns list of triggered orders."""
+    def update_price(self, symbol: str, price: Union[Decimal, float]) -> List[Dict]:
+        """
+        Update price and check for triggered orders. Returns list of triggered orders.
+        Stop-loss and take-profit compare price directly, so a float is fine; only the
+        trailing-stop arithmetic needs it as Decimal.
+        """
         triggered = []
 
         # Update price history
-        if symbol not in self.price_history:
-            self.price_history[symbol] = []
-        self.price_history[symbol].append(price)
-        if len(self.price_history[symbol]) > 100:  # Keep last 100 prices
-            self.price_history[symbol].pop(0)
+        history = self.price_history.get(symbol)
+        if history is None:
+            history = self.price_history[symbol] = deque(maxlen=100)  # Keep last 100 prices
+        history.append(price)
+
+        # Pop only the ladder entries the price has crossed
+        fired = []
+        ladders = self._ladders.get(symbol)
+        if ladders:
+            rise, fall = ladders
+            while rise and rise[0][0] <= price:
+                fired.append(heapq.heappop(rise))
+            while fall and -fall[0][0] >= price:
+                fired.append(heapq.heappop(fall))
+            fired.sort(key=lambda entry: entry[1])  # Placement order, as the dict scan gave
 
         # Check stop-loss orders
-        for order_id, order in list(self.stop_orders.items()):
-            if order.symbol == symbol and order.should_trigger(price):
+        for _, _, kind, order in fired:
+            if (kind == "stop_loss" and self.stop_orders.get(order.order_id) is order
+                    and order.should_trigger(price)):
                 order.triggered = True
                 order.trigger_time = datetime.utcnow()
                 triggered.append({
@@ -314,25 +347,28 @@ class AdvancedOrderManager:
                     "order": order,
                     "trigger_price": price
                 })
-                logger.info(f"Stop-loss {order_id} triggered at {price}")
+                logger.info(f"Stop-loss {order.order_id} triggered at {price}")
 
         # Check and update trailing stops
-        for order_id, order in list(self.trailing_stops.items()):
-            if order.symbol == symbol:
-                order.update_trail(price)
-                if order.should_trigger(price):
-                    order.triggered = True
-                    order.trigger_time = datetime.utcnow()
-                    triggered.append({
-                        "type": "trailing_stop",
-                        "order": order,
-                        "trigger_price": price
-                    })
-                    logger.info(f"Trailing stop {order_id} triggered at {price}")
+        if self.trailing_stops:
+            trail_price = price if isinstance(price, Decimal) else Decimal(price)
+            for order_id, order in list(self.trailing_stops.items()):
+                if order.symbol == symbol:
+                    order.update_trail(trail_price)
+                    if order.should_trigger(trail_price):
+                        order.triggered = True
+                        order.trigger_time = datetime.utcnow()
+                        triggered.append({
+                            "type": "trailing_stop",
+                            "order": order,
+                            "trigger_price": price
+                        })
+                        logger.info(f"Trailing stop {order_id} triggered at {price}")
 
         # Check take-profit orders
-        for order_id, order in list(self.take_profit_orders.items()):
-            if order.symbol == symbol and order.should_trigger(price):
+        for _, _, kind, order in fired:
+            if (kind == "take_profit" and self.take_profit_orders.get(order.order_id) is order
+                    and order.should_trigger(price)):
                 order.triggered = True
                 order.trigger_time = datetime.utcnow()
                 triggered.append({
@@ -340,7 +376,7 @@ class AdvancedOrderManager:
                     "order": order,
                     "trigger_price": price
                 })
-                logger.info(f"Take-profit {order_id} triggered at {price}")
+                logger.info(f"Take-profit {order.order_id} triggered at {price}")
 
         return triggered
 
@@ -162,9 +162,92 @@ async def test_order_persistence():
         return None
 
 
+async def test_atomic_order_lifecycle():
+    """Test placing and cancelling orders with their funds locked and released"""
+    print("\n5. ATOMIC ORDER LIFECYCLE TEST")
+    print("-" * 40)
+
+    db = await get_db_manager()
+
+    try:
+        username = f"test_atomic_{uuid4().hex[:8]}"
+        user_id = str(await db.create_user(
+            username=username,
+            email=f"{username}@test.com",
+            api_key=f"test_key_{uuid4().hex[:16]}",
+            api_secret_hash="hashed_secret"
+        ))
+        await db.create_balance(user_id, "DEC", Decimal("100"))
+        await db.create_balance(user_id, "USD", Decimal("1000"))
+
+        # Limit buy locks price * quantity of the quote currency
+        buy_id = await db.place_order_atomic({
+            "user_id": user_id, "symbol": "DEC/USD", "side": "buy",
+            "order_type": "limit", "quantity": Decimal("4"), "price": Decimal("100.50")
+        })
+        assert buy_id, "limit buy was rejected"
+        usd = await db.get_user_balance(user_id, "USD")
+        assert (usd['available'], usd['locked']) == (Decimal("598"), Decimal("402"))
+        print(f"✅ Placed {buy_id}: 402 USD locked")
+
+        # Market buy has no price, so it locks the amount it is given
+        market_id = await db.place_order_atomic({
+            "user_id": user_id, "symbol": "DEC/USD", "side": "buy",
+            "order_type": "market", "quantity": Decimal("1"), "price": None,
+            "lock_amount": Decimal("150")
+        })
+        sell_id = await db.place_order_atomic({
+            "user_id": user_id, "symbol": "DEC/USD", "side": "sell",
+            "order_type": "limit", "quantity": Decimal("30"), "price": Decimal("101")
+        })
+        assert market_id and sell_id
+
+        # Over-locking is rejected without inserting an order
+        rejected = await db.place_order_atomic({
+            "user_id": user_id, "symbol": "DEC/USD", "side": "sell",
+            "order_type": "limit", "quantity": Decimal("71"), "price": Decimal("101")
+        })
+        assert rejected is None, "order beyond the available balance was placed"
+        assert len(await db.get_user_orders(user_id)) == 3
+        print("✅ Market buy and sell locked; over-balance sell rejected")
+
+        # Each cancel releases exactly the stored lock, once
+        assert await db.cancel_order_atomic(market_id)
+        assert not await db.cancel_order_atomic(market_id), "second cancel succeeded"
+        usd = await db.get_user_balance(user_id, "USD")
+        assert (usd['available'], usd['locked']) == (Decimal("598"), Decimal("402"))
+
+        assert await db.cancel_order_atomic(buy_id)
+        assert await db.cancel_order_atomic(sell_id)
+        db.invalidate_balance(user_id, "USD")
+        db.invalidate_balance(user_id, "DEC")
+        usd = await db.get_user_balance(user_id, "USD")
+        dec = await db.get_user_balance(user_id, "DEC")
+        assert (usd['available'], usd['locked']) == (Decimal("1000"), Decimal("0"))
+        assert (dec['available'], dec['locked']) == (Decimal("100"), Decimal("0"))
+        order = await db.get_order(buy_id)
+        assert (order['status'], order['locked_amount']) == ("cancelled", Decimal("0"))
+        print("✅ Cancels released every lock and left no funds locked")
+
+        # A cancel whose release exceeds balances.locked leaves the order open
+        stuck_id = await db.place_order_atomic({
+            "user_id": user_id, "symbol": "DEC/USD", "side": "sell",
+            "order_type": "limit", "quantity": Decimal("10"), "price": Decimal("101")
+        })
+        await db.create_balance(user_id, "DEC", Decimal("90"), Decimal("5"))
+        assert not await db.cancel_order_atomic(stuck_id), "cancel drove locked negative"
+        assert (await db.get_order(stuck_id))['status'] == "new"
+        print("✅ Cancel refused when the lock no longer covers the release")
+
+        return True
+    except Exception as e:
+        print(f"❌ Atomic order lifecycle failed: {e!r}")
+        return False
+
+
 async def test_trade_persistence(order_id: str):
     """Test trade recording"""
-    print("\n5. TRADE PERSISTENCE TEST")
+    print("\n6. TRADE PERSISTENCE TEST")
     print("-" * 40)
 
     db = await get_db_manager()
@@ -201,7 +284,7 @@ async def test_trade_persistence(order_id: str):
 
 async def test_integrated_oms_with_db():
     """Test OMS with database integration"""
-    print("\n6. INTEGRATED OMS WITH DATABASE TEST")
+    print("\n7. INTEGRATED OMS WITH DATABASE TEST")
     print("-" * 40)
 
     # Initialize OMS
@@ -261,7 +344,7 @@ async def test_integrated_oms_with_db():
 
 async def test_market_data():
     """Test market data aggregation"""
-    print("\n7. MARKET DATA TEST")
+    print("\n8. MARKET DATA TEST")
     print("-" * 40)
 
     db = await get_db_manager()
@@ -321,6 +404,9 @@ async def main():
         order_id = await test_order_persistence()
         results['order'] = order_id is not None
 
+        # Test atomic order placement and cancellation
+        results['atomic_order'] = await test_atomic_order_lifecycle()
+
         # Test trade persistence
         if order_id:
             results['trade'] = await test_trade_persistence(order_id)
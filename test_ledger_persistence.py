@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Test DeCoin Ledger Persistence
+Verifies transfer logs and balances reach PostgreSQL through the batched COPY writers
+"""
+
+import asyncio
+import sys
+import os
+from decimal import Decimal
+from uuid import uuid4
+
+import asyncpg
+
+# Add source to path
+sys.path.insert(0, 'src/exchange')
+
+import ledger.decoin_ledger as decoin_ledger
+from ledger.decoin_ledger import DeCoinLedger, LEAF_RECORD, to_units
+
+
+def postgres_config():
+    """Connection settings from the environment, as the ledger service reads them"""
+    return {
+        'host': os.getenv('POSTGRES_HOST', 'localhost'),
+        'database': os.getenv('POSTGRES_DB', 'exchange_db'),
+        'user': os.getenv('POSTGRES_USER', 'exchange_user'),
+        'password': os.getenv('POSTGRES_PASSWORD', 'exchange_pass'),
+        'port': int(os.getenv('POSTGRES_PORT', 5432))
+    }
+
+
+async def test_transfer_log_copy(ledger: DeCoinLedger):
+    """A transfer's audit row, metadata included, is written by COPY"""
+    print("\n1. TRANSFER LOG COPY TEST")
+    print("-" * 40)
+
+    try:
+        alice = f"DEC_TEST_{uuid4().hex[:12]}"
+        bob = f"DEC_TEST_{uuid4().hex[:12]}"
+        await ledger.set_balances({alice: Decimal('10'), bob: Decimal('0')})
+
+        metadata = {'type': 'trade_settlement', 'buyer_id': 'bob', 'seller_id': 'alice'}
+        success, transfer_id = await ledger.transfer(alice, bob, Decimal('2.5'), metadata)
+        assert success, transfer_id
+
+        await ledger._flush_transfer_log()
+
+        async with ledger.pg_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                "SELECT from_address, to_address, amount, status, metadata "
+                "FROM decoin_transfers WHERE id = $1", transfer_id
+            )
+
+        assert row is not None, "transfer row was not written"
+        assert (row['from_address'], row['to_address']) == (alice, bob)
+        assert row['amount'] == Decimal('2.5')
+        assert row['status'] == 'completed'
+        assert row['metadata'] == metadata
+        print(f"✅ Transfer {transfer_id[:16]}... logged with metadata {row['metadata']}")
+        return True
+    except Exception as e:
+        print(f"❌ Transfer log COPY failed: {e}")
+        return False
+
+
+async def test_balance_persistence():
+    """Every address's latest balance is upserted, even past the old queue bound"""
+    print("\n2. BALANCE PERSISTENCE TEST")
+    print("-" * 40)
+
+    try:
+        ledger = DeCoinLedger(postgres_config=postgres_config())
+        await ledger.start()
+
+        prefix = f"DEC_BAL_{uuid4().hex[:8]}_"
+        addresses = [f"{prefix}{i}" for i in range(12_000)]
+        await ledger.set_balances({address: Decimal(1) for address in addresses})
+        # Rewrite one hot address many times; only its last value may land
+        for i in range(1, 1001):
+            await ledger.set_balance(addresses[0], Decimal(i))
+        success, _ = await ledger.transfer(addresses[1], addresses[2], Decimal('0.25'))
+        assert success
+
+        # close() drains whatever the writers have not flushed yet
+        await ledger.close()
+
+        conn = await asyncpg.connect(**postgres_config())
+        try:
+            rows = await conn.fetch(
+                "SELECT address, balance FROM decoin_balances WHERE address LIKE $1",
+                prefix + '%'
+            )
+        finally:
+            await conn.close()
+
+        stored = {row['address']: row['balance'] for row in rows}
+        assert len(stored) == len(addresses), f"{len(stored)}/{len(addresses)} balances stored"
+        assert stored[addresses[0]] == Decimal(1000)
+        assert stored[addresses[1]] == Decimal('0.75')
+        assert stored[addresses[2]] == Decimal('1.25')
+        print(f"✅ {len(stored)} balances persisted, latest values kept")
+        return True
+    except Exception as e:
+        print(f"❌ Balance persistence failed: {e}")
+        return False
+
+
+async def test_anchor_covers_evicted_balances():
+    """Anchor leaves come from PostgreSQL, so balances evicted from memory still count"""
+    print("\n3. ANCHOR SNAPSHOT TEST")
+    print("-" * 40)
+
+    cache_size = decoin_ledger.BALANCE_CACHE_SIZE
+    decoin_ledger.BALANCE_CACHE_SIZE = 100
+    try:
+        ledger = DeCoinLedger(postgres_config=postgres_config())
+        await ledger.start()
+
+        prefix = f"DEC_ANC_{uuid4().hex[:8]}_"
+        expected = {f"{prefix}{i}": Decimal(i + 1) for i in range(1000)}
+        await ledger.set_balances(expected)
+        assert len(ledger.balance_cache) == 100
+
+        leaves = await ledger._snapshot_leaves()
+        anchored = {address.rstrip(b'\0').decode(): units
+                    for address, units in LEAF_RECORD.iter_unpack(leaves)}
+        await ledger.close()
+
+        missing = [address for address in expected if address not in anchored]
+        assert not missing, f"{len(missing)} addresses missing from the anchor"
+        assert all(anchored[address] == to_units(balance)
+                   for address, balance in expected.items())
+        print(f"✅ All {len(expected)} balances anchored with a 100-entry cache")
+        return True
+    except Exception as e:
+        print(f"❌ Anchor snapshot failed: {e}")
+        return False
+    finally:
+        decoin_ledger.BALANCE_CACHE_SIZE = cache_size
+
+
+async def test_mint_on_legacy_redis_balance():
+    """mint adds to a decimal-string Redis balance and reports the script's outcome"""
+    print("\n4. LEGACY REDIS BALANCE TEST")
+    print("-" * 40)
+
+    ledger = DeCoinLedger(postgres_config=postgres_config())
+    await ledger.start()
+    try:
+        if not ledger.redis_client:
+            print("⚠️  Redis not available, skipped")
+            return None
+
+        address = f"DEC_LEG_{uuid4().hex[:12]}"
+        # Balance in the format written before integer units
+        await ledger.redis_client.set(ledger._balance_key(address), "12.5", ex=3600)
+
+        assert await ledger.mint(address, Decimal('1'))
+        assert await ledger.get_balance(address) == Decimal('13.5')
+        assert not await ledger.mint(address, Decimal('-100')), "mint below zero succeeded"
+        assert await ledger.get_balance(address) == Decimal('13.5')
+        print("✅ Legacy balance migrated and minted into")
+        return True
+    except Exception as e:
+        print(f"❌ Legacy Redis balance failed: {e}")
+        return False
+    finally:
+        await ledger.close()
+
+
+async def main():
+    """Run the ledger persistence tests against POSTGRES_*"""
+    print("=" * 60)
+    print("LEDGER PERSISTENCE TEST SUITE")
+    print("=" * 60)
+
+    ledger = DeCoinLedger(postgres_config=postgres_config())
+    await ledger.start()
+
+    results = {}
+    results['transfer_log_copy'] = await test_transfer_log_copy(ledger)
+
+    await ledger.close()
+
+    results['balance_persistence'] = await test_balance_persistence()
+    results['anchor_snapshot'] = await test_anchor_covers_evicted_balances()
+    legacy = await test_mint_on_legacy_redis_balance()
+    if legacy is not None:
+        results['legacy_redis_mint'] = legacy
+
+    # Summary
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+
+    for test_name, passed in results.items():
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{test_name.ljust(20)}: {status}")
+
+    total_passed = sum(1 for v in results.values() if v)
+    total_tests = len(results)
+
+    print(f"\nTotal: {total_passed}/{total_tests} tests passed")
+    return total_passed == total_tests
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Test Matching Engines
+Checks the fixed-point and heap-kernel matchers against a plain price-time reference book,
+and that cancel tombstones never leak into fills or depth
+"""
+
+import sys
+import random
+from decimal import Decimal
+
+# Add source to path
+sys.path.insert(0, 'src/exchange')
+
+from matching_engine.engine import (MatchingEngine, Order, OrderType, OrderStatus, TimeInForce,
+                                    TRADE_ID_BOOK_BITS, TRADE_ID_SHARD_BITS)
+from matching_engine.enhanced_engine import EnhancedMatchingEngine
+
+
+class ReferenceBook:
+    """
+    Price-time priority by brute force: resting orders in a list, best picked by min().
+    With skip_self_trades, a taker passes over its own user's resting orders.
+    """
+
+    def __init__(self, skip_self_trades=False):
+        self.resting = {'buy': [], 'sell': []}  # [price, seq, order_id, quantity, user]
+        self.seq = 0
+        self.skip_self_trades = skip_self_trades
+
+    def place(self, order_id, side, price, quantity, user=None):
+        book = self.resting['sell' if side == 'buy' else 'buy']
+        trades = []
+        while quantity > 0:
+            opposite = [o for o in book if not (self.skip_self_trades and o[4] == user)]
+            if not opposite:
+                break
+            if side == 'buy':
+                best = min(opposite, key=lambda o: (o[0], o[1]))
+                if best[0] > price:
+                    break
+            else:
+                best = min(opposite, key=lambda o: (-o[0], o[1]))
+                if best[0] < price:
+                    break
+            fill = min(quantity, best[3])
+            buyer, seller = (order_id, best[2]) if side == 'buy' else (best[2], order_id)
+            trades.append((buyer, seller, best[0], fill))
+            best[3] -= fill
+            quantity -= fill
+            if best[3] == 0:
+                book.remove(best)
+        if quantity > 0:
+            self.seq += 1
+            self.resting[side].append([price, self.seq, order_id, quantity, user])
+        return trades
+
+    def cancel(self, order_id):
+        for orders in self.resting.values():
+            for o in orders:
+                if o[2] == order_id:
+                    orders.remove(o)
+                    return True
+        return False
+
+    def depth(self):
+        levels = {}
+        for side, orders in self.resting.items():
+            agg = {}
+            for o in orders:
+                agg[o[0]] = agg.get(o[0], 0) + o[3]
+            levels[side] = sorted(agg.items(), reverse=(side == 'buy'))
+        return levels['buy'], levels['sell']
+
+
+def random_flow(seed, steps=2000, cancel_rate=0.3):
+    """Limit orders around 100 with quarter-unit sizes, mixed with cancels of earlier ids"""
+    rng = random.Random(seed)
+    placed = []
+    for i in range(steps):
+        if placed and rng.random() < cancel_rate:
+            yield 'cancel', rng.choice(placed), None, None, None
+            continue
+        side = rng.choice(['buy', 'sell'])
+        price = rng.randint(95, 105)
+        quantity = Decimal(rng.randint(1, 20)) / 4
+        placed.append(i)
+        yield 'place', i, side, price, quantity
+
+
+def test_engine_matches_reference():
+    """engine.py fills and depth equal the reference book over random flow with cancels"""
+    print("\n1. FIXED-POINT ENGINE EQUIVALENCE TEST")
+    print("-" * 40)
+
+    try:
+        for seed in range(5):
+            engine = MatchingEngine()
+            engine.add_symbol("X")
+            ref = ReferenceBook(skip_self_trades=True)
+            for step, (action, i, side, price, quantity) in enumerate(random_flow(seed)):
+                if action == 'cancel':
+                    assert engine.cancel_order("X", f"o{i}") == ref.cancel(f"o{i}"), (seed, step)
+                    continue
+                order = Order(id=f"o{i}", user_id=f"u{i % 7}", symbol="X", side=side,
+                              order_type=OrderType.LIMIT, price=Decimal(price),
+                              quantity=quantity, time_in_force=TimeInForce.GTC)
+                _, trades = engine.place_order(order)
+                got = [(t.buyer_order_id, t.seller_order_id, t.price, t.quantity) for t in trades]
+                assert got == ref.place(f"o{i}", side, price, quantity, f"u{i % 7}"), (seed, step)
+
+                if step % 50 == 0:
+                    book = engine.get_order_book("X", 1000)
+                    bids = [(level['price'], level['quantity']) for level in book['bids']]
+                    asks = [(level['price'], level['quantity']) for level in book['asks']]
+                    assert (bids, asks) == ref.depth(), (seed, step)
+            engine.shutdown()
+
+        print("✅ 5 seeds x 2000 steps: trades and depth match the reference")
+        return True
+    except Exception as e:
+        print(f"❌ Engine equivalence failed: {e!r}")
+        return False
+
+
+def test_heap_kernel_matches_reference():
+    """The enhanced engine's heap kernel fills like the reference, tombstones included"""
+    print("\n2. HEAP KERNEL EQUIVALENCE TEST")
+    print("-" * 40)
+
+    try:
+        for seed in range(5):
+            engine = EnhancedMatchingEngine("X")
+            ref = ReferenceBook()
+            ids = {}  # flow index -> engine order id
+            for step, (action, i, side, price, quantity) in enumerate(random_flow(seed)):
+                if action == 'cancel':
+                    assert engine.cancel_order(ids[i]) == ref.cancel(i), (seed, step)
+                    continue
+                order_id, trades, _ = engine.place_order(side, float(price), float(quantity),
+                                                         user_id=i % 7)
+                ids[i] = order_id
+                back = {v: k for k, v in ids.items()}
+                got = [(back[t['buyer_order']], back[t['seller_order']], t['price'], t['quantity'])
+                       for t in trades]
+                want = [(b, s, float(p), float(q)) for b, s, p, q in ref.place(i, side, price, quantity)]
+                assert got == want, (seed, step)
+
+                if step % 50 == 0:
+                    book = engine.get_order_book(1000)
+                    bids = [(level['price'], level['quantity']) for level in book['bids']]
+                    asks = [(level['price'], level['quantity']) for level in book['asks']]
+                    ref_bids, ref_asks = ref.depth()
+                    assert bids == [(float(p), float(q)) for p, q in ref_bids], (seed, step)
+                    assert asks == [(float(p), float(q)) for p, q in ref_asks], (seed, step)
+
+        print("✅ 5 seeds x 2000 steps: trades and depth match the reference")
+        return True
+    except Exception as e:
+        print(f"❌ Heap kernel equivalence failed: {e!r}")
+        return False
+
+
+def test_price_level_tombstones():
+    """Cancels tombstone a level's slots, compact them away and keep FIFO for survivors"""
+    print("\n3. PRICE LEVEL TOMBSTONE TEST")
+    print("-" * 40)
+
+    try:
+        engine = MatchingEngine()
+        engine.add_symbol("X")
+        book = engine.order_books["X"]
+        for i in range(100):
+            engine.place_order(Order(id=f"s{i}", user_id="maker", symbol="X", side="sell",
+                                     order_type=OrderType.LIMIT, price=Decimal(100),
+                                     quantity=Decimal(1), time_in_force=TimeInForce.GTC))
+
+        # Keep every fifth order, the head included, so tombstones pile up behind it
+        cancelled = [i for i in range(1, 100) if i % 5]
+        for i in cancelled:
+            assert engine.cancel_order("X", f"s{i}")
+            assert not engine.cancel_order("X", f"s{i}"), "second cancel succeeded"
+
+        level = book.ask_levels[100 * 10 ** 8]
+        survivors = [i for i in range(100) if i not in cancelled]
+        assert level.cancelled * 2 <= len(level.qtys) - level.head, "tombstones never compacted"
+        assert level.total == len(survivors) * 10 ** 8
+        for i in survivors:
+            order = book.orders[f"s{i}"]
+            assert level.ids[order.level_slot - level.base] == order.order_key
+
+        depth = engine.get_order_book("X")
+        assert depth['asks'] == [{"price": Decimal(100), "quantity": Decimal(len(survivors))}]
+
+        # A sweep fills only the survivors, oldest first
+        _, trades = engine.place_order(Order(id="taker", user_id="taker", symbol="X", side="buy",
+                                             order_type=OrderType.LIMIT, price=Decimal(100),
+                                             quantity=Decimal(100), time_in_force=TimeInForce.GTC))
+        assert [t.seller_order_id for t in trades] == [f"s{i}" for i in survivors]
+        assert all(book.orders[f"s{i}"].status == OrderStatus.CANCELLED for i in cancelled)
+        assert not book.ask_levels
+        engine.shutdown()
+
+        print(f"✅ {len(cancelled)} cancels compacted, {len(survivors)} survivors filled in order")
+        return True
+    except Exception as e:
+        print(f"❌ Price level tombstones failed: {e!r}")
+        return False
+
+
+def test_heap_tombstones():
+    """Cancelled heap slots never fill and are recycled once the heap is rebuilt"""
+    print("\n4. HEAP TOMBSTONE TEST")
+    print("-" * 40)
+
+    try:
+        engine = EnhancedMatchingEngine("X")
+        ids = [engine.place_order("sell", 100.0 + i % 3, 1.0, user_id=i)[0] for i in range(60)]
+        for order_id in ids[:40]:
+            assert engine.cancel_order(order_id)
+            assert not engine.cancel_order(order_id), "second cancel succeeded"
+
+        asks = engine.sell_orders
+        assert len(asks) == 20
+        assert asks.cancelled * 2 <= asks.size, "tombstones never rebuilt"
+        assert engine.get_market_data()['ask_volume'] == 20.0
+
+        # New orders reuse the freed slots instead of growing the columns
+        columns = len(asks.orders)
+        engine.place_order("sell", 99.0, 1.0, user_id=99)
+        assert len(asks.orders) == columns
+
+        _, trades, _ = engine.place_order("buy", 102.0, 100.0, user_id=100)
+        assert {t['seller_order'] for t in trades}.isdisjoint(ids[:40])
+        assert sum(t['quantity'] for t in trades) == 21.0
+        assert [t['price'] for t in trades] == sorted(t['price'] for t in trades)
+
+        print("✅ 40 cancels never filled; heap rebuilt and slots reused")
+        return True
+    except Exception as e:
+        print(f"❌ Heap tombstones failed: {e!r}")
+        return False
+
+
+def test_order_grid_and_trade_ids():
+    """Off-grid orders are rejected, and trade ids stay unique across books and shards"""
+    print("\n5. ORDER GRID AND TRADE ID TEST")
+    print("-" * 40)
+
+    try:
+        engine = MatchingEngine()
+        engine.add_symbol("X", tick_size=Decimal('0.01'), lot_size=Decimal('0.1'))
+        for price, quantity in [(Decimal('100.005'), Decimal(1)), (Decimal(100), Decimal('0.05'))]:
+            order = Order(id=f"bad{price}{quantity}", user_id="u", symbol="X", side="buy",
+                          order_type=OrderType.LIMIT, price=price, quantity=quantity,
+                          time_in_force=TimeInForce.GTC)
+            engine.place_order(order)
+            assert order.status == OrderStatus.REJECTED, (price, quantity)
+        assert not engine.order_books["X"].bid_levels
+        engine.shutdown()
+
+        seen = set()
+        for shard_id in range(2):
+            engine = MatchingEngine(shard_id=shard_id)
+            for symbol in ("A", "B", "C"):
+                engine.add_symbol(symbol)
+                for i in range(500):
+                    for side in ("sell", "buy"):
+                        _, trades = engine.place_order(Order(
+                            id=f"{symbol}{side}{i}", user_id=side, symbol=symbol, side=side,
+                            order_type=OrderType.LIMIT, price=Decimal(100), quantity=Decimal(1),
+                            time_in_force=TimeInForce.GTC))
+                        for trade in trades:
+                            assert 0 < trade.id < 1 << 63
+                            assert trade.id >> TRADE_ID_BOOK_BITS & ((1 << TRADE_ID_SHARD_BITS) - 1) == shard_id
+                            seen.add(trade.id)
+            engine.shutdown()
+        assert len(seen) == 2 * 3 * 500, f"{2 * 3 * 500 - len(seen)} duplicate trade ids"
+
+        print(f"✅ Off-grid orders rejected; {len(seen)} trade ids unique across 2 shards")
+        return True
+    except Exception as e:
+        print(f"❌ Order grid and trade ids failed: {e!r}")
+        return False
+
+
+def main():
+    """Run all matching engine tests"""
+    print("=" * 60)
+    print("MATCHING ENGINE TEST SUITE")
+    print("=" * 60)
+
+    results = {}
+    results['engine_equivalence'] = test_engine_matches_reference()
+    results['heap_equivalence'] = test_heap_kernel_matches_reference()
+    results['level_tombstones'] = test_price_level_tombstones()
+    results['heap_tombstones'] = test_heap_tombstones()
+    results['grid_and_trade_ids'] = test_order_grid_and_trade_ids()
+
+    # Summary
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+
+    for test_name, passed in results.items():
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"{test_name.ljust(20)}: {status}")
+
+    total_passed = sum(1 for v in results.values() if v)
+    total_tests = len(results)
+
+    print(f"\nTotal: {total_passed}/{total_tests} tests passed")
+    return total_passed == total_tests
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)